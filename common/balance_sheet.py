@@ -1,12 +1,11 @@
 import pandas as pd
-import requests
 import numpy as np
 from utils.widget import *
+from common.fmp_client import fmp_client
 
 
 class BalanceSheet():
-    url_prefix_f = "https://financialmodelingprep.com/api/v3/financials/"
-    api_key = "ef7be903a5ace951c13f320358723e0f"
+    endpoint = "financials/balance-sheet-statement"
 
     bs_full_items = [
         "date",
@@ -50,12 +49,13 @@ class BalanceSheet():
         "Total shareholders equity growth"
     ]
 
-    def __init__(self, ticker, quarter=False, year=5):
-        self.bs_url = f"{BalanceSheet.url_prefix_f}/balance-sheet-statement/{ticker}"
+    def __init__(self, ticker, quarter=False, year=5, data=None):
         self.quarter = quarter
         self.ticker = ticker
         self.year = year
-        self.data = requests.get(self.bs_url + (f"?period=quarter&apikey={BalanceSheet.api_key}" if quarter else f"?apikey={BalanceSheet.api_key}")).json()['financials']
+        if data is None:  # data can be fetched beforehand, e.g. concurrently with other statements
+            data = fmp_client.get(BalanceSheet.endpoint, ticker, quarter)
+        self.data = data['financials']
         self.data = pd.DataFrame.from_dict(self.data)[BalanceSheet.bs_full_items]
         self.data = self.data[(self.data.date.str.len() == 10)]
 
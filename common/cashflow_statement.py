@@ -1,11 +1,10 @@
 import pandas as pd
-import requests
 from utils.widget import *
+from common.fmp_client import fmp_client
 
 
 class CashflowStatement:
-    url_prefix_f = "https://financialmodelingprep.com/api/v3/financials/"
-    api_key = "ef7be903a5ace951c13f320358723e0f"
+    endpoint = "financials/cash-flow-statement"
 
     cf_full_items = [
         "date",
@@ -31,12 +30,13 @@ class CashflowStatement:
         "Capital Expenditure", "Free Cash Flow"
     ]
 
-    def __init__(self, ticker, quarter=False, year=5):
-        self.cf_url = f"{CashflowStatement.url_prefix_f}/cash-flow-statement/{ticker}"
+    def __init__(self, ticker, quarter=False, year=5, data=None):
         self.quarter = quarter
         self.ticker = ticker
         self.year = year
-        self.data = requests.get(self.cf_url + (f"?period=quarter&apikey={CashflowStatement.api_key}" if quarter else f"?apikey={CashflowStatement.api_key}")).json()['financials']
+        if data is None:  # data can be fetched beforehand, e.g. concurrently with other statements
+            data = fmp_client.get(CashflowStatement.endpoint, ticker, quarter)
+        self.data = data['financials']
         self.data = pd.DataFrame.from_dict(self.data)[CashflowStatement.cf_full_items]
         self.data = self.data[(self.data.date.str.len() == 10)]
 
@@ -0,0 +1,147 @@
+import time
+import random
+import threading
+import requests
+
+# failure kinds worth retrying, the others won't get better by asking again
+retryable_failures = {"rate_limited", "server_error", "network"}
+
+
+def classify_failure(exception):
+    """
+    classify why a fetch failed
+    :param exception: the exception raised by the fetch
+    :return: one of "rate_limited", "server_error", "network", "not_found", "unauthorized", "no_data", "error"
+    """
+    if isinstance(exception, FetchError):
+        return exception.kind
+    if isinstance(exception, requests.HTTPError):
+        status = exception.response.status_code if exception.response is not None else None
+        message = str(exception).lower()
+        if status == 429 or "limit reach" in message:
+            return "rate_limited"
+        if status in (401, 403) or "invalid api" in message:
+            return "unauthorized"
+        if status == 404:
+            return "not_found"
+        if status is not None and status >= 500:
+            return "server_error"
+        return "error"
+    if isinstance(exception, (requests.ConnectionError, requests.Timeout)):
+        return "network"
+    if isinstance(exception, (KeyError, IndexError, TypeError, ValueError, LookupError)):
+        return "no_data"  # the response doesn't hold what we asked for, e.g. an unknown ticker returns {}
+    return "error"
+
+
+class FetchError(Exception):
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+
+
+class TokenBucket:
+    """
+    A token bucket: allows bursts of up to capacity calls, and rate calls per second sustained
+    """
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param clock: returns the current time in seconds, e.g. a fake clock in tests
+        :param sleep: waits for a number of seconds, e.g. advancing a fake clock in tests
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = capacity
+        self.updated_at = clock()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = self.clock()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                    self.updated_at = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        stop handing out tokens for a while, e.g. after the server said we're going too fast. Threads hitting the
+        limit together don't add up their pauses, the latest deadline wins
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+            # the bucket starts refilling, empty, when the pause ends
+            self.tokens = min(self.tokens, 0)
+            self.updated_at = max(self.updated_at, self.paused_until)
+
+
+class FetchScheduler:
+    """
+    Schedules every api request of a process: a token bucket caps the request rate, a semaphore caps the concurrent
+    requests, and failed requests are retried with exponential backoff and jitter if the failure is retryable.
+    """
+    def __init__(self, rate=5, burst=10, max_concurrency=8, max_retries=4, base_delay=1, max_delay=60,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        construct a scheduler
+        :param rate: max sustained requests per second
+        :param burst: max requests issued at once after being idle
+        :param max_concurrency: max requests in flight
+        :param max_retries: max retries of a retryable failure
+        :param base_delay: seconds to wait before the first retry, doubled at each retry
+        :param max_delay: max seconds to wait before a retry
+        :param clock: returns the current time in seconds, see TokenBucket
+        :param sleep: waits for a number of seconds, for the rate limit and the backoff
+        """
+        self.clock = clock
+        self.sleep = sleep
+        self.configure(rate, burst, max_concurrency, max_retries, base_delay, max_delay)
+
+    def configure(self, rate=5, burst=10, max_concurrency=8, max_retries=4, base_delay=1, max_delay=60):
+        self.bucket = TokenBucket(rate, burst, self.clock, self.sleep)
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failures = {}
+        self.failures_lock = threading.Lock()
+
+    def call(self, fetch, *args, **kwargs):
+        """
+        call fetch(*args, **kwargs) under the rate limit and concurrency cap, retrying retryable failures
+        :return: what fetch returns
+        :raise: FetchError carrying the failure kind once retries are exhausted or the failure is not retryable
+        """
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            with self.semaphore:
+                try:
+                    return fetch(*args, **kwargs)
+                except Exception as e:
+                    kind = classify_failure(e)
+                    error = e
+            with self.failures_lock:
+                self.failures[kind] = self.failures.get(kind, 0) + 1
+            if kind not in retryable_failures or attempt >= self.max_retries:
+                raise FetchError(kind, str(error)) from error
+            # full jitter: a random wait up to the exponential backoff, so workers don't retry in lockstep
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            if kind == "rate_limited":
+                self.bucket.pause(delay)
+            self.sleep(delay)
+            attempt += 1
+
+
+fetch_scheduler = FetchScheduler()  # financialmodelingprep requests
+price_scheduler = FetchScheduler(rate=10, burst=20)  # yahoo finance price downloads
@@ -1,19 +1,26 @@
 from common.balance_sheet import *
 from common.income_statement import *
 from common.cashflow_statement import *
+from common.fmp_client import fmp_client
 
 
 class FinancialInsight:
-    api_key = "ef7be903a5ace951c13f320358723e0f"
+    ratios_endpoint = "financial-ratios"
+    enterprise_value_endpoint = "enterprise-value"
 
-    def __init__(self, ticker, quarter=False, year=5):
+    def __init__(self, ticker, quarter=False, year=5, client=None):
         self.quarter = quarter
         self.ticker = ticker
         self.year = year
         self.beta = 0
-        self.balance_sheet = BalanceSheet(ticker, quarter, year)
-        self.income_statement = IncomeStatement(ticker, quarter, year)
-        self.cashflow_statement = CashflowStatement(ticker, quarter, year)
+        # fetch the three statements, the financial ratios and the enterprise values concurrently
+        client = client if client is not None else fmp_client
+        bs_data, is_data, cf_data, self.ratios_data, self.enterprise_value_data = \
+            client.get_all(FinancialInsight.get_queries(ticker, quarter))
+        self.statement_date = FinancialInsight.get_latest_date(is_data)
+        self.balance_sheet = BalanceSheet(ticker, quarter, year, data=bs_data)
+        self.income_statement = IncomeStatement(ticker, quarter, year, data=is_data)
+        self.cashflow_statement = CashflowStatement(ticker, quarter, year, data=cf_data)
         self.company_value = None
         self.profitability = None
         self.operation = None
@@ -25,9 +32,8 @@ class FinancialInsight:
 
     def __get_company_value(self):
         if self.company_value is None:
-            ev_url = f"https://financialmodelingprep.com/api/v3/enterprise-value/{self.ticker.replace('-', '.')}?{'period=quarter&' if self.quarter else ''}apikey={FinancialInsight.api_key}"
             ev_items = ["date", "Stock Price", "Number of Shares", "Market Capitalization", "Enterprise Value"]
-            data = requests.get(ev_url).json()["enterpriseValues"]
+            data = self.enterprise_value_data["enterpriseValues"]
             data = pd.DataFrame.from_dict(data)[ev_items]
             data = data[data.date.isin(self.balance_sheet.balance_sheet.columns)]
             self.company_value = data.set_index('date').T
@@ -67,6 +73,45 @@ class FinancialInsight:
             self.get_dcf_valuation()
         self.__print__insights()
 
+    @staticmethod
+    def get_queries(ticker, quarter=False):
+        """
+        :return: the (endpoint, ticker, quarter) queries of everything the insights are computed from
+        """
+        return [
+            (BalanceSheet.endpoint, ticker, quarter),
+            (IncomeStatement.endpoint, ticker, quarter),
+            (CashflowStatement.endpoint, ticker, quarter),
+            (FinancialInsight.ratios_endpoint, ticker.replace('-', '.'), False),
+            (FinancialInsight.enterprise_value_endpoint, ticker.replace('-', '.'), quarter)
+        ]
+
+    @staticmethod
+    def get_latest_date(statement_data):
+        """
+        :param statement_data: a statement response, e.g. of the income statement endpoint
+        :return: the date of the latest statement, "YYYY-MM-DD"
+        """
+        return max(s["date"] for s in statement_data["financials"] if len(s.get("date", "")) == 10)
+
+    @staticmethod
+    def get_latest_statement_date(ticker, quarter=False, client=None):
+        """
+        get the date of a company's latest income statement with a one-record request, bypassing the cache
+        """
+        client = client if client is not None else fmp_client
+        return FinancialInsight.get_latest_date(client.probe(IncomeStatement.endpoint, ticker, quarter))
+
+    @staticmethod
+    def invalidate(ticker, quarter=False, client=None):
+        """
+        drop the cached responses of a company, e.g. after it filed a new statement
+        """
+        client = client if client is not None else fmp_client
+        if client.cache is not None:
+            for endpoint, t, q in FinancialInsight.get_queries(ticker, quarter):
+                client.cache.invalidate(endpoint, t, q)
+
     def get_profitability_insights(self):
         if self.profitability is None:
             self.profitability = pd.concat([
@@ -134,7 +179,7 @@ class FinancialInsight:
         if self.investing is None:
             market_return = 0.1
             data = []
-            json = requests.get(f"https://financialmodelingprep.com/api/v3/financial-ratios/{self.ticker.replace('-', '.')}?apikey={FinancialInsight.api_key}").json()["ratios"]
+            json = self.ratios_data["ratios"]
             for x in json:
                 data.append(
                     {"date": x["date"], "dividendYield": x["investmentValuationRatios"]["dividendYield"],
@@ -0,0 +1,95 @@
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from common.response_cache import ResponseCache
+from common.fetch_scheduler import fetch_scheduler
+
+
+class FmpClient:
+    """
+    A client of the financialmodelingprep.com api. All requests go through one keep-alive session, and get_all issues
+    several requests concurrently, so fetching everything about a company costs about one round trip.
+    """
+    base_url = "https://financialmodelingprep.com/api/v3"
+    api_key = "ef7be903a5ace951c13f320358723e0f"
+
+    def __init__(self, base_url=None, api_key=None, max_workers=8, timeout=30, cache=None, scheduler=None):
+        """
+        construct a client
+        :param base_url: the api root, can point to a local stub server for testing
+        :param api_key: the api key
+        :param max_workers: max concurrent requests (and pooled connections)
+        :param timeout: seconds to wait for a response
+        :param cache: a ResponseCache to serve responses from, no caching if None
+        :param scheduler: a FetchScheduler rate limiting and retrying requests, requests go out directly if None
+        """
+        self.base_url = (base_url if base_url is not None else FmpClient.base_url).rstrip("/")
+        self.api_key = api_key if api_key is not None else FmpClient.api_key
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache = cache
+        self.scheduler = scheduler
+        self.session = None
+        self.executor = None
+        self.pid = None
+
+    def __connect(self):
+        # session and threads are created per process: a forked pool worker must not reuse the parent's sockets
+        if self.pid != os.getpid():
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            self.pid = os.getpid()
+
+    def get_url(self, endpoint, ticker, quarter=False, limit=None):
+        return f"{self.base_url}/{endpoint}/{ticker}?{'period=quarter&' if quarter else ''}" \
+               f"{f'limit={limit}&' if limit is not None else ''}apikey={self.api_key}"
+
+    def get(self, endpoint, ticker, quarter=False):
+        """
+        request one endpoint for a ticker
+        :param endpoint: e.g. "financials/balance-sheet-statement", "enterprise-value", "company/profile"
+        :param ticker: the ticker in the form the endpoint expects
+        :param quarter: request quarter data instead of annual data
+        :return: the decoded json
+        """
+        if self.cache is not None:
+            return self.cache.get(endpoint, ticker, quarter, lambda: self.__schedule(endpoint, ticker, quarter))
+        return self.__schedule(endpoint, ticker, quarter)
+
+    def probe(self, endpoint, ticker, quarter=False):
+        """
+        request only the latest record of an endpoint, bypassing the cache, e.g. to check whether a company filed a
+        new statement since it was last fetched
+        :return: the decoded json
+        """
+        return self.__schedule(endpoint, ticker, quarter, limit=1)
+
+    def __schedule(self, endpoint, ticker, quarter, limit=None):
+        if self.scheduler is not None:
+            return self.scheduler.call(self.__request, endpoint, ticker, quarter, limit)
+        return self.__request(endpoint, ticker, quarter, limit)
+
+    def __request(self, endpoint, ticker, quarter, limit=None):
+        self.__connect()
+        response = self.session.get(self.get_url(endpoint, ticker, quarter, limit), timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if isinstance(data, dict) and "Error Message" in data:  # e.g. limit reached, must not be cached
+            raise requests.HTTPError(f"{endpoint}/{ticker}: {data['Error Message']}", response=response)
+        return data
+
+    def get_all(self, queries):
+        """
+        request several endpoints concurrently
+        :param queries: a list of (endpoint, ticker, quarter) tuples
+        :return: a list of decoded json, in the order of queries
+        """
+        self.__connect()
+        return list(self.executor.map(lambda q: self.get(*q), queries))
+
+
+fmp_client = FmpClient(cache=ResponseCache(), scheduler=fetch_scheduler)
@@ -0,0 +1,122 @@
+import os
+import re
+import glob
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# columns of a company fundamentals scrape, in the order Company.get_fundamentals_row returns them
+FUNDAMENTALS_ITEMS = [
+    "ticker", "market cap", "industry", "sector", "current price", "gross margin", "cost margin",
+    "net income margin", "expenses margin", "ROE", "ROA", "receivables turnover days", "inventories turnover days",
+    "total assets turnover days", "liability/asset ratio", "current ratio", "acid-test ratio", "revenue growth",
+    "net income growth", "operating income growth", "free cash flow growth", "wacc", "roic", "excess return",
+    "economic profit", "stockholders equity growth", "dividend yield", "dividend payout ratio", "dcf", "beta",
+    "annual return", "annual risk", "statement date"
+]
+
+
+class FundamentalsStore:
+    """
+    A store of company fundamentals snapshots, one typed Parquet file per scrape date: industry and sector are
+    categorical, amounts in dollars are float64, ratios are float32 and dates are datetime64. Parquet is columnar, so
+    loading a few columns of the whole universe only reads those columns. Needs pyarrow.
+    """
+    default_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "fundamentals")
+    categorical_columns = ["industry", "sector"]
+    float64_columns = ["market cap", "current price", "economic profit", "dcf"]  # too large or too precise for float32
+    date_columns = ["statement date"]
+    file_pattern = re.compile(r"fundamentals_(\d{8})\.parquet$")
+
+    def __init__(self, root=None):
+        """
+        construct a fundamentals store
+        :param root: the folder holding snapshots, default is ./data/fundamentals
+        """
+        self.root = root if root is not None else FundamentalsStore.default_root
+
+    def get_path(self, date):
+        return os.path.join(self.root, f"fundamentals_{FundamentalsStore.get_date(date)}.parquet")
+
+    @staticmethod
+    def get_date(date):
+        """
+        :param date: a datetime, or a string like "2020-05-09" or "20200509"
+        :return: the date as "YYYYMMDD"
+        """
+        if isinstance(date, str):
+            return date.replace("-", "")
+        return date.strftime("%Y%m%d")
+
+    def list_dates(self):
+        """
+        :return: the dates ("YYYYMMDD") of all snapshots, oldest first
+        """
+        dates = []
+        for path in glob.glob(os.path.join(self.root, "fundamentals_*.parquet")):
+            match = FundamentalsStore.file_pattern.search(path)
+            if match:
+                dates.append(match.group(1))
+        return sorted(dates)
+
+    def save(self, data, date=None):
+        """
+        save a snapshot, replacing the snapshot of the same date
+        :param data: a data frame of fundamentals, with a ticker column or indexed by ticker
+        :param date: the scrape date, default is today
+        :return: the path of the snapshot
+        """
+        path = self.get_path(date if date is not None else datetime.now())
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        FundamentalsStore.to_typed(data).to_parquet(tmp_path)
+        os.replace(tmp_path, path)  # readers see either the old or the new snapshot, never a partial one
+        return path
+
+    def load(self, columns=None, date=None):
+        """
+        load a snapshot
+        :param columns: the columns to read, all columns if None
+        :param date: the scrape date, default is the latest snapshot
+        :return: a data frame indexed by ticker
+        """
+        if date is None:
+            dates = self.list_dates()
+            if len(dates) == 0:
+                raise LookupError(f"no fundamentals snapshot in {self.root}")
+            date = dates[-1]
+        return pd.read_parquet(self.get_path(date), columns=None if columns is None else list(columns))
+
+    def import_tsv(self, file_path, date=None):
+        """
+        convert a scrape tsv file (e.g. ./data/company_scrapings_20200509.tsv) into a snapshot
+        :param file_path: the tsv file written by scrape_company_fundamentals
+        :param date: the scrape date, default is the date in the file name, or the file's modified date
+        :return: the path of the snapshot
+        """
+        if date is None:
+            match = re.search(r"(\d{8})", os.path.basename(file_path))
+            date = match.group(1) if match else datetime.fromtimestamp(os.path.getmtime(file_path))
+        # older scrapes were written in the platform encoding, e.g. an industry with an en dash in cp1252
+        data = pd.read_csv(file_path, encoding="utf-8", encoding_errors="replace", delimiter="\t", dtype=str)
+        return self.save(data, date)
+
+    @staticmethod
+    def to_typed(data):
+        """
+        :return: a copy of data indexed by ticker, with categorical, datetime64, float64 and float32 columns
+        """
+        data = data.set_index("ticker") if "ticker" in data.columns else data.copy()
+        data.index = data.index.astype(str)
+        data.index.name = "ticker"
+        data = data[~data.index.duplicated(keep="last")]
+        for c in data.columns:
+            if c in FundamentalsStore.categorical_columns:
+                data[c] = data[c].astype("category")
+            elif c in FundamentalsStore.date_columns:
+                data[c] = pd.to_datetime(data[c], errors="coerce")
+            else:
+                dtype = np.float64 if c in FundamentalsStore.float64_columns else np.float32
+                data[c] = pd.to_numeric(data[c], errors="coerce").astype(dtype)
+        return data
@@ -1,12 +1,11 @@
 import pandas as pd
-import requests
 import numpy as np
 from utils.widget import *
+from common.fmp_client import fmp_client
 
 
 class IncomeStatement:
-    url_prefix_f = "https://financialmodelingprep.com/api/v3/financials/"
-    api_key = "ef7be903a5ace951c13f320358723e0f"
+    endpoint = "financials/income-statement"
     is_full_items = [
         "date",
         "Revenue",
@@ -47,12 +46,13 @@ class IncomeStatement:
         "Operating Income", "Interest Expense", "Income Before Tax", "Income Tax Expense", "Net Income"
     ]
 
-    def __init__(self, ticker, quarter=False, year=5):
-        self.is_url = f"{IncomeStatement.url_prefix_f}/income-statement/{ticker}"
+    def __init__(self, ticker, quarter=False, year=5, data=None):
         self.quarter = quarter
         self.ticker = ticker
         self.year = year
-        self.data = requests.get(self.is_url + (f"?period=quarter&apikey={IncomeStatement.api_key}" if quarter else f"?apikey={IncomeStatement.api_key}")).json()["financials"]
+        if data is None:  # data can be fetched beforehand, e.g. concurrently with other statements
+            data = fmp_client.get(IncomeStatement.endpoint, ticker, quarter)
+        self.data = data["financials"]
         self.data = pd.DataFrame.from_dict(self.data)[IncomeStatement.is_full_items]
         self.data = self.data[(self.data.date.str.len() == 10)]
 
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import uuid
+import threading
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+
+class ResponseCache:
+    """
+    A disk-backed cache of api responses keyed by (endpoint, ticker, period), each entry expiring after the TTL of its
+    endpoint. Entries are written atomically, and a miss is fetched by one caller only (single-flight): other threads
+    and processes asking for the same entry wait for it instead of fetching it again.
+    """
+    default_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "responses")
+
+    # (endpoint prefix, period) -> seconds to live, the longest matching prefix wins, period None matches both
+    default_ttls = {
+        ("financials", "annual"): 30 * DAY,  # annual statements only change once a year
+        ("financials", "quarter"): 7 * DAY,
+        ("financial-ratios", None): 30 * DAY,
+        ("enterprise-value", None): DAY,  # holds the stock price and market cap
+        ("company/profile", None): HOUR,  # holds the current price
+        ("", None): HOUR
+    }
+
+    def __init__(self, root=None, ttls=None, lock_timeout=120):
+        """
+        construct a response cache
+        :param root: the folder holding cached responses, default is ./data/responses
+        :param ttls: a dict overriding default_ttls, e.g. {("company/profile", None): 10 * MINUTE}
+        :param lock_timeout: seconds after which a fetch lock left behind (e.g. by a killed worker) is ignored
+        """
+        self.root = root if root is not None else ResponseCache.default_root
+        self.ttls = dict(ResponseCache.default_ttls)
+        if ttls is not None:
+            self.ttls.update(ttls)
+        self.lock_timeout = lock_timeout
+        self.locks = {}
+        self.locks_lock = threading.Lock()
+
+    def get_ttl(self, endpoint, quarter=False):
+        period = "quarter" if quarter else "annual"
+        candidates = [(len(prefix), ttl) for (prefix, p), ttl in self.ttls.items()
+                      if endpoint.startswith(prefix) and (p is None or p == period)]
+        return max(candidates)[1] if candidates else 0
+
+    def get_path(self, endpoint, ticker, quarter=False):
+        return os.path.join(self.root, f"{endpoint.replace('/', '_')}_{ticker.replace('/', '_')}_"
+                                       f"{'quarter' if quarter else 'annual'}.json")
+
+    def get(self, endpoint, ticker, quarter, fetch):
+        """
+        get a response from the cache, or fetch and cache it if missing or expired
+        :param endpoint: api endpoint
+        :param ticker: ticker
+        :param quarter: quarter or annual period
+        :param fetch: a function without arguments returning the response, called on a miss
+        :return: the (json decoded) response
+        """
+        path = self.get_path(endpoint, ticker, quarter)
+        ttl = self.get_ttl(endpoint, quarter)
+        found, data = self.__read(path, ttl)
+        if found:
+            return data
+        with self.__get_lock(path):  # single-flight across threads
+            with FileLock(path + ".lock", self.lock_timeout):  # single-flight across processes
+                found, data = self.__read(path, ttl)
+                if found:
+                    return data
+                data = fetch()
+                self.__write(path, data)
+                return data
+
+    def invalidate(self, endpoint, ticker, quarter=False):
+        path = self.get_path(endpoint, ticker, quarter)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def __get_lock(self, path):
+        with self.locks_lock:
+            if path not in self.locks:
+                self.locks[path] = threading.Lock()
+            return self.locks[path]
+
+    @staticmethod
+    def __read(path, ttl):
+        try:
+            if time.time() - os.path.getmtime(path) > ttl:
+                return False, None
+            with open(path, encoding="utf-8") as fp:
+                return True, json.load(fp)
+        except (OSError, ValueError):
+            return False, None
+
+    def __write(self, path, data):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            json.dump(data, fp)
+        os.replace(tmp_path, path)  # readers see either the old or the new entry, never a partial one
+
+
+class FileLock:
+    """
+    An exclusive lock across processes, held by creating a lock file holding a token unique to the holder. The holder
+    touches the file every timeout / 4 seconds while it holds the lock, so only a lock whose holder died goes stale,
+    however long the work under the lock (e.g. a fetch with retries) takes
+    """
+    def __init__(self, path, timeout=120, poll_interval=0.05):
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.token = None
+        self.released = None
+        self.heartbeat = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        token = f"{os.getpid()}.{threading.get_ident()}.{uuid.uuid4().hex}"
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.timeout:
+                        os.remove(self.path)  # the holder died without releasing the lock
+                        continue
+                except OSError:
+                    continue
+                time.sleep(self.poll_interval)
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                fp.write(token)
+            self.token = token
+            self.released = threading.Event()
+            self.heartbeat = threading.Thread(target=self.__touch, daemon=True)
+            self.heartbeat.start()
+            return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.released.set()
+        self.heartbeat.join()
+        # the lock may have been taken over as stale, e.g. the process was suspended, then it's not ours to remove
+        if self.__is_held():
+            os.remove(self.path)
+
+    def __touch(self):
+        while not self.released.wait(self.timeout / 4):
+            if self.__is_held():
+                try:
+                    os.utime(self.path)
+                except OSError:
+                    pass
+
+    def __is_held(self):
+        try:
+            with open(self.path, encoding="utf-8") as fp:
+                return fp.read() == self.token
+        except OSError:
+            return False
@@ -0,0 +1,174 @@
+import re
+import numpy as np
+import pandas as pd
+from common.fundamentals_store import FundamentalsStore
+
+
+class Screener:
+    """
+    Screens a fundamentals snapshot with predicates like "ROE > 0.15 and liability/asset ratio < 0.5 and sector ==
+    Technology", and ranks the result by a metric. Every metric is indexed once as sorted values, and every categorical
+    column (sector, industry) as value -> rows, so a predicate is a binary search or a dict lookup instead of a scan
+    of the whole universe.
+    """
+    operators = [">=", "<=", "==", "!=", ">", "<", "=", " in "]
+    predicate_pattern = re.compile(r"^\s*(.+?)\s*(>=|<=|==|!=|>|<|=|\s+in\s+)\s*(.+?)\s*$", re.IGNORECASE)
+
+    def __init__(self, data=None, store=None, date=None):
+        """
+        construct a screener and index the snapshot
+        :param data: a data frame of fundamentals indexed by ticker, e.g. from FundamentalsStore.load
+        :param store: if data is None, the FundamentalsStore to load the snapshot from, default is ./data/fundamentals
+        :param date: if data is None, the snapshot date, default is the latest
+        """
+        if data is None:
+            data = (store if store is not None else FundamentalsStore()).load(date=date)
+        self.data = data
+        self.tickers = data.index.to_numpy()
+        self.columns = {c.lower(): c for c in data.columns}
+        self.sorted_values = {}  # metric -> its non-NaN values ascending
+        self.sorted_rows = {}  # metric -> the rows of sorted_values
+        self.category_rows = {}  # categorical column -> {value -> rows ascending}
+        for c in data.columns:
+            if isinstance(data[c].dtype, pd.CategoricalDtype) or data[c].dtype == object:
+                codes, values = pd.factorize(data[c])
+                order = np.argsort(codes, kind="stable")
+                bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+                self.category_rows[c] = {str(v).lower(): order[bounds[i]:bounds[i+1]] for i, v in enumerate(values)}
+            elif pd.api.types.is_numeric_dtype(data[c]):
+                # compare in the column's own dtype, the same as pandas does: the float32 ratios widened to float64
+                # would be off the float32 value of a query like "ROE > 0.15"
+                dtype = data[c].dtype if isinstance(data[c].dtype, np.dtype) and data[c].dtype.kind == "f" \
+                    else np.float64
+                values = data[c].to_numpy(dtype=dtype)
+                rows = np.flatnonzero(~np.isnan(values))
+                order = rows[np.argsort(values[rows], kind="stable")]
+                self.sorted_values[c] = values[order]
+                self.sorted_rows[c] = order
+
+    def get_column(self, name):
+        column = self.columns.get(name.strip().lower())
+        if column is None:
+            raise KeyError(f"unknown metric {name}, metrics are {list(self.data.columns)}")
+        return column
+
+    @staticmethod
+    def parse(query):
+        """
+        parse a query into predicates
+        :param query: predicates joined by "and", e.g. "ROE > 0.15 and sector in Technology, Healthcare"
+        :return: a list of (metric, operator, value) tuples
+        """
+        predicates = []
+        for clause in re.split(r"\s+and\s+", query.strip(), flags=re.IGNORECASE):
+            match = Screener.predicate_pattern.match(clause)
+            if match is None:
+                raise ValueError(f"cannot parse {clause}, expect <metric> <operator> <value> with operators "
+                                 f"{[o.strip() for o in Screener.operators]}")
+            metric, operator, value = match.group(1), match.group(2).strip().lower(), match.group(3)
+            if operator == "in":
+                value = [Screener.__parse_value(v) for v in value.split(",")]
+            else:
+                value = Screener.__parse_value(value)
+            predicates.append((metric, "==" if operator == "=" else operator, value))
+        return predicates
+
+    @staticmethod
+    def __parse_value(value):
+        value = value.strip().strip("'\"")
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+    def select(self, metric, operator, value):
+        """
+        find the rows satisfying one predicate
+        :return: the rows (positions in the snapshot) ascending
+        """
+        column = self.get_column(metric)
+        if column in self.category_rows:
+            rows = self.category_rows[column]
+            values = value if isinstance(value, list) else [value]
+            selected = [rows.get(str(v).lower(), np.array([], dtype=np.int64)) for v in values]
+            if operator in ("==", "in"):
+                return np.sort(np.concatenate(selected))
+            if operator == "!=":
+                return np.setdiff1d(np.arange(len(self.tickers)), np.concatenate(selected))
+            raise ValueError(f"{column} is categorical, only ==, != and in apply")
+
+        if column not in self.sorted_values:
+            raise ValueError(f"cannot screen by {column}")
+        values, rows = self.sorted_values[column], self.sorted_rows[column]
+        if operator == "in":
+            return np.sort(np.concatenate([self.select(metric, "==", v) for v in value]))
+        value = values.dtype.type(value)
+        left, right = np.searchsorted(values, value, side="left"), np.searchsorted(values, value, side="right")
+        if operator == ">":
+            selected = rows[right:]
+        elif operator == ">=":
+            selected = rows[left:]
+        elif operator == "<":
+            selected = rows[:left]
+        elif operator == "<=":
+            selected = rows[:right]
+        elif operator == "==":
+            selected = rows[left:right]
+        elif operator == "!=":
+            # a missing value differs from any value, the same as pandas and the categorical columns
+            return np.setdiff1d(np.arange(len(self.tickers)), rows[left:right])
+        else:
+            raise ValueError(f"unknown operator {operator}")
+        return np.sort(selected)
+
+    def get_mask(self, predicates):
+        """
+        :param predicates: a query string, or a list of (metric, operator, value) tuples, all of which must hold
+        :return: a boolean array marking the rows satisfying all predicates
+        """
+        if isinstance(predicates, str):
+            predicates = Screener.parse(predicates)
+        mask = np.ones(len(self.tickers), dtype=bool)
+        for metric, operator, value in predicates:
+            selected = np.zeros(len(self.tickers), dtype=bool)
+            selected[self.select(metric, operator, value)] = True
+            mask &= selected
+        return mask
+
+    def screen(self, predicates, columns=None):
+        """
+        screen the snapshot
+        :param predicates: a query string, or a list of (metric, operator, value) tuples
+        :param columns: the columns to return, all columns if None
+        :return: a data frame of the tickers satisfying all predicates
+        """
+        rows = np.flatnonzero(self.get_mask(predicates))
+        data = self.data.iloc[rows]
+        return data if columns is None else data[[self.get_column(c) for c in columns]]
+
+    def top(self, metric, k=10, predicates=None, ascending=False, columns=None):
+        """
+        rank tickers by a metric
+        :param metric: the metric to rank by, tickers without it are left out
+        :param k: how many tickers to return
+        :param predicates: optional, only rank the tickers satisfying them
+        :param ascending: rank the smallest first, e.g. for liability/asset ratio
+        :param columns: the columns to return, all columns if None
+        :return: a data frame of the top k tickers in rank order
+        """
+        column = self.get_column(metric)
+        if column not in self.sorted_rows:
+            raise ValueError(f"cannot rank by {column}")
+        rows = self.sorted_rows[column] if ascending else self.sorted_rows[column][::-1]
+        if predicates is not None:
+            rows = rows[self.get_mask(predicates)[rows]]
+        data = self.data.iloc[rows[:k]]
+        return data if columns is None else data[[self.get_column(c) for c in columns]]
+
+    @staticmethod
+    def save(data, file_path):
+        """
+        save the tickers of a screening result one per line, e.g. as ./data/first_round_filtering.txt
+        """
+        with open(file_path, "w", encoding="utf-8") as fp:
+            fp.write("\n".join(str(t) for t in data.index) + "\n")
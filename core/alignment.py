@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+# how dates of different assets are joined
+#   inner: only dates all assets have a price on
+#   outer: all dates any asset has a price on, a missing price is the last known price (NaN before an asset starts)
+#   common_start: like outer, from the first date all assets have started on, so there is no NaN
+join_policies = ["inner", "outer", "common_start"]
+
+
+class AlignedMatrix:
+    """
+    Prices of several assets aligned on one date index, held as one contiguous dates x assets float64 array. It's
+    built in one pass over all price series instead of merging them one at a time, and returns are derived from the
+    aligned prices.
+    """
+    def __init__(self, values, dates, tickers):
+        self.values = values
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = list(tickers)
+
+    @staticmethod
+    def build(series_list, join="inner"):
+        """
+        align price series
+        :param series_list: a list of price Series indexed by date, each named by its ticker
+        :param join: one of join_policies
+        :return: an AlignedMatrix
+        """
+        if join not in join_policies:
+            raise ValueError(f"unknown join policy {join}, expect one of {join_policies}")
+        tickers = [s.name for s in series_list]
+        if len(series_list) == 0:
+            return AlignedMatrix(np.empty((0, 0)), pd.DatetimeIndex([]), tickers)
+        indexes = [pd.DatetimeIndex(s.index).as_unit("ns").asi8 for s in series_list]
+        dates = np.unique(np.concatenate(indexes))
+
+        values = np.full((len(dates), len(series_list)), np.nan)
+        for i, (s, index) in enumerate(zip(series_list, indexes)):
+            values[np.searchsorted(dates, index), i] = s.to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+
+        if join == "inner":
+            rows = valid.all(axis=1)
+            values, dates = values[rows], dates[rows]
+        else:
+            # forward fill: each row takes the value of the latest row with a price, per column
+            last = np.where(valid, np.arange(len(dates))[:, None], 0)
+            np.maximum.accumulate(last, axis=0, out=last)
+            values = values[last, np.arange(len(series_list))]
+            if join == "common_start":
+                # an asset without any price never starts, leaving no common date
+                start = max(index.min() if len(index) > 0 else np.iinfo(np.int64).max for index in indexes)
+                rows = dates >= start
+                values, dates = values[rows], dates[rows]
+        return AlignedMatrix(np.ascontiguousarray(values), pd.DatetimeIndex(dates.astype("datetime64[ns]")), tickers)
+
+    def get_prices(self):
+        """
+        :return: a dates x tickers data frame of the aligned prices
+        """
+        return pd.DataFrame(self.values, index=self.dates, columns=self.tickers, copy=False)
+
+    def get_returns(self):
+        """
+        :return: a dates x tickers data frame of the daily returns between consecutive aligned dates, the first date
+        has no return and is left out
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = self.values[1:] / self.values[:-1] - 1
+        return pd.DataFrame(returns, index=self.dates[1:], columns=self.tickers, copy=False)
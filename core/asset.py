@@ -1,14 +1,21 @@
 import random
-import yfinance as yf
+import numpy as np
+import pandas as pd
 import quantstats as qs
 import matplotlib.pyplot as plt
+from core.price_provider import YahooPriceProvider
+from core.resample import resample_return, periods_per_year
+from core.rolling_moments import RollingMoments
 
 
 class Asset:
-    def __init__(self, ticker, ohlc="Open", interval="1d"):
+    price_provider = YahooPriceProvider()
+
+    def __init__(self, ticker, ohlc="Open", interval="1d", price_provider=None):
         self.ticker = ticker
         self.ohlc = ohlc
         self.interval = interval
+        self.price_provider = price_provider if price_provider is not None else Asset.price_provider
         self.daily_price = None
         self.daily_price_change = None
 
@@ -19,8 +26,14 @@ class Asset:
         qs.reports.html(self.daily_price_change[self.ticker], "IVV", title=f"{self.ticker} 5Y performance", output=report_path)
 
     def get_price(self, period="5y", start_date=None, end_date=None):
-        data = yf.Ticker(self.ticker).history(period=period, interval=self.interval, start=start_date, end=end_date,
-                                              auto_adjust=False)[[self.ohlc]].dropna(axis=0, how="all")
+        self.set_price(self.price_provider.get_history(self.ticker, interval=self.interval, period=period,
+                                                       start_date=start_date, end_date=end_date))
+
+    def set_price(self, history):
+        """
+        set the price of this asset from an OHLC history returned by a price provider
+        """
+        data = history[[self.ohlc]].dropna(axis=0, how="all")
         data = data.rename(columns={self.ohlc: self.ticker})
         self.daily_price = data[[self.ticker]][data[self.ticker] > 0.000001]
         self.daily_price_change = self.daily_price.pct_change().dropna(axis=0, how="all")
@@ -30,16 +43,48 @@ class Asset:
             self.get_price(start_date=start)
         return [self.daily_price_change[self.ticker].mean()*252, self.daily_price_change[self.ticker].std()*pow(252, 1/2), self.get_beta()]
 
-    # get 5-year monthly beta
-    def get_beta(self, spy=None):
+    def get_price_change(self, interval="1d"):
+        """
+        get the price change of this asset at an interval, derived from the loaded daily price without downloading
+        :param interval: "1d", "1wk", "1mo" or "3mo"
+        :return: a data frame with one column named by the ticker
+        """
+        if self.daily_price is None:
+            self.get_price()
+        if interval == self.interval:
+            return self.daily_price_change
+        if self.interval != "1d":
+            raise ValueError(f"cannot derive {interval} price change from {self.interval} price of {self.ticker}")
+        return resample_return(self.daily_price, interval, self.ohlc)
+
+    def get_annual_return_risk(self, interval="1d"):
+        """
+        get the annualized return and risk from the price change at an interval
+        :return: a list [annual return, annual risk]
+        """
+        price_change = self.get_price_change(interval)[self.ticker]
+        return [price_change.mean()*periods_per_year[interval], price_change.std()*pow(periods_per_year[interval], 1/2)]
+
+    def get_rolling_return_risk(self, window="252D", schedule=slice(252, None, 253)):
+        """
+        get the daily return and risk over a rolling window, streamed through RollingMoments in one pass
+        :param window: a number of days or a time span like "252D", see RollingMoments
+        :param schedule: the snapshots to take, see RollingMoments.run, default is every 253rd day
+        :return: a data frame indexed by the snapshot dates, with columns return and risk
+        """
+        if self.daily_price_change is None:
+            self.get_price()
+        dates, means, covariances = RollingMoments.run(self.daily_price_change[[self.ticker]], window=window,
+                                                       schedule=schedule)
+        return pd.DataFrame({"return": means[:, 0], "risk": np.sqrt(covariances[:, 0, 0])}, index=dates)
+
+    # get monthly beta, 5-year by default
+    def get_beta(self, spy=None, interval="1mo"):
         if spy is None:
-            spy = Asset("SPY", interval="1mo")
-            spy.get_price()
-        original_interval = self.interval
-        self.interval = '1mo'
-        self.get_price()
-        self.interval = original_interval
-        return (spy.daily_price_change["SPY"].cov(self.daily_price_change[self.ticker])/spy.daily_price_change.var())[0]
+            from core.benchmark import benchmarks  # imported here, core.benchmark depends on this module
+            spy = benchmarks.get("SPY")
+        spy_price_change = spy.get_price_change(interval)[spy.ticker]
+        return spy_price_change.cov(self.get_price_change(interval)[self.ticker]) / spy_price_change.var()
 
     @staticmethod
     def plot_yearly_return_risk(assets_list):
@@ -57,9 +102,8 @@ class Asset:
                 clr = "#"+"".join([random.choice("0123456789ABCDEF") for j in range(6)])
                 plots.append(plt.plot(a.daily_price_change.std(), a.daily_price_change.mean(), label=f"{a.ticker} 5Y",
                                       marker="^", color=clr))
-                retn = a.daily_price_change.rolling("252D").mean()[252::253]
-                risk = a.daily_price_change.rolling("252D").std()[252::253]
-                plots.append(plt.scatter(x=risk, y=retn, s=15, alpha=0.8, color=clr, marker="x"))
+                rolling = a.get_rolling_return_risk()
+                plots.append(plt.scatter(x=rolling["risk"], y=rolling["return"], s=15, alpha=0.8, color=clr, marker="x"))
             except Exception:
                 print(f"ERROR: cannot get price data for {asset}")
         plt.title("252-day return and risk over past 5 years")
@@ -77,9 +121,9 @@ class Asset:
             try:
                 a = Asset(asset)
                 a.get_price()
-                retn = a.daily_price_change.rolling("252D").mean()[252::253].values.tolist()
-                risk = a.daily_price_change.rolling("252D").std()[252::253].values.tolist()
-                rr = [f"({round(x[0]*252*100, 5)}%,{round(y[0]*pow(252, 1/2)*100, 5)}%)" for (x, y) in zip(retn, risk)]
+                rolling = a.get_rolling_return_risk()
+                rr = [f"({round(x*252*100, 5)}%,{round(y*pow(252, 1/2)*100, 5)}%)" for (x, y) in
+                      zip(rolling["return"], rolling["risk"])]
                 print(f"{a.ticker}{(5-len(a.ticker))*' '}average annual return={round(a.daily_price_change.mean()[0]*252, 4)}, "
                       f"daily risk={round(a.daily_price_change.std()[0]*pow(252, 1/2), 4)}, {rr}")
             except Exception:
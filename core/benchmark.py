@@ -0,0 +1,59 @@
+import threading
+from core.asset import Asset
+from core.price_store import PriceStore
+from core.price_provider import YahooPriceProvider
+
+
+class BenchmarkRegistry:
+    """
+    A process-wide registry of benchmark assets (e.g. SPY). A benchmark is loaded the first time it's asked for and
+    shared afterwards, so importing a module never downloads anything and a run downloads each benchmark once.
+    """
+    def __init__(self):
+        self.benchmarks = {}
+        self.lock = threading.Lock()
+
+    def get(self, ticker="SPY", interval="1d", period="5y"):
+        """
+        get a benchmark asset with its price loaded, loading it if it's not in the registry yet
+        :param ticker: the benchmark ticker
+        :param interval: bar interval of the benchmark price
+        :param period: how long the price history is
+        :return: an Asset
+        """
+        key = (ticker, interval, period)
+        with self.lock:
+            if key not in self.benchmarks:
+                benchmark = Asset(ticker, interval=interval)
+                benchmark.get_price(period=period)
+                self.benchmarks[key] = benchmark
+            return self.benchmarks[key]
+
+    def warm(self, ticker="SPY", interval="1d", period="5y", price_provider=None, offline=True):
+        """
+        put a benchmark into the registry from a cache, e.g. in a pool worker after the parent process downloaded it
+        :param price_provider: where to load the price from, default is the on-disk price store
+        :param offline: when loading from the price store, only read what is stored, never download
+        :return: the benchmark Asset
+        """
+        if price_provider is None:
+            price_provider = YahooPriceProvider(PriceStore(offline=offline))
+        benchmark = Asset(ticker, interval=interval, price_provider=price_provider)
+        benchmark.get_price(period=period)
+        with self.lock:
+            self.benchmarks[(ticker, interval, period)] = benchmark
+        return benchmark
+
+    def set(self, benchmark, period="5y"):
+        """
+        put a benchmark asset with its price loaded into the registry, e.g. one pickled to a pool worker
+        """
+        with self.lock:
+            self.benchmarks[(benchmark.ticker, benchmark.interval, period)] = benchmark
+
+    def clear(self):
+        with self.lock:
+            self.benchmarks = {}
+
+
+benchmarks = BenchmarkRegistry()
@@ -2,13 +2,13 @@ import datetime as dt
 import seaborn as sns
 from datetime import datetime
 from core.asset import *
+from core.benchmark import benchmarks
 from common.financial_insight import *
+from common.fetch_scheduler import FetchError, classify_failure, price_scheduler
 
 
 class Company:
-    spy = Asset("SPY", interval="1mo")
-    spy.get_price()
-    api_key = "ef7be903a5ace951c13f320358723e0f"
+    profile_endpoint = "company/profile"
 
     def __init__(self, ticker, quarter=False, year=5):
         self.ticker = ticker
@@ -22,25 +22,26 @@ class Company:
         self.sector = ""
         self.stock_average_annual_return = 0
         self.stock_average_annual_risk = 0
-        try_times = 0
+        self.failure = None  # why the profile/price could not be fetched, see classify_failure
         try:
-            while try_times < 3:
-                data = requests.get(f"https://financialmodelingprep.com/api/v3/company/profile/{ticker}?apikey={Company.api_key}").json()["profile"]
-                self.beta = data['beta']
-                self.industry = data['industry']
-                self.current_market_cap = data['mktCap']
-                self.current_price = data['price']
-                self.sector = data['sector']
-                stock = Asset(self.ticker, interval="1mo")
-                stock.get_price()
-                self.beta = stock.get_beta(spy=Company.spy)
-                self.stock_average_annual_return = stock.daily_price_change.mean()[0]*12  # it's monthly data
-                self.stock_average_annual_risk = stock.daily_price_change.std()[0] * pow(12, 1/2)
-                print(f" -- {self.ticker} got 5 year monthly, annual return, risk & beta")
-                break
+            # rate limiting and retries of the requests are handled by the fetch schedulers
+            data = fmp_client.get(Company.profile_endpoint, ticker)["profile"]
+            self.beta = data['beta']
+            self.industry = data['industry']
+            self.current_market_cap = data['mktCap']
+            self.current_price = data['price']
+            self.sector = data['sector']
+            stock = Asset(self.ticker)
+            price_scheduler.call(stock.get_price)
+            if len(stock.daily_price) == 0:
+                raise FetchError("no_data", f"{self.ticker} has no price data")
+            self.beta = stock.get_beta(spy=benchmarks.get("SPY"))
+            # monthly return & risk, derived from the daily price
+            self.stock_average_annual_return, self.stock_average_annual_risk = stock.get_annual_return_risk("1mo")
+            print(f" -- {self.ticker} got 5 year monthly, annual return, risk & beta")
         except Exception as e:
-            print(f" -- {self.ticker} cannot get price/profile/beta/return/risk, retrying")
-            try_times += 1
+            self.failure = classify_failure(e)
+            print(f" -- {self.ticker} cannot get price/profile/beta/return/risk ({self.failure}): {e}")
 
     def print_financials(self):
         if self.financial_insights is None:
@@ -88,14 +89,20 @@ class Company:
         self.financial_insights.get_investing_insights(self.beta, risk_free_return)
         return self.financial_insights.investing["mean"]
 
-    def serialize_fundamentals_summary(self, risk_free_return):
+    def get_fundamentals_row(self, risk_free_return):
+        """
+        :return: a list of this company's fundamentals, in the order of FUNDAMENTALS_ITEMS
+        """
         if self.financial_insights is None:
             self.financial_insights = FinancialInsight(self.ticker)
         self.financial_insights.get_summary(self.beta, risk_free_return)
-        return f"{self.ticker}\t{self.current_market_cap}\t{self.industry}\t{self.sector}\t{self.current_price}\t" + \
-               '\t'.join([str(x) for x in self.financial_insights.insights_summary[(self.ticker, "mean")][0:22].values])\
-               + f"\t{self.financial_insights.dcf_valuation}\t{self.beta}\t{self.stock_average_annual_return}" \
-                 f"\t{self.stock_average_annual_risk}\n"
+        return [self.ticker, self.current_market_cap, self.industry, self.sector, self.current_price] + \
+            list(self.financial_insights.insights_summary[(self.ticker, "mean")][0:23].values) + \
+            [self.financial_insights.dcf_valuation, self.beta, self.stock_average_annual_return,
+             self.stock_average_annual_risk, self.financial_insights.statement_date]
+
+    def serialize_fundamentals_summary(self, risk_free_return):
+        return '\t'.join([str(x) for x in self.get_fundamentals_row(risk_free_return)]) + "\n"
 
     def plot_stock_price_with_revenue(self, quarter=True):
         if self.financial_insights is None:
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+
+class Moments:
+    """
+    The mean vector and covariance matrix of asset daily returns, computed once and shared by everything evaluating
+    portfolio weights, so an optimizer's objective is a few small matrix-vector products instead of recomputing the
+    covariance from the whole return history at every call. The Cholesky factor of the covariance is computed the
+    first time it's asked for.
+    """
+    def __init__(self, returns):
+        """
+        :param returns: a dates x assets data frame of daily returns
+        """
+        self.source = returns  # the data frame the moments are computed from
+        self.tickers = list(returns.columns)
+        self.dates = returns.index
+        self.returns = returns.to_numpy(dtype=np.float64)
+        if np.isnan(self.returns).any():
+            # pandas skips missing returns, pairwise for the covariance
+            self.mean = returns.mean().to_numpy(dtype=np.float64)
+            self.covariance = returns.cov().to_numpy(dtype=np.float64)
+        else:
+            self.mean = self.returns.mean(axis=0)
+            self.covariance = np.atleast_2d(np.cov(self.returns, rowvar=False))
+        self.__cholesky = None
+
+    @staticmethod
+    def from_estimates(mean, covariance, tickers=None):
+        """
+        build moments from a mean and covariance estimated elsewhere, e.g. by RollingMoments, without a return history
+        so get_portfolio_returns isn't available
+        :param mean: the N mean daily returns
+        :param covariance: the N x N covariance of the daily returns
+        :param tickers: the N tickers
+        :return: a Moments
+        """
+        moments = Moments.__new__(Moments)
+        moments.mean = np.asarray(mean, dtype=np.float64)
+        moments.covariance = np.atleast_2d(np.asarray(covariance, dtype=np.float64))
+        moments.tickers = list(tickers) if tickers is not None else list(range(len(moments.mean)))
+        moments.source = None
+        moments.dates = None
+        moments.returns = None
+        moments.__cholesky = None
+        return moments
+
+    @property
+    def cholesky(self):
+        """
+        :return: the lower triangular L with L @ L.T = covariance, a tiny ridge is added if the covariance is singular
+        """
+        if self.__cholesky is None:
+            covariance = self.covariance
+            ridge = 0
+            while True:
+                try:
+                    self.__cholesky = np.linalg.cholesky(covariance + ridge * np.eye(len(covariance)))
+                    break
+                except np.linalg.LinAlgError:
+                    ridge = max(ridge * 10, 1e-12 * max(np.trace(covariance), 1e-12))
+        return self.__cholesky
+
+    def get_return(self, weights):
+        """
+        :return: the expected daily return of a portfolio
+        """
+        return np.asarray(weights, dtype=np.float64) @ self.mean
+
+    def get_variance(self, weights):
+        """
+        :return: the daily return variance of a portfolio
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        return weights @ self.covariance @ weights
+
+    def get_risk(self, weights):
+        """
+        :return: the daily risk (return standard deviation) of a portfolio
+        """
+        return np.sqrt(self.get_variance(weights))
+
+    def get_portfolio_returns(self, weights):
+        """
+        :return: the daily returns of a portfolio as an array
+        """
+        return self.returns @ np.asarray(weights, dtype=np.float64)
+
+    def get_covariance_frame(self):
+        return pd.DataFrame(self.covariance, index=self.tickers, columns=self.tickers)
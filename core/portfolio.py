@@ -1,6 +1,7 @@
-import pandas as pd
 import seaborn as sns
 from core.asset import *
+from core.alignment import AlignedMatrix
+from core.moments import Moments
 
 
 class Portfolio:
@@ -10,20 +11,23 @@ class Portfolio:
         self.asset_weights = []
         self.full_asset_price_history = None
         self.full_asset_price_history_change = None
+        self.moments = None  # moments of full_asset_price_history_change, see get_moments
         self.total_cost = 0
         self.book_value = None
 
     def invest(self, asset_tickers, strategy=None, customized_weights=None, show_details=False, show_plot=False,
-               period=None, start_date=None, end_date=None, ohlc="Open"):
+               period=None, start_date=None, end_date=None, ohlc="Open", price_provider=None, join="inner"):
         self.assets = []
+        price_provider = price_provider if price_provider is not None else Asset.price_provider
+        if period is not None:
+            histories = price_provider.get_histories(asset_tickers, period=period)
+        elif start_date or end_date is not None:
+            histories = price_provider.get_histories(asset_tickers, start_date=start_date, end_date=end_date)
+        else:
+            histories = price_provider.get_histories(asset_tickers)
         for ticker in asset_tickers:
-            a = Asset(ticker, ohlc=ohlc)
-            if period is not None:
-                a.get_price(period=period)
-            elif start_date or end_date is not None:
-                a.get_price(start_date=start_date, end_date=end_date)
-            else:
-                a.get_price()
+            a = Asset(ticker, ohlc=ohlc, price_provider=price_provider)
+            a.set_price(histories[ticker])
             self.assets.append(a)
             self.asset_shares[ticker] = 0
 
@@ -32,13 +36,10 @@ class Portfolio:
         elif len(self.asset_weights) == 0:
             self.asset_weights = [1/len(asset_tickers)] * len(asset_tickers)
 
-        self.full_asset_price_history = self.assets[0].daily_price
-        self.full_asset_price_history_change = self.assets[0].daily_price_change
-        for i in range(1, len(self.assets)):
-            self.full_asset_price_history = pd.merge(self.full_asset_price_history, self.assets[i].daily_price, left_index=True, right_index=True)
-            self.full_asset_price_history_change = pd.merge(self.full_asset_price_history_change, self.assets[i].daily_price_change, left_index=True, right_index=True)
-        self.full_asset_price_history = self.full_asset_price_history.dropna(axis=0,how='all')
-        self.full_asset_price_history_change = self.full_asset_price_history_change.dropna(axis=0,how='all')
+        # join="inner" keeps the dates all assets have a price on, see core.alignment for the other policies
+        aligned = AlignedMatrix.build([a.daily_price[a.ticker] for a in self.assets], join=join)
+        self.full_asset_price_history = aligned.get_prices().dropna(axis=0, how='all')
+        self.full_asset_price_history_change = aligned.get_returns().dropna(axis=0, how='all')
 
         if strategy is not None:
             strategy.fit(self, customized_weights=customized_weights, show_details=show_details, show_plot=show_plot)
@@ -46,8 +47,18 @@ class Portfolio:
     def get_assets_correlation(self):
         return self.full_asset_price_history_change.corr(method="pearson")
 
+    def get_moments(self):
+        """
+        get the mean and covariance of the asset daily returns, computed once per price history: they are recomputed
+        only after full_asset_price_history_change is replaced, e.g. by invest
+        :return: a Moments
+        """
+        if self.moments is None or self.moments.source is not self.full_asset_price_history_change:
+            self.moments = Moments(self.full_asset_price_history_change)
+        return self.moments
+
     def get_assets_covariance(self):
-        return self.full_asset_price_history_change.cov()
+        return self.get_moments().get_covariance_frame()
 
     def plot_asset_correlation(self):
        corr = self.get_assets_correlation()
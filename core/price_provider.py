@@ -0,0 +1,72 @@
+import os
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from core.price_store import PriceStore
+
+
+class PriceProvider:
+    """
+    The interface an Asset or a Portfolio uses to get price history. Subclasses implement get_history, and get
+    histories for many tickers at once through get_histories, which fetches them concurrently.
+    """
+    def __init__(self, max_workers=16):
+        self.max_workers = max_workers
+
+    def get_history(self, ticker, interval="1d", period="5y", start_date=None, end_date=None):
+        """
+        get the OHLC history of one ticker
+        :return: a data frame with Open, High, Low, Close, Adj Close, Volume columns indexed by date
+        """
+        raise NotImplementedError
+
+    def get_histories(self, tickers, interval="1d", period="5y", start_date=None, end_date=None):
+        """
+        get the OHLC history of many tickers for the same date range, fetched concurrently
+        :return: a dict of ticker -> history data frame, in the order of tickers
+        """
+        tickers = list(tickers)
+        if len(tickers) <= 1 or self.max_workers <= 1:
+            return {t: self.get_history(t, interval, period, start_date, end_date) for t in tickers}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tickers))) as executor:
+            histories = executor.map(lambda t: self.get_history(t, interval, period, start_date, end_date), tickers)
+            return dict(zip(tickers, histories))
+
+
+class YahooPriceProvider(PriceProvider):
+    """
+    Price history from yahoo finance, served through the on-disk price store
+    """
+    def __init__(self, store=None, max_workers=16):
+        super().__init__(max_workers)
+        self.store = store if store is not None else PriceStore()
+
+    def get_history(self, ticker, interval="1d", period="5y", start_date=None, end_date=None):
+        return self.store.get_history(ticker, interval=interval, period=period, start_date=start_date,
+                                      end_date=end_date)
+
+
+class FixturePriceProvider(PriceProvider):
+    """
+    Price history from local csv fixture files named {ticker}_{interval}.csv, with a Date column followed by the OHLC
+    columns. Useful to run portfolios and strategies without network access.
+    """
+    def __init__(self, root, max_workers=1):
+        super().__init__(max_workers)
+        self.root = root
+
+    def get_path(self, ticker, interval):
+        return os.path.join(self.root, f"{ticker.replace('/', '_')}_{interval}.csv")
+
+    def get_history(self, ticker, interval="1d", period="5y", start_date=None, end_date=None):
+        path = self.get_path(ticker, interval)
+        if not os.path.exists(path):
+            raise LookupError(f"cannot find price fixture {path}")
+        data = pd.read_csv(path, index_col="Date", parse_dates=True).reindex(columns=PriceStore.columns)
+        return PriceStore.slice(data.sort_index(), period, start_date, end_date)
+
+    def save(self, ticker, interval, data):
+        """
+        write a history as a fixture file, e.g. to capture what another provider returned
+        """
+        os.makedirs(self.root, exist_ok=True)
+        data.reindex(columns=PriceStore.columns).to_csv(self.get_path(ticker, interval), index_label="Date")
@@ -0,0 +1,130 @@
+import os
+import time
+import threading
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+
+class PriceStore:
+    """
+    An on-disk price store. Each (ticker, interval) pair is kept in one .npz file holding the full OHLC history, so
+    repeated runs read the local copy and only download the bars after the last stored date.
+    """
+    default_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "prices")
+    columns = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+    def __init__(self, root=None, refresh_interval=12*60*60, offline=False):
+        """
+        construct a price store
+        :param root: the folder holding the .npz files, default is ./data/prices
+        :param refresh_interval: seconds before a stored history is considered stale and its tail is topped up
+        :param offline: never touch the network, serve whatever is stored
+        """
+        self.root = root if root is not None else PriceStore.default_root
+        self.refresh_interval = refresh_interval
+        self.offline = offline
+
+    def get_path(self, ticker, interval):
+        return os.path.join(self.root, f"{ticker.replace('/', '_')}_{interval}.npz")
+
+    def load(self, ticker, interval):
+        """
+        load the stored history of a ticker
+        :return: a tuple (history data frame, last fetch unix time), or (None, 0) if nothing is stored
+        """
+        path = self.get_path(ticker, interval)
+        if not os.path.exists(path):
+            return None, 0
+        with np.load(path, allow_pickle=False) as npz:
+            data = pd.DataFrame(npz["values"], index=pd.to_datetime(npz["dates"]), columns=npz["columns"].tolist())
+            fetched_at = float(npz["fetched_at"])
+        data.index.name = "Date"
+        return data, fetched_at
+
+    def save(self, ticker, interval, data, fetched_at=None):
+        """
+        save the history of a ticker. The file is written to a temporary path first and then moved in place, so a
+        concurrent reader (thread or process) never sees a half-written file
+        """
+        os.makedirs(self.root, exist_ok=True)
+        path = self.get_path(ticker, interval)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp_path, dates=data.index.values.astype("datetime64[ns]").astype(np.int64),
+                 values=data.to_numpy(dtype=np.float64), columns=np.array(data.columns.tolist(), dtype=str),
+                 fetched_at=np.float64(time.time() if fetched_at is None else fetched_at))
+        os.replace(tmp_path, path)
+
+    def get_history(self, ticker, interval="1d", period="5y", start_date=None, end_date=None):
+        """
+        get the OHLC history of a ticker, served from the store and topped up with the missing tail if stale
+        :param ticker: asset ticker
+        :param interval: bar interval, same as yfinance
+        :param period: same as yfinance, ignored if start_date or end_date is set
+        :param start_date: first date to return (inclusive)
+        :param end_date: last date to return (exclusive, same as yfinance)
+        :return: a data frame with Open, High, Low, Close, Adj Close, Volume columns indexed by date
+        """
+        data, fetched_at = self.load(ticker, interval)
+        if data is None:
+            if self.offline:
+                raise LookupError(f"{ticker} {interval} is not in the price store at {self.root}")
+            data = self.__download(ticker, interval, period="max")
+            self.save(ticker, interval, data)
+        elif not self.offline and not self.__covers(fetched_at, end_date) and time.time() - fetched_at > self.refresh_interval:
+            data = self.__top_up(ticker, interval, data)
+            self.save(ticker, interval, data)
+        return PriceStore.slice(data, period, start_date, end_date)
+
+    @staticmethod
+    def __covers(fetched_at, end_date):
+        # a history fetched after end_date already holds every bar before end_date
+        return end_date is not None and pd.Timestamp(fetched_at, unit="s") >= pd.Timestamp(end_date)
+
+    def __top_up(self, ticker, interval, data):
+        if len(data) == 0:
+            return self.__download(ticker, interval, period="max")
+        # re-download from the last completed stored bar: the overlapping bar tells whether the history was
+        # re-adjusted (e.g. a split), in which case the whole history has to be downloaded again. The last stored bar
+        # may be a partial bar of the day it was fetched, which never matches the re-downloaded one, so the overlap is
+        # compared on the bar before it
+        overlap = data.index[-2] if len(data) > 1 else data.index[-1]
+        tail = self.__download(ticker, interval, start_date=overlap)
+        if len(tail) == 0:
+            return data
+        if overlap in tail.index and not np.allclose(tail.loc[overlap, ["Open", "Close"]].to_numpy(dtype=np.float64),
+                                                     data.loc[overlap, ["Open", "Close"]].to_numpy(dtype=np.float64),
+                                                     rtol=1e-6, equal_nan=True):
+            return self.__download(ticker, interval, period="max")
+        data = pd.concat([data[data.index < tail.index[0]], tail])
+        return data[~data.index.duplicated(keep="last")]
+
+    @staticmethod
+    def __download(ticker, interval, period=None, start_date=None):
+        data = yf.Ticker(ticker).history(period=period, interval=interval, start=start_date, auto_adjust=False)
+        data = data.reindex(columns=PriceStore.columns).astype(np.float64)
+        if data.index.tz is not None:
+            data.index = data.index.tz_localize(None)
+        data.index.name = "Date"
+        return data.sort_index()
+
+    @staticmethod
+    def slice(data, period="5y", start_date=None, end_date=None):
+        """
+        slice a stored history the same way yfinance interprets period, start and end
+        """
+        if start_date is not None or end_date is not None:
+            if start_date is not None:
+                data = data[data.index >= pd.Timestamp(start_date)]
+            if end_date is not None:
+                data = data[data.index < pd.Timestamp(end_date)]
+            return data
+        if period is None or period == "max":
+            return data
+        today = pd.Timestamp.today().normalize()
+        if period == "ytd":
+            return data[data.index >= pd.Timestamp(year=today.year, month=1, day=1)]
+        for suffix, unit in (("mo", "months"), ("d", "days"), ("y", "years")):
+            if period.endswith(suffix):
+                return data[data.index >= today - pd.DateOffset(**{unit: int(period[:-len(suffix)])})]
+        raise ValueError(f"unknown period {period}")
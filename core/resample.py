@@ -0,0 +1,33 @@
+# number of bars per year for each interval, used to annualize returns and risks
+periods_per_year = {"1d": 252, "1wk": 52, "1mo": 12, "3mo": 4}
+
+# pandas resample rules labeling each bar at its start, the same as yfinance weekly/monthly/quarterly bars
+resample_rules = {"1wk": "W-MON", "1mo": "MS", "3mo": "QS"}
+
+# how a daily price column aggregates into a longer bar
+ohlc_aggregations = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Adj Close": "last",
+                     "Volume": "sum"}
+
+
+def resample_price(daily_price, interval, ohlc="Open"):
+    """
+    derive weekly/monthly/quarterly prices from daily prices
+    :param daily_price: a data frame (or series) of daily prices indexed by date
+    :param interval: the target interval, "1d" returns daily_price as is
+    :param ohlc: which price daily_price holds, decides how days aggregate into one bar (e.g. Open takes the first)
+    :return: the resampled prices, bars labeled by their start date
+    """
+    if interval == "1d":
+        return daily_price
+    if interval not in resample_rules:
+        raise ValueError(f"cannot resample daily price to {interval}")
+    resampled = daily_price.resample(resample_rules[interval], closed="left", label="left")
+    return resampled.agg(ohlc_aggregations[ohlc]).dropna(axis=0, how="all")
+
+
+def resample_return(daily_price, interval, ohlc="Open"):
+    """
+    derive weekly/monthly/quarterly returns from daily prices
+    :return: the price change between consecutive resampled bars
+    """
+    return resample_price(daily_price, interval, ohlc).pct_change().dropna(axis=0, how="all")
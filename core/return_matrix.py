@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from core.asset import Asset
+
+
+class ReturnMatrix:
+    """
+    A dates x tickers float64 matrix of prices or daily returns, stored as a .npy file with a .json index (dates and
+    ticker -> column). Pool workers attach to the file memory-mapped, so all processes share one copy of the data.
+    """
+    attached = {}  # per-process cache of attached matrices, keyed by path
+
+    def __init__(self, values, dates, tickers, kind="return", path=None):
+        self.values = values
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = list(tickers)
+        self.columns = {t: i for i, t in enumerate(self.tickers)}
+        self.kind = kind
+        self.path = path
+
+    @staticmethod
+    def get_index_path(path):
+        return os.path.splitext(path)[0] + ".json"
+
+    @staticmethod
+    def build(path, tickers, kind="return", ohlc="Open", period="5y", start_date=None, end_date=None,
+              price_provider=None, batch_size=200):
+        """
+        fetch the price history of all tickers and write them into one matrix file
+        :param path: the .npy file to write
+        :param tickers: tickers to put into the matrix, tickers without price data are left out
+        :param kind: "return" for daily returns, "price" for prices
+        :param ohlc: which price to use
+        :param batch_size: how many tickers to fetch concurrently at a time
+        :return: the memory-mapped ReturnMatrix, and the list of tickers failed to get prices
+        """
+        price_provider = price_provider if price_provider is not None else Asset.price_provider
+        tickers = list(dict.fromkeys(tickers))
+        series = {}
+        tickers_failed = []
+
+        def fetch(ticker):
+            try:
+                return price_provider.get_history(ticker, period=period, start_date=start_date, end_date=end_date)
+            except Exception:
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, price_provider.max_workers)) as executor:
+            for i in range(0, len(tickers), batch_size):
+                batch = tickers[i:i+batch_size]
+                for ticker, history in zip(batch, executor.map(fetch, batch)):
+                    try:
+                        a = Asset(ticker, ohlc=ohlc, price_provider=price_provider)
+                        a.set_price(history)
+                        data = a.daily_price_change if kind == "return" else a.daily_price
+                        if len(data) == 0:
+                            raise ValueError(f"{ticker} has no price data")
+                        series[ticker] = data[ticker]
+                    except Exception:
+                        tickers_failed.append(ticker)
+
+        dates = pd.DatetimeIndex(sorted(set().union(*[s.index for s in series.values()]))) if series \
+            else pd.DatetimeIndex([])
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        # column-major, so the column of each ticker is one contiguous block of the file
+        values = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float64, shape=(len(dates), len(series)),
+                                           fortran_order=True)
+        for i, s in enumerate(series.values()):
+            values[:, i] = s.reindex(dates).to_numpy(dtype=np.float64)
+        values.flush()
+        del values
+        ReturnMatrix.__replace(path, tmp_path, kind, list(series.keys()), dates)
+        return ReturnMatrix.attach(path), tickers_failed
+
+    @staticmethod
+    def save(path, data, kind="return"):
+        """
+        write a data frame already in memory, e.g. the price changes of a portfolio, into a matrix file
+        :param path: the .npy file to write
+        :param data: a dates x tickers data frame
+        :param kind: "return" for daily returns, "price" for prices
+        :return: the memory-mapped ReturnMatrix
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, np.asfortranarray(data.to_numpy(dtype=np.float64)))
+        ReturnMatrix.__replace(path, tmp_path, kind, list(data.columns), pd.DatetimeIndex(data.index))
+        return ReturnMatrix.attach(path)
+
+    @staticmethod
+    def __replace(path, tmp_path, kind, tickers, dates):
+        # both files are written to temporary paths and moved in place, the index first. The index holds the shape
+        # of its matrix, so a concurrent attach between the two moves sees the mismatch and waits for the new matrix
+        index_path = ReturnMatrix.get_index_path(path)
+        tmp_index_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_index_path, "w", encoding="utf-8") as fp:
+            json.dump({"kind": kind, "tickers": tickers, "dates": [d.strftime("%Y-%m-%d") for d in dates],
+                       "shape": [len(dates), len(tickers)]}, fp)
+        os.replace(tmp_index_path, index_path)
+        os.replace(tmp_path, path)
+        ReturnMatrix.attached.pop(path, None)
+
+    @staticmethod
+    def attach(path, retries=50, retry_interval=0.1):
+        """
+        attach to a matrix file zero-copy (read-only memory map). Repeated calls in the same process reuse the map
+        :param retries: how many times to read the files again if the matrix doesn't match its index, i.e. a
+        concurrent build is between moving the index and the matrix in place
+        :param retry_interval: seconds between the retries
+        """
+        if path not in ReturnMatrix.attached:
+            for _ in range(retries + 1):
+                with open(ReturnMatrix.get_index_path(path), encoding="utf-8") as fp:
+                    index = json.load(fp)
+                values = np.load(path, mmap_mode="r")
+                if "shape" not in index or list(values.shape) == index["shape"]:
+                    break
+                # the index of a matrix being rebuilt is already moved in place, the matrix is not yet
+                time.sleep(retry_interval)
+            else:
+                raise ValueError(f"the matrix at {path} doesn't match its index, shape {list(values.shape)} "
+                                 f"instead of {index['shape']}")
+            ReturnMatrix.attached[path] = ReturnMatrix(values, pd.to_datetime(index["dates"]), index["tickers"],
+                                                       kind=index["kind"], path=path)
+        return ReturnMatrix.attached[path]
+
+    def __contains__(self, ticker):
+        return ticker in self.columns
+
+    def column(self, ticker):
+        """
+        :return: the column of a ticker as a contiguous numpy view (no copy), NaN on dates the ticker has no data
+        """
+        return self.values[:, self.columns[ticker]]
+
+    def get_series(self, ticker):
+        """
+        :return: the data of a ticker as a pandas Series named by the ticker, NaN dates dropped
+        """
+        return pd.Series(self.column(ticker), index=self.dates, name=ticker).dropna()
+
+    def to_frame(self, tickers=None):
+        """
+        :return: a data frame of the given tickers (all tickers if None)
+        """
+        if tickers is None:
+            return pd.DataFrame(self.values, index=self.dates, columns=self.tickers, copy=False)
+        return pd.DataFrame(self.values[:, [self.columns[t] for t in tickers]], index=self.dates, columns=list(tickers))
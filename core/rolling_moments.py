@@ -0,0 +1,144 @@
+from collections import deque
+import numpy as np
+import pandas as pd
+
+
+class RollingMoments:
+    """
+    Streaming mean and covariance of N assets' daily returns over a rolling, expanding or exponentially weighted
+    window. Running sums are updated Welford-style as days are added (and dropped off a rolling window), so advancing
+    one day costs O(N^2) whatever the window length.
+    """
+    def __init__(self, n_assets, window=None, halflife=None, min_periods=1, resync_interval=None):
+        """
+        construct an engine
+        :param n_assets: number of assets
+        :param window: None for an expanding window, a number of days (e.g. 252), or a time span (e.g. "252D", days
+        within the span before the latest date, like pandas rolling("252D"))
+        :param halflife: for an exponentially weighted window, the number of days after which a day's weight halves.
+        The weights follow the recursion of pandas ewm(adjust=False) and the covariance is the biased one
+        :param min_periods: snapshots with fewer days in the window have NaN moments
+        :param resync_interval: recompute the sums from the days in a rolling window after this many days dropped off,
+        so rounding errors of adding and removing days don't accumulate. Default is 10 windows
+        """
+        if window is not None and halflife is not None:
+            raise ValueError("set either window or halflife")
+        self.n_assets = n_assets
+        self.window = window
+        self.span = pd.Timedelta(window) if isinstance(window, str) else None
+        self.alpha = 1 - pow(0.5, 1 / halflife) if halflife is not None else None
+        self.min_periods = min_periods
+        self.resync_interval = resync_interval
+        self.days = deque()  # (date, returns) of the days in a rolling window
+        self.removed = 0
+        self.count = 0
+        self.mean = np.zeros(n_assets)
+        self.comoment = np.zeros((n_assets, n_assets))  # sum of (x - mean)(x - mean)' over the window
+
+    def update(self, date, returns):
+        """
+        add one day, dropping the days falling out of a rolling window
+        :param date: the date of the returns
+        :param returns: an array of the assets' returns on that date, a day with a NaN return is skipped
+        """
+        x = np.asarray(returns, dtype=np.float64)
+        if np.isnan(x).any():
+            return
+        if self.alpha is not None:
+            self.__add_weighted(x)
+            return
+        self.__add(x)
+        if self.window is None:
+            return
+        self.days.append((date, x))
+        if self.span is not None:
+            while self.days and self.days[0][0] <= date - self.span:
+                self.__remove(self.days.popleft()[1])
+        else:
+            while len(self.days) > self.window:
+                self.__remove(self.days.popleft()[1])
+        resync_interval = self.resync_interval if self.resync_interval is not None else 10 * max(len(self.days), 1)
+        if self.removed >= resync_interval:
+            self.__resync()
+
+    def __add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.comoment += np.outer(delta, x - self.mean)
+
+    def __remove(self, x):
+        self.removed += 1
+        if self.count <= 1:
+            self.count, self.mean[:], self.comoment[:] = 0, 0, 0
+            return
+        self.count -= 1
+        delta = x - self.mean
+        self.mean -= delta / self.count
+        self.comoment -= np.outer(delta, x - self.mean)
+
+    def __add_weighted(self, x):
+        self.count += 1
+        if self.count == 1:
+            self.mean = x.copy()
+            return
+        delta = x - self.mean
+        self.mean += self.alpha * delta
+        self.comoment = (1 - self.alpha) * (self.comoment + self.alpha * np.outer(delta, delta))
+
+    def __resync(self):
+        values = np.array([x for _, x in self.days])
+        self.count = len(values)
+        self.mean = values.mean(axis=0)
+        deviation = values - self.mean
+        self.comoment = deviation.T @ deviation
+        self.removed = 0
+
+    def get_mean(self):
+        if self.count < max(self.min_periods, 1):
+            return np.full(self.n_assets, np.nan)
+        return self.mean.copy()
+
+    def get_covariance(self):
+        """
+        :return: the sample covariance (the weighted covariance for an exponentially weighted window)
+        """
+        if self.count < max(self.min_periods, 2 if self.alpha is None else 1):
+            return np.full((self.n_assets, self.n_assets), np.nan)
+        if self.alpha is not None:
+            return self.comoment.copy()
+        return self.comoment / (self.count - 1)
+
+    @staticmethod
+    def run(returns, window=None, halflife=None, schedule=None, min_periods=1):
+        """
+        stream a return matrix through an engine, taking snapshots of the moments on a schedule
+        :param returns: a dates x assets data frame of daily returns
+        :param schedule: when to take snapshots: None for every date, a slice or a list of row positions (e.g.
+        slice(252, None, 253)), or a list of dates in the index
+        :return: the snapshot dates, a K x N array of means and a K x N x N array of covariances
+        """
+        dates = returns.index
+        if schedule is None:
+            rows = range(len(dates))
+        elif isinstance(schedule, slice):
+            rows = range(len(dates))[schedule]
+        elif len(schedule) > 0 and not isinstance(schedule[0], (int, np.integer)):
+            rows = dates.get_indexer(pd.DatetimeIndex(schedule))
+            if (rows < 0).any():
+                raise KeyError(f"snapshot dates not in the returns: {list(pd.DatetimeIndex(schedule)[rows < 0])}")
+        else:
+            rows = schedule
+        rows = sorted(set(rows))
+        values = returns.to_numpy(dtype=np.float64)
+        engine = RollingMoments(values.shape[1], window=window, halflife=halflife, min_periods=min_periods)
+        means = np.empty((len(rows), values.shape[1]))
+        covariances = np.empty((len(rows), values.shape[1], values.shape[1]))
+        i = 0
+        for k, row in enumerate(rows):
+            while i <= row:
+                engine.update(dates[i], values[i])
+                i += 1
+            means[k] = engine.get_mean()
+            covariances[k] = engine.get_covariance()
+        return dates[rows], means, covariances
@@ -0,0 +1,189 @@
+import time
+import numpy as np
+import pandas as pd
+
+
+class UniverseStats:
+    """
+    Computes per-ticker statistics of a whole universe from one wide dates x tickers matrix: annualized return, risk,
+    sharpe ratio, downside deviation, sortino ratio, beta and max drawdown. The matrix is processed a chunk of
+    columns at a time, each chunk in a few vectorized numpy passes, so memory stays within a budget whatever the
+    number of tickers. Missing data (NaN) is skipped per ticker, like pandas does.
+    """
+    # float64 arrays of a chunk's shape alive at once while computing its stats, used to size chunks
+    working_arrays = 6
+
+    # pandas period of each beta interval, days of one period compound into one return
+    beta_periods = {"1wk": "W", "1mo": "M", "3mo": "Q"}
+
+    def __init__(self, memory_budget_mb=256, periods_per_year=252, risk_free_return=0, beta_interval="1mo",
+                 min_observations=20):
+        """
+        construct a universe statistics engine
+        :param memory_budget_mb: max memory the working arrays of a chunk take
+        :param periods_per_year: number of rows per year of the matrix, to annualize
+        :param risk_free_return: annual risk free return, for the sharpe ratio and as the downside target
+        :param beta_interval: "1d" for daily beta, or "1wk"/"1mo"/"3mo" to compound daily returns first, like
+        Asset.get_beta which uses monthly returns
+        :param min_observations: tickers with fewer returns get NaN stats
+        """
+        self.memory_budget_mb = memory_budget_mb
+        self.periods_per_year = periods_per_year
+        self.risk_free_return = risk_free_return
+        self.risk_free_period_yield = pow(1 + risk_free_return, 1 / periods_per_year) - 1
+        self.beta_interval = beta_interval
+        self.min_observations = min_observations
+
+    def get_chunk_size(self, n_rows):
+        return max(1, int(self.memory_budget_mb * 1024 * 1024 // (max(1, n_rows) * 8 * UniverseStats.working_arrays)))
+
+    def compute(self, matrix, benchmark="SPY", benchmark_return=None, show_details=False):
+        """
+        compute the statistics of every ticker in a matrix
+        :param matrix: a ReturnMatrix (returns or prices), or a data frame of daily returns with a column per ticker
+        :param benchmark: the benchmark ticker for beta, taken from the matrix if it's in it
+        :param benchmark_return: a Series of benchmark returns indexed by date, used if the benchmark is not in the
+        matrix. If both are missing, the benchmark is loaded from the benchmark registry
+        :param show_details: print the chunking and time taken
+        :return: a data frame indexed by ticker
+        """
+        t0 = time.perf_counter()
+        values, dates, tickers, kind = UniverseStats.__unpack(matrix)
+        # the dates of the prices the returns are computed from, a row before the first return is the base price. Only
+        # the returns are known of a return matrix, its base price is taken to be in the period of the first return
+        price_dates = dates if kind == "price" else dates[:1].append(dates)
+        if kind == "price":
+            dates = dates[1:]
+        bench = self.__get_benchmark_return(matrix, values, dates, tickers, kind, benchmark, benchmark_return)
+        bench_period, period_index = self.__get_beta_periods(bench, price_dates)
+
+        chunk_size = self.get_chunk_size(len(dates))
+        results = []
+        for start in range(0, len(tickers), chunk_size):
+            chunk = np.asarray(values[:, start:start+chunk_size], dtype=np.float64)
+            if kind == "price":
+                chunk = chunk[1:] / chunk[:-1] - 1
+            results.append(self.__compute_chunk(chunk, bench_period, period_index))
+        stats = pd.DataFrame(np.concatenate(results, axis=1).T if results else np.empty((0, 8)),
+                             index=pd.Index(tickers, name="ticker"),
+                             columns=["observations", "annual return", "annual risk", "sharpe ratio",
+                                      "downside deviation", "sortino ratio", "beta", "max drawdown"])
+        stats["observations"] = stats["observations"].astype(np.int64)
+        if show_details:
+            print(f"{len(tickers)} tickers x {len(dates)} dates in chunks of {chunk_size} tickers, "
+                  f"takes {round(time.perf_counter() - t0, 2)} seconds")
+        return stats
+
+    def __compute_chunk(self, returns, bench_period, period_index):
+        ppy = self.periods_per_year
+        rf = self.risk_free_period_yield
+        valid = ~np.isnan(returns)
+        n = valid.sum(axis=0)
+        filled = np.where(valid, returns, 0.0)
+
+        # mean and sample std
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = filled.sum(axis=0) / n
+            deviation = np.where(valid, filled - mean, 0.0)
+            std = np.sqrt((deviation * deviation).sum(axis=0) / (n - 1))
+
+            # downside deviation below the risk free return, over all observations like MPT.get_sortino_ratio
+            np.subtract(filled, rf, out=deviation)
+            np.minimum(deviation, 0.0, out=deviation)
+            deviation[~valid] = 0.0
+            downside = np.sqrt((deviation * deviation).sum(axis=0) / n)
+
+            # max drawdown of the compounded wealth, missing days don't move it
+            np.log1p(filled, out=deviation)
+            wealth = np.exp(np.cumsum(deviation, axis=0, out=deviation), out=deviation)
+            peak = np.maximum.accumulate(wealth, axis=0)
+            max_drawdown = (wealth / peak - 1).min(axis=0, initial=0.0)
+
+            beta = self.__compute_beta(filled, wealth, valid, bench_period, period_index)
+
+            annual_return = mean * ppy
+            annual_risk = std * np.sqrt(ppy)
+            sharpe = (annual_return - self.risk_free_return) / annual_risk
+            sortino = (mean - rf) * ppy / (downside * np.sqrt(ppy))
+
+        stats = np.vstack([n, annual_return, annual_risk, sharpe, downside * np.sqrt(ppy), sortino, beta,
+                           max_drawdown])
+        stats[1:, n < self.min_observations] = np.nan
+        return stats
+
+    @staticmethod
+    def __compute_beta(filled, wealth, valid, bench_period, period_index):
+        if bench_period is None:
+            return np.full(filled.shape[1], np.nan)
+        if period_index is None:
+            period_return, period_valid = filled, valid
+        else:
+            # the wealth on the first day of each period is the period's open, the same as Asset.get_beta resampling
+            # the daily open price, so a period return is the change between consecutive period opens
+            opens, open_valid = UniverseStats.__get_period_opens(wealth, valid, period_index)
+            period_return = opens[1:] / opens[:-1] - 1
+            period_valid = open_valid[1:] & open_valid[:-1]
+        pair = period_valid & ~np.isnan(bench_period)[:, None]
+        b = np.where(pair, np.nan_to_num(bench_period)[:, None], 0.0)
+        r = np.where(pair, period_return, 0.0)
+        n = pair.sum(axis=0)
+        b_mean = b.sum(axis=0) / n
+        r_mean = r.sum(axis=0) / n
+        b_deviation = np.where(pair, b - b_mean, 0.0)
+        covariance = (b_deviation * (r - r_mean)).sum(axis=0)
+        variance = (b_deviation * b_deviation).sum(axis=0)
+        return covariance / variance
+
+    @staticmethod
+    def __get_period_opens(wealth, valid, period_index):
+        """
+        :return: the wealth at the first price of each period, and whether it's known. Row i of the wealth is after the
+        return i, period_index counts the base price as row 0, so the first period of the history opens at 1
+        """
+        rows = np.maximum(period_index - 1, 0)
+        opens = wealth[rows]
+        open_valid = valid[rows]
+        opens[period_index == 0] = 1.0
+        open_valid[period_index == 0] = True
+        return opens, open_valid
+
+    def __get_beta_periods(self, bench, dates):
+        """
+        :param dates: the dates of the prices, one more than the returns
+        :return: the benchmark returns per beta period, and the first price row of each period (None for daily beta)
+        """
+        if bench is None:
+            return None, None
+        if self.beta_interval == "1d":
+            return bench, None
+        if self.beta_interval not in UniverseStats.beta_periods:
+            raise ValueError(f"cannot compute beta at {self.beta_interval}")
+        if len(dates) <= 1:
+            return None, None
+        periods = dates.to_period(UniverseStats.beta_periods[self.beta_interval])
+        period_index = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+        valid = ~np.isnan(bench)
+        wealth = np.cumprod(1 + np.where(valid, bench, 0.0))
+        opens, open_valid = UniverseStats.__get_period_opens(wealth, valid, period_index)
+        bench_period = opens[1:] / opens[:-1] - 1
+        bench_period[~(open_valid[1:] & open_valid[:-1])] = np.nan
+        return bench_period, period_index
+
+    @staticmethod
+    def __get_benchmark_return(matrix, values, dates, tickers, kind, benchmark, benchmark_return):
+        if benchmark in tickers:
+            column = np.asarray(values[:, tickers.index(benchmark)], dtype=np.float64)
+            return column[1:] / column[:-1] - 1 if kind == "price" else column
+        if benchmark_return is None and benchmark is not None:
+            from core.benchmark import benchmarks
+            spy = benchmarks.get(benchmark)
+            benchmark_return = spy.daily_price_change[spy.ticker]
+        if benchmark_return is None:
+            return None
+        return benchmark_return.reindex(dates).to_numpy(dtype=np.float64)
+
+    @staticmethod
+    def __unpack(matrix):
+        if isinstance(matrix, pd.DataFrame):
+            return matrix.to_numpy(dtype=np.float64), pd.DatetimeIndex(matrix.index), list(matrix.columns), "return"
+        return matrix.values, matrix.dates, matrix.tickers, matrix.kind
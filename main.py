@@ -37,14 +37,23 @@ if __name__ == "__main__":
             print(f"ERROR: path does not exist: {ticker_list_file}")
         with open(ticker_list_file, 'r', encoding='utf-8') as fp:
             ticker_list = set([t.strip() for t in fp.readlines()])
-        scrape_company_fundamentals(ticker_list, scraping_result_file, risk_free_return)
+        # resume=True picks up an interrupted scrape, set retry_failed=True to only re-scrape the failed tickers
+        # incremental=True only re-scrapes companies with a new statement since the latest snapshot
+        scrape_company_fundamentals(ticker_list, scraping_result_file, risk_free_return, resume=False,
+                                    retry_failed=False, incremental=False)
+
+    # screen the latest fundamentals snapshot saved by 1.3, optionally keep the top k ranked by a metric
+    elif number == 1.4:
+        query = "ROE > 0.15 and liability/asset ratio < 0.5 and sector == Technology"
+        screen_companies(query, rank_by="roic", k=50, file_path=r"./data/first_round_filtering.txt")
 
     # get a list of tickers' annualized return and risk over past 5 years
     elif number == 2.1:
         ticker_list = ["EXPO"]
-        print('\t'.join(['ticker', 'annualized return', 'annualized risk', 'beta']))
-        for t in ticker_list:
-            print('\t'.join([t] + [str(round(d, 4)) for d in Asset(t).get_expected_yearly_return_risk_beta()]))
+        matrix_path = r"./data/return_matrix.npy"
+        stats = get_universe_stats(matrix_path, ticker_list, risk_free_return=risk_free_return)
+        print(stats.loc[stats.index.isin(ticker_list), ["annual return", "annual risk", "beta"]].round(4)
+              .to_csv(sep="\t"))
 
     # scrape asset price expected daily return and risk
     elif number == 2.2:
@@ -52,9 +61,10 @@ if __name__ == "__main__":
         scraping_result_file = r"./data/asset_daily_return_risk.tsv"
         with open(ticker_list_file, 'r', encoding='utf-8') as fp:
             ticker_list = set([t.strip() for t in fp.readlines()])
-        scrape_asset_return_risk(ticker_list, scraping_result_file)
+        # pass matrix_path of a matrix built by build_return_matrix to read prices from it instead of fetching them
+        scrape_asset_return_risk(ticker_list, scraping_result_file, processes=None, matrix_path=None)
 
-    # plot a list of tickers return & risk from a tsv file with 3 columns: ticker, return, and risk
+    # plot a list of tickers return & risk from a tsv file whose first 3 columns are: ticker, return, and risk
     elif number == 2.3:
         asset_return_risk_file_path = r"./data/asset_daily_return_risk.tsv"
         highlights = ['MSFT', 'ZTS', 'VEEV', 'MKTX', 'WST', 'MASI', 'KL', 'EXPO', 'PDEX']  # to highlight some assets
@@ -178,6 +188,11 @@ if __name__ == "__main__":
         #                         rebalance_strategy="mpt", rebalance_interval=20, rebalance_use_data=-1)
         # p.invest(assets_list, customized_weights=assets_weight, strategy=s,  start_date="2018-12-03")
 
+    # sample random portfolios to see the feasible risk & return, and the best sampled portfolios
+    elif number == 3.13:
+        asset_tickers = ['EXPO', 'KL',  'MASI', 'MKTX', 'SGOL', 'WST', 'VEEV', 'ZTS']
+        mpt_monte_carlo(asset_tickers, risk_free_return, samples=1000000, top_k=10, metric="sharpe ratio")
+
     # plot 20-day risk & return for an asset
     elif number == 4.1:
         Asset.print_yearly_return_risk(["MSFT"])
@@ -3,6 +3,8 @@ import numpy as np
 import quantstats as qs
 import matplotlib.pyplot as plt
 from scipy.optimize import minimize
+from core.rolling_moments import RollingMoments
+from strategy.objectives import *
 
 
 class AverageCostStrategy:
@@ -140,12 +142,23 @@ class AverageCostStrategy:
                            self.portfolio.full_asset_price_history.iloc[0], 4)
         self.total_cost += (cur_shares * self.portfolio.full_asset_price_history.iloc[0]).sum()
 
+        # the moments of the returns before the rebalance day, over all of them or the last rebalance_use_data days,
+        # updated with only the days added since the last rebalance
+        changes = self.portfolio.full_asset_price_history_change
+        change_values = changes.to_numpy(dtype=np.float64)
+        window_moments = RollingMoments(len(changes.columns),
+                                        window=None if self.rebalance_use_data == -1 else self.rebalance_use_data,
+                                        min_periods=2)
+        added = 0
+        # each solve starts from the previous solution, the first one from the initial weights
+        mpt_weights = np.asarray(cur_weights, dtype=np.float64)
         for i in range(len(self.portfolio.full_asset_price_history)):
             if i > 0 and i % self.rebalance_inverval == 0:
-                if self.rebalance_use_data == -1:
-                    cur_weights = np.round(self.__rebalance_mpt(self.portfolio.full_asset_price_history_change[0:i]), 4)
-                else:
-                    cur_weights = np.round(self.__rebalance_mpt(self.portfolio.full_asset_price_history_change[i-self.rebalance_use_data:i]), 4)
+                while added < i:
+                    window_moments.update(changes.index[added], change_values[added])
+                    added += 1
+                mpt_weights = self.__rebalance_mpt(window_moments, mpt_weights)
+                cur_weights = np.round(mpt_weights, 4)
                 cur_book_value = self.daily_book_value[-1].sum()
                 rebalanced_fund_for_each_asset = [cur_book_value * w for w in cur_weights]
                 book_value_diff_for_each_asset = pd.Series(rebalanced_fund_for_each_asset, index=self.portfolio.full_asset_price_history.columns) - self.daily_book_value[-1]
@@ -184,19 +197,23 @@ class AverageCostStrategy:
         self.daily_book_value_change.index = self.portfolio.full_asset_price_history_change.index
         qs.reports.html(self.daily_book_value_change, "IVV", title=f"{self.portfolio_name} dollar-cost average MPT REB", output=self.report_path, rf=self.risk_free_daily_return)
 
-    def __rebalance_mpt(self, asset_price_history_change, target_risk=None):
-        def sharpe_ratio(param):
-            daily_mean_return = np.matmul(param, asset_price_history_change.mean().to_numpy().transpose())
-            daily_risk = np.sqrt(np.matmul(np.matmul(param, self.portfolio.get_assets_covariance().to_numpy()), param.transpose()))
-            return -1 * (daily_mean_return - self.risk_free_daily_return) / daily_risk
-        param = np.array([1/len(asset_price_history_change)] * len(asset_price_history_change.columns))
-        bnds = tuple([(0, 1)] * (len(param)))
-        cons = [{'type': 'eq', 'fun': lambda param: np.sum(param) - 1}]
+    def __rebalance_mpt(self, window_moments, previous_weights, target_risk=None):
+        """
+        find the max sharpe ratio weights of the window
+        :param window_moments: a RollingMoments of the returns in the window
+        :param previous_weights: the weights the solve starts from
+        :param target_risk: the annual risk the portfolio must have, default is no constraint
+        :return: the weights, the previous weights if the window has fewer than 2 days
+        """
+        if window_moments.count < 2:
+            return previous_weights
+        moments = Moments.from_estimates(window_moments.get_mean(), window_moments.get_covariance(),
+                                         self.portfolio.full_asset_price_history_change.columns)
+
+        sharpe_ratio = get_negative_sharpe_objective(moments, self.risk_free_daily_return)
+        bnds = tuple([(0, 1)] * (len(previous_weights)))
+        cons = [get_budget_constraint()]
         if target_risk is not None:
-            cons.append({'type':'eq', 'fun':lambda param: np.sqrt(np.matmul(np.matmul(param, asset_price_history_change.cov().to_numpy()), param.transpose())) - target_risk/np.sqrt(252)})
-        ans = minimize(sharpe_ratio, param, bounds=bnds, constraints=cons)
+            cons.append(get_target_risk_constraint(moments, target_risk/np.sqrt(252)))
+        ans = minimize(sharpe_ratio, previous_weights, jac=True, bounds=bnds, constraints=cons)
         return ans.x
-
-
-
-
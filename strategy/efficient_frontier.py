@@ -0,0 +1,49 @@
+import numpy as np
+from strategy.qp_solver import QPSolver
+
+
+class EfficientFrontier:
+    """
+    Traces the minimum variance frontier of a set of assets with a sweep of target returns, each point an exact QP
+    solution started from the previous point's active set, instead of evaluating every weight combination on a grid.
+    """
+    def __init__(self, moments, lower=0, upper=1, solver=None):
+        """
+        :param moments: a Moments of the asset daily returns
+        :param lower: the lower bound of the weights
+        :param upper: the upper bound of the weights
+        :param solver: a QPSolver, default is QPSolver()
+        """
+        self.moments = moments
+        self.lower = lower
+        self.upper = upper
+        self.solver = solver if solver is not None else QPSolver()
+        self.risks = None
+        self.returns = None
+        self.weights = None
+
+    def trace(self, points=100, efficient_only=False):
+        """
+        trace the frontier
+        :param points: the number of portfolios on the frontier
+        :param efficient_only: only trace from the minimum variance portfolio up to the highest return, otherwise also
+        the inefficient part below it, down to the lowest return
+        :return: arrays of the daily risks, the daily returns and the K x N weights of the portfolios, ascending by return
+        """
+        covariance, mean = self.moments.covariance, self.moments.mean
+        highest = QPSolver.get_max_return_weights(mean, self.lower, self.upper)
+        if efficient_only:
+            lowest = self.solver.min_variance(covariance, self.lower, self.upper)
+        else:
+            lowest = QPSolver.get_max_return_weights(-mean, self.lower, self.upper)
+        low, high = lowest @ mean, highest @ mean
+        if points < 2 or high - low <= 1e-15:
+            weights = np.array([lowest])
+        else:
+            target_returns = np.linspace(low, high, points)[1:-1]
+            weights = np.vstack([lowest, self.solver.min_variance_frontier(covariance, mean, target_returns, self.lower,
+                                                                           self.upper), highest])
+        self.weights = weights
+        self.returns = weights @ mean
+        self.risks = np.sqrt(np.einsum("ki,ij,kj->k", weights, covariance, weights))
+        return self.risks, self.returns, self.weights
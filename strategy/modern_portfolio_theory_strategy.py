@@ -1,15 +1,25 @@
 import numpy as np
-import pandas as pd
 import matplotlib.pylab as pl
 from scipy.optimize import minimize
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
-import matplotlib.pyplot as plt
+from strategy.objectives import *
+from strategy.qp_solver import QPSolver
+from strategy.efficient_frontier import EfficientFrontier
+from strategy.portfolio_evaluator import PortfolioEvaluator
+from strategy.walk_forward import WalkForward
+
+
+# how the min risk and max sharpe ratio weights are optimized
+#   slsqp: scipy SLSQP, the sortino ratio is always optimized with it
+#   qp: the interior point QP solver in strategy.qp_solver, falling back to SLSQP if it fails
+solvers = ["slsqp", "qp"]
 
 
 class MPT:
-    def __init__(self, risk_free_annual_yield=None, target_risk=None):
+    def __init__(self, risk_free_annual_yield=None, target_risk=None, solver="slsqp"):
+        if solver not in solvers:
+            raise ValueError(f"unknown solver {solver}, expect one of {solvers}")
         self.portfolio = None
+        self.solver = solver
         self.risk_free_daily_yield = 0
         self.target_risk=None
         if risk_free_annual_yield is not None:
@@ -21,33 +31,41 @@ class MPT:
         self.portfolio = portfolio
         self.plot_efficient_frontier(show_details, show_plot, customized_weights)
 
+    def get_evaluator(self):
+        """
+        :return: a PortfolioEvaluator of the portfolio's asset returns
+        """
+        return PortfolioEvaluator(self.portfolio.get_moments(), self.risk_free_daily_yield)
+
     def get_stats(self, weights):
-        yearly_expected_return = round(np.matmul(np.array(weights), self.portfolio.full_asset_price_history_change.mean().to_numpy().transpose())*252, 6)
-        yearly_risk = round(np.sqrt(np.matmul(np.matmul(np.array(weights), self.portfolio.get_assets_covariance().to_numpy()), np.array(weights).transpose()))*np.sqrt(252), 6)
+        stats = self.get_evaluator().evaluate(weights, sortino=False).iloc[0]
+        yearly_expected_return = round(stats["return"]*252, 6)
+        yearly_risk = round(stats["risk"]*np.sqrt(252), 6)
         yearly_sharpe_ratio = (yearly_expected_return - self.risk_free_daily_yield) / yearly_risk
         return yearly_expected_return, yearly_risk, yearly_sharpe_ratio
 
     def get_sortino_ratio(self, weights):
-        portfolio_daily_return = (weights * self.portfolio.full_asset_price_history_change).sum(axis=1)
-        sortino_optimized_portfolio_mean_return = (portfolio_daily_return.mean() - self.risk_free_daily_yield)*252
-        sortino_optimized_portfolio_risk = pow(252, 1/2) * np.sqrt(((portfolio_daily_return[portfolio_daily_return < self.risk_free_daily_yield]-self.risk_free_daily_yield)**2).sum() / len(portfolio_daily_return))
+        stats = self.get_evaluator().evaluate(weights).iloc[0]
+        sortino_optimized_portfolio_mean_return = stats["excess return"]*252
+        sortino_optimized_portfolio_risk = pow(252, 1/2) * stats["downside deviation"]
         sortino_ratio = (sortino_optimized_portfolio_mean_return / sortino_optimized_portfolio_risk)
         return sortino_optimized_portfolio_mean_return, sortino_ratio
 
     def plot_efficient_frontier(self, show_details, show_plots, customized_weights=None):
         # step 1: calculate the man-variance for the optimized portfolio
+        moments = self.portfolio.get_moments()
         risk_optimized_weights = self.__optimize_risk() if customized_weights == None or len(customized_weights) == 0 else customized_weights
-        risk_optimized_portfolio_mean = np.matmul(np.array(risk_optimized_weights), self.portfolio.full_asset_price_history_change.mean().to_numpy().transpose())
-        risk_optimized_portfolio_risk = np.sqrt(np.matmul(np.matmul(np.array(risk_optimized_weights), self.portfolio.get_assets_covariance().to_numpy()), np.array(risk_optimized_weights).transpose()))
+        risk_optimized_portfolio_mean = moments.get_return(risk_optimized_weights)
+        risk_optimized_portfolio_risk = moments.get_risk(risk_optimized_weights)
 
         sharpe_optimized_weights = self.__optimize_sharpe_ratio() if customized_weights == None or len(customized_weights) == 0 else customized_weights
-        sharpe_optimized_portfolio_mean = np.matmul(np.array(sharpe_optimized_weights), self.portfolio.full_asset_price_history_change.mean().to_numpy().transpose())
-        sharpe_optimized_portfolio_risk = np.sqrt(np.matmul(np.matmul(np.array(sharpe_optimized_weights), self.portfolio.get_assets_covariance().to_numpy()), np.array(sharpe_optimized_weights).transpose()))
+        sharpe_optimized_portfolio_mean = moments.get_return(sharpe_optimized_weights)
+        sharpe_optimized_portfolio_risk = moments.get_risk(sharpe_optimized_weights)
 
         sortino_optimized_weights = self.__optimize_sortino_ratio() if customized_weights == None or len(customized_weights) == 0 else customized_weights
-        portfolio_daily_return = (sortino_optimized_weights * self.portfolio.full_asset_price_history_change).sum(axis=1)
-        sortino_optimized_portfolio_mean = portfolio_daily_return.mean() - self.risk_free_daily_yield
-        sortino_optimized_portfolio_risk = np.sqrt(((portfolio_daily_return[portfolio_daily_return < self.risk_free_daily_yield]-self.risk_free_daily_yield)**2).sum() / len(portfolio_daily_return))
+        sortino_stats = self.get_evaluator().evaluate(sortino_optimized_weights).iloc[0]
+        sortino_optimized_portfolio_mean = sortino_stats["excess return"]
+        sortino_optimized_portfolio_risk = sortino_stats["downside deviation"]
 
         # step 2: report
         if show_details:
@@ -97,32 +115,10 @@ class MPT:
 
         # step 4: plot mean-variance curve and capital market line
         if show_plots:
-            # step 4.1: get the combination list of weights
-            def get_all_weight_combo(cur_weight, weight_combos):
-                if 1 - sum(cur_weight) < 0:
-                    return
-                if len(cur_weight) == len(self.portfolio.assets) - 1:
-                    cur_weight.append(round(1 - sum(cur_weight), 2))
-                    weight_combos.append(cur_weight.copy())
-                    del cur_weight[-1]
-                    return
-                for i in np.arange(0, 1 - sum(cur_weight) + 0.01, 0.01):
-                    cur_weight.append(round(i, 2))
-                    get_all_weight_combo(cur_weight, weight_combos)
-                    del cur_weight[-1]
-
-            weight_combos = []
-            get_all_weight_combo([], weight_combos)
-
-            # step 4.2: calculate portfolio return and risk for mean-variance curve
-            # for loop will be slow when plotting >= 4 assets
-            mean = []
-            std = []
-            for weights in weight_combos:
-                mean.append(np.matmul(np.array(weights), self.portfolio.full_asset_price_history_change.mean().to_numpy().transpose()))
-                std.append(np.sqrt(np.matmul(np.matmul(np.array(weights), self.portfolio.get_assets_covariance().to_numpy()), np.array(weights).transpose())))
+            # step 4.1: trace the mean-variance curve, the minimum risk portfolios from the lowest to the highest return
+            std, mean, _ = EfficientFrontier(moments).trace(points=200)
 
-            # step 4.3: plot mean-variance curve
+            # step 4.2: plot mean-variance curve
             fig = pl.figure(figsize=(9, 6))
             plots = []
             if show_plots:
@@ -131,13 +127,13 @@ class MPT:
                 plots.append(pl.plot(risk_optimized_portfolio_risk, risk_optimized_portfolio_mean, label="min risk portfolio", marker='o'))
                 plots.append(pl.plot(std, mean))
 
-            # step 4.4: plot market capital line
+            # step 4.3: plot market capital line
             if self.risk_free_daily_yield > 0:
                 plots.append(pl.plot(sharpe_optimized_portfolio_risk, sharpe_optimized_portfolio_mean, label="max sharpe ratio portfolio", marker='o'))
                 plots.append(pl.plot(0, self.risk_free_daily_yield, label="risk free asset", marker='x'))
                 plots.append(pl.plot(std1, mean1))
 
-            # step 4.5: show the plot
+            # step 4.4: show the plot
             if show_plots:
                 pl.title("Efficient Frontier")
                 pl.xlabel("daily risk ($\sigma_p$)")
@@ -147,293 +143,110 @@ class MPT:
                 pl.show()
 
     def __optimize_risk(self):
-        def risk(param):
-            return np.sqrt(np.matmul(np.matmul(np.array(param), self.portfolio.get_assets_covariance().to_numpy()), np.array(param).transpose()))
+        moments = self.portfolio.get_moments()
+        if self.solver == "qp":
+            # with a target risk, the portfolio of the highest return at that risk
+            weights = self.__solve_qp(lambda solver: solver.min_variance(moments.covariance) if self.target_risk is None
+                                      else solver.target_risk(moments.covariance, moments.mean,
+                                                              self.target_risk/np.sqrt(252)))
+            if weights is not None:
+                return weights
         param = self.portfolio.asset_weights
         bnds = tuple([(0, 1)] * (len(param)))
-        cons = [{'type': 'eq', 'fun': lambda param: np.sum(param) - 1}]
+        cons = [get_budget_constraint()]
         if self.target_risk is not None:
-            cons.append({'type':'eq', 'fun':lambda param: np.sqrt(np.matmul(np.matmul(np.array(param), self.portfolio.get_assets_covariance().to_numpy()), np.array(param).transpose())) - self.target_risk/np.sqrt(252)})
-        ans = minimize(risk, param, bounds=bnds, constraints=cons)
+            cons.append(get_target_risk_constraint(moments, self.target_risk/np.sqrt(252)))
+        ans = minimize(get_risk_objective(moments), param, jac=True, bounds=bnds, constraints=cons)
         return ans.x
 
     def __optimize_sharpe_ratio(self):
-        def sharpe_ratio(param):
-            daily_mean_return = np.matmul(np.array(param), self.portfolio.full_asset_price_history_change.mean().to_numpy().transpose())
-            daily_risk = np.sqrt(np.matmul(np.matmul(np.array(param), self.portfolio.get_assets_covariance().to_numpy()), np.array(param).transpose()))
-            return -1 * (daily_mean_return - self.risk_free_daily_yield) / daily_risk
+        moments = self.portfolio.get_moments()
+        if self.solver == "qp":
+            # at a fixed risk the highest sharpe ratio is the highest return
+            weights = self.__solve_qp(lambda solver: solver.max_sharpe(moments.covariance, moments.mean,
+                                                                       self.risk_free_daily_yield)
+                                      if self.target_risk is None
+                                      else solver.target_risk(moments.covariance, moments.mean,
+                                                              self.target_risk/np.sqrt(252)))
+            if weights is not None:
+                return weights
         param = self.portfolio.asset_weights
         bnds = tuple([(0, 1)] * (len(param)))
-        cons = [{'type': 'eq', 'fun': lambda param: np.sum(param) - 1}]
+        cons = [get_budget_constraint()]
         if self.target_risk is not None:
-            cons.append({'type':'eq', 'fun':lambda param: np.sqrt(np.matmul(np.matmul(np.array(param), self.portfolio.get_assets_covariance().to_numpy()), np.array(param).transpose())) - self.target_risk/np.sqrt(252)})
-        ans = minimize(sharpe_ratio, param, bounds=bnds, constraints=cons)
+            cons.append(get_target_risk_constraint(moments, self.target_risk/np.sqrt(252)))
+        ans = minimize(get_negative_sharpe_objective(moments, self.risk_free_daily_yield), param, jac=True,
+                       bounds=bnds, constraints=cons)
         return ans.x
 
+    @staticmethod
+    def __solve_qp(optimize):
+        """
+        :param optimize: a function optimizing weights with a QPSolver
+        :return: the weights, None if the QP solver fails
+        """
+        try:
+            return optimize(QPSolver())
+        except (ArithmeticError, ValueError) as e:
+            print(f"QP solver failed, using SLSQP: {e}")
+            return None
+
     def __optimize_sortino_ratio(self):
-        def sortino_ratio(param):
-            portfolio_daily_return = (param * self.portfolio.full_asset_price_history_change).sum(axis=1)
-            downside = ((portfolio_daily_return[portfolio_daily_return < self.risk_free_daily_yield] - self.risk_free_daily_yield)**2).sum() / len(portfolio_daily_return)
-            return -1 * (portfolio_daily_return.mean() - self.risk_free_daily_yield) / np.sqrt(downside)
+        sortino_ratio = get_negative_sortino_objective(self.portfolio.full_asset_price_history_change,
+                                                       self.risk_free_daily_yield)
         param = self.portfolio.asset_weights
         bnds = tuple([(0, 1)] * (len(param)))
-        cons = ({'type': 'eq', 'fun': lambda param: np.sum(param) - 1})
-        ans = minimize(sortino_ratio, param, bounds=bnds, constraints=cons)
+        cons = [get_budget_constraint()]
+        ans = minimize(sortino_ratio, param, jac=True, bounds=bnds, constraints=cons)
         return ans.x
 
-    # only use 1 previous year data to get weights
-    def evaluate_yoy(self, asset_list):
-        # step 0: get the inception date for the latest listed (最后一个上市的) asset in the portfolio
-        self.portfolio.invest(asset_list)
-        inception_date_of_the_latest_listed_asset = self.portfolio.full_asset_price_history.index[0].strftime('%Y-%m-%d')
-
-        # step 1: generate a series of dates for evaluation, each with a period of one year
-        inception_date = datetime.strptime(inception_date_of_the_latest_listed_asset, '%Y-%m-%d')
-        dates = []
-        dates.append(inception_date.strftime('%Y-%m-%d'))
-        evaluation_date = inception_date + relativedelta(years=1)
-        dates.append(evaluation_date.strftime('%Y-%m-%d'))
-        today = datetime.today()
-        while evaluation_date + relativedelta(years=1) < today:
-            evaluation_date += relativedelta(years=1)
-            dates.append(evaluation_date.strftime('%Y-%m-%d'))
-        dates.append(today.strftime('%Y-%m-%d'))
-
-        # step 2: use all the history data to get the optimized weights before the evaluation date.
-        # You plan to invest only two assets: MSFT & FB. MSFT inception date is 1986-3-13, FB is 2012-05-18.
-        # By using the historical data between [2012-05-18, 2013-05-18], we can get the optimized weights for investing
-        # in the next year (2013-05-18 - 2014-05-18).
-        # We will then use all historical data from [2012-05-18, 2014-05-18] to get the optimized weights for investing
-        # in the next year (2014-05-18 - 2015-05-18). We wil keep doing this to get the optimized weights, and will use
-        # these weights to invest the next year only.
-        predicted_minrisk_weights_history = []
-        predicted_maxsharpe_weights_history = []
-        predicted_maxsortino_weights_history = []
-        # for date in dates[:-1]:
-        #     self.portfolio.invest([asset.ticker for asset in self.portfolio.assets], start_date=inception_date, end_date=date)
-        #     predicted_minrisk_weights_history.append(self.__optimize_risk())
-        #     predicted_maxsharpe_weights_history.append(self.__optimize_sharpe_ratio())
-        #     predicted_maxsortino_weights_history.append(self.__optimize_sortino_ratio())
-        for i in range(0, len(dates)-2):
-            self.portfolio.invest([asset.ticker for asset in self.portfolio.assets], start_date=dates[i], end_date=dates[i+1])
-            predicted_minrisk_weights_history.append(self.__optimize_risk())
-            predicted_maxsharpe_weights_history.append(self.__optimize_sharpe_ratio())
-            predicted_maxsortino_weights_history.append(self.__optimize_sortino_ratio())
-
-        # step 3: get the predicted sharpe/risk/return with the weights from step 2, also get the actual optimal
-        # portfolio using the full year data of the evaluation year.
-        predicted_minrisk_risk_history = []
-        predicted_minrisk_return_history = []
-        predicted_minrisk_sharpe_history = []
-        predicted_maxsharpe_risk_history = []
-        predicted_maxsharpe_return_history = []
-        predicted_maxsharpe_sharpe_history = []
-        predicted_maxsortino_return_history = []
-        predicted_maxsortino_sortino_history = []
-        actual_minrisk_risk_history = []
-        actual_minrisk_return_history = []
-        actual_minrisk_sharpe_history = []
-        actual_maxsharpe_risk_history = []
-        actual_maxsharpe_return_history = []
-        actual_maxsharpe_sharpe_history = []
-        actual_maxsortino_return_history = []
-        actual_maxsortino_sortino_history = []
-
-        for i in range(1, len(dates)-1):
-            self.portfolio.invest([asset.ticker for asset in self.portfolio.assets], start_date=dates[i], end_date=dates[i+1])
-
-            # use the optimized weights from historical data on the actual data to get the stats that you'll get if
-            # investing with these optimized weights
-            predicted_minrisk_return, predicted_minrisk_risk, predicted_minrisk_sharpe = self.get_stats(predicted_minrisk_weights_history[i-1])
-            predicted_minrisk_risk_history.append(predicted_minrisk_risk)
-            predicted_minrisk_return_history.append(predicted_minrisk_return)
-            predicted_minrisk_sharpe_history.append(predicted_minrisk_sharpe)
-
-            predicted_maxsharpe_return, predicted_maxsharpe_risk, predicted_maxsharpe_sharpe = self.get_stats(predicted_maxsharpe_weights_history[i-1])
-            predicted_maxsharpe_risk_history.append(predicted_maxsharpe_risk)
-            predicted_maxsharpe_return_history.append(predicted_maxsharpe_return)
-            predicted_maxsharpe_sharpe_history.append(predicted_maxsharpe_sharpe)
-
-            predicted_maxsortino_return, predicted_maxsortino_sortino = self.get_sortino_ratio(predicted_maxsortino_weights_history[i-1])
-            predicted_maxsortino_return_history.append(predicted_maxsharpe_return)
-            predicted_maxsortino_sortino_history.append(predicted_maxsortino_sortino)
-
-            # get the actual optimized stats only for this year data --> this is the ceiling of the portfolio
-            # performance of this year
-            min_risk_weights = self.__optimize_risk()
-            min_risk_return, min_risk_risk, min_risk_sharpe = self.get_stats(min_risk_weights)
-            actual_minrisk_risk_history.append(min_risk_risk)
-            actual_minrisk_return_history.append(min_risk_return)
-            actual_minrisk_sharpe_history.append(min_risk_sharpe)
-
-            max_sharpe_weights = self.__optimize_sharpe_ratio()
-            max_sharpe_return, max_sharpe_risk, max_sharpe_sharpe = self.get_stats(max_sharpe_weights)
-            actual_maxsharpe_risk_history.append(max_sharpe_risk)
-            actual_maxsharpe_return_history.append(max_sharpe_return)
-            actual_maxsharpe_sharpe_history.append(max_sharpe_sharpe)
+    def optimize(self, objective):
+        """
+        optimize the weights of the portfolio
+        :param objective: "min risk", "max sharpe ratio" or "max sortino ratio"
+        :return: the weights
+        """
+        if objective == "min risk":
+            return self.__optimize_risk()
+        if objective == "max sharpe ratio":
+            return self.__optimize_sharpe_ratio()
+        if objective == "max sortino ratio":
+            return self.__optimize_sortino_ratio()
+        raise ValueError(f"unknown objective {objective}, expect one of {WalkForward.objectives}")
 
-            max_sortino_weights = self.__optimize_sortino_ratio()
-            actual_maxsortino_return, actual_maxsortino_sortino = self.get_sortino_ratio(max_sortino_weights)
-            actual_maxsortino_return_history.append(actual_maxsortino_return)
-            actual_maxsortino_sortino_history.append(actual_maxsortino_sortino)
-
-        # step 4: plot
-        # the purpose is to see how the predicted weights and the actual weights differ. In fact, if we want to use MPT
-        # for portfolio optimization, we will use the optimized weights computed from all the previous history data to
-        # invest for the next year. The core question that this evaluation tries to answer is, how reliable it is to
-        # use the optimized weights derived from the full history data when applying these weights in the next year?
-        # the predicted stats of the portfolio are using the history-optimized weights to invest, the actual stats are
-        # using the latest 1 year of data. By comparing these two values, we can understand to what extend MPT can help
-        # predict the optimal portfolio for the next year.
-        data = {"predicted_minrisk_risk": predicted_minrisk_risk_history,
-                "best_minrisk_risk": actual_minrisk_risk_history,
-                "predicted_minrisk_return": predicted_minrisk_return_history,
-                "best_minrisk_return": actual_minrisk_return_history,
-                "predicted_minrisk_sharpe": predicted_minrisk_sharpe_history,
-                "best_minrisk_sharpe":actual_minrisk_sharpe_history,
-                "predicted_maxsharpe_risk":predicted_maxsharpe_risk_history,
-                "best_maxsharpe_risk":actual_maxsharpe_risk_history,
-                "predicted_maxsharpe_return": predicted_maxsharpe_return_history,
-                "best_maxsharpe_return": actual_maxsharpe_return_history,
-                "predicted_maxsharpe_sharpe": predicted_maxsharpe_sharpe_history,
-                "best_maxsharpe_sharpe": actual_maxsharpe_sharpe_history,
-                "predicted_max_sortino_ratio": predicted_maxsortino_sortino_history,
-                "best_max_sortino_ratio": actual_maxsortino_sortino_history,
-                "predicted_max_sortino_return": predicted_maxsortino_return_history,
-                "best_max_sortino_return": actual_maxsortino_return_history
-                }
-        df = pd.DataFrame(data, index=dates[2:])
-        tickers = [asset.ticker for asset in self.portfolio.assets]
-        df[['predicted_minrisk_risk', 'best_minrisk_risk']].plot(style=['r*-','bo-'], title=f"{tickers} predicted optimized RISK v.s. actual optimized RISK")
-        df[['predicted_minrisk_return', 'best_minrisk_return']].plot(style=['r*-','bo-'], title=f"{tickers} predicted v.s. actual RETURN by minimizing RISK")
-        df[['predicted_maxsharpe_sharpe', 'best_maxsharpe_sharpe']].plot(style=['r*-','bo-'], title=f"{tickers} predicted optimized SHARPE v.s. actual optimized SHARPE")
-        df[['predicted_maxsharpe_return', 'best_maxsharpe_return']].plot(style=['r*-','bo-'], title=f"{tickers} predicted v.s. actual RETURN by maximizing SHARPE")
-        df[['predicted_max_sortino_ratio', 'best_max_sortino_ratio']].plot(style=['r*-','bo-'], title=f"{tickers} predicted v.s. actual SORTINO by maximizing SORTINO")
-        df[['predicted_max_sortino_return', 'best_max_sortino_return']].plot(style=['r*-','bo-'], title=f"{tickers} predicted v.s. actual RETURN by maximizing SORTINO")
-
-        plt.show()
-
-    def evaluate(self, asset_list):
-        # step 0: get the inception date for the latest listed (最后一个上市的) asset in the portfolio
+    # only use 1 previous year data to get weights
+    def evaluate_yoy(self, asset_list, step="year", processes=None, show_plot=True):
+        """
+        evaluate MPT with the weights optimized on the year before each evaluation period, see evaluate
+        """
+        return self.evaluate(asset_list, training="rolling", training_years=1, step=step, processes=processes,
+                             show_plot=show_plot)
+
+    def evaluate(self, asset_list, training="expanding", training_years=1, step="year", processes=None,
+                 show_plot=True):
+        """
+        walk-forward evaluation: for each evaluation period (a year or a month) after the first training_years years,
+        the weights optimized on the history before the period (the prediction) and the weights optimized on the
+        period itself (the ground truth, the best possible portfolio of the period) are applied to the period.
+        E.g. investing MSFT & FB, whose inception dates are 1986-3-13 and 2012-05-18: the weights optimized on
+        [2012-05-18, 2013-05-18) are evaluated on [2013-05-18, 2014-05-18), the weights optimized on [2012-05-18,
+        2014-05-18) on [2014-05-18, 2015-05-18), and so on. Comparing the two shows how reliable it is to invest with
+        the weights optimized on the history
+        :param asset_list: a string list containing asset tickers
+        :param training: "expanding" to optimize the prediction on all the history before a period, "rolling" on the
+        training_years years before it
+        :param training_years: the length of a rolling training window, and of the training window of the first period
+        :param step: the length of an evaluation period, "year" or "month"
+        :param processes: number of worker processes solving the optimizations, default is the number of cpus
+        :param show_plot: plot the predicted stats against the ground truth
+        :return: a data frame of the annualized stats of the predicted and best portfolios of every period, indexed by
+        the end date of the period
+        """
+        # prices are downloaded once, every window is a slice of the price changes
         self.portfolio.invest(asset_list)
-        inception_date_of_the_latest_listed_asset = self.portfolio.full_asset_price_history.index[0].strftime('%Y-%m-%d')
-
-        # step 1: generate a series of dates for evaluation, each with a period of one year
-        inception_date = datetime.strptime(inception_date_of_the_latest_listed_asset, '%Y-%m-%d')
-        dates = []
-        evaluation_date = inception_date + relativedelta(years=1)
-        dates.append(evaluation_date.strftime('%Y-%m-%d'))
-        today = datetime.today()
-        while evaluation_date + relativedelta(years=1) < today:
-            evaluation_date += relativedelta(years=1)
-            dates.append(evaluation_date.strftime('%Y-%m-%d'))
-        dates.append(today.strftime('%Y-%m-%d'))
-
-        # step 2: use all the history data to get the optimized weights before the evaluation date.
-        # You plan to invest only two assets: MSFT & FB. MSFT inception date is 1986-3-13, FB is 2012-05-18.
-        # By using the historical data between [2012-05-18, 2013-05-18], we can get the optimized weights for investing
-        # in the next year (2013-05-18 - 2014-05-18).
-        # We will then use all historical data from [2012-05-18, 2014-05-18] to get the optimized weights for investing
-        # in the next year (2014-05-18 - 2015-05-18). We wil keep doing this to get the optimized weights, and will use
-        # these weights to invest the next year only.
-        predicted_minrisk_weights_history = []
-        predicted_maxsharpe_weights_history = []
-        predicted_maxsortino_weights_history = []
-        for date in dates[:-1]:
-            self.portfolio.invest([asset.ticker for asset in self.portfolio.assets], start_date=inception_date, end_date=date)
-            predicted_minrisk_weights_history.append(self.__optimize_risk())
-            predicted_maxsharpe_weights_history.append(self.__optimize_sharpe_ratio())
-            predicted_maxsortino_weights_history.append(self.__optimize_sortino_ratio())
-
-        # step 3: get the predicted sharpe/risk/return with the weights from step 2, also get the actual optimal
-        # portfolio using the full year data of the evaluation year.
-        predicted_minrisk_risk_history = []
-        predicted_minrisk_return_history = []
-        predicted_minrisk_sharpe_history = []
-        predicted_maxsharpe_risk_history = []
-        predicted_maxsharpe_return_history = []
-        predicted_maxsharpe_sharpe_history = []
-        predicted_maxsortino_return_history = []
-        predicted_maxsortino_sortino_history = []
-        actual_minrisk_risk_history = []
-        actual_minrisk_return_history = []
-        actual_minrisk_sharpe_history = []
-        actual_maxsharpe_risk_history = []
-        actual_maxsharpe_return_history = []
-        actual_maxsharpe_sharpe_history = []
-        actual_maxsortino_return_history = []
-        actual_maxsortino_sortino_history = []
-
-        for i in range(0, len(dates)-1):
-            self.portfolio.invest([asset.ticker for asset in self.portfolio.assets], start_date=dates[i], end_date=dates[i+1])
-
-            # use the optimized weights from historical data on the actual data to get the stats that you'll get if
-            # investing with these optimized weights
-            predicted_minrisk_return, predicted_minrisk_risk, predicted_minrisk_sharpe = self.get_stats(predicted_minrisk_weights_history[i-1])
-            predicted_minrisk_risk_history.append(predicted_minrisk_risk)
-            predicted_minrisk_return_history.append(predicted_minrisk_return)
-            predicted_minrisk_sharpe_history.append(predicted_minrisk_sharpe)
-
-            predicted_maxsharpe_return, predicted_maxsharpe_risk, predicted_maxsharpe_sharpe = self.get_stats(predicted_maxsharpe_weights_history[i-1])
-            predicted_maxsharpe_risk_history.append(predicted_maxsharpe_risk)
-            predicted_maxsharpe_return_history.append(predicted_maxsharpe_return)
-            predicted_maxsharpe_sharpe_history.append(predicted_maxsharpe_sharpe)
-
-            predicted_maxsortino_return, predicted_maxsortino_sortino = self.get_sortino_ratio(predicted_maxsortino_weights_history[i-1])
-            predicted_maxsortino_return_history.append(predicted_maxsharpe_return)
-            predicted_maxsortino_sortino_history.append(predicted_maxsortino_sortino)
-
-            # get the actual optimized stats only for this year data --> this is the ceiling of the portfolio
-            # performance of this year
-            min_risk_weights = self.__optimize_risk()
-            min_risk_return, min_risk_risk, min_risk_sharpe = self.get_stats(min_risk_weights)
-            actual_minrisk_risk_history.append(min_risk_risk)
-            actual_minrisk_return_history.append(min_risk_return)
-            actual_minrisk_sharpe_history.append(min_risk_sharpe)
-
-            max_sharpe_weights = self.__optimize_sharpe_ratio()
-            max_sharpe_return, max_sharpe_risk, max_sharpe_sharpe = self.get_stats(max_sharpe_weights)
-            actual_maxsharpe_risk_history.append(max_sharpe_risk)
-            actual_maxsharpe_return_history.append(max_sharpe_return)
-            actual_maxsharpe_sharpe_history.append(max_sharpe_sharpe)
-
-            max_sortino_weights = self.__optimize_sortino_ratio()
-            actual_maxsortino_return, actual_maxsortino_sortino = self.get_sortino_ratio(max_sortino_weights)
-            actual_maxsortino_return_history.append(actual_maxsortino_return)
-            actual_maxsortino_sortino_history.append(actual_maxsortino_sortino)
-
-        # step 4: plot
-        # the purpose is to see how the predicted weights and the actual weights differ. In fact, if we want to use MPT
-        # for portfolio optimization, we will use the optimized weights computed from all the previous history data to
-        # invest for the next year. The core question that this evaluation tries to answer is, how reliable it is to
-        # use the optimized weights derived from the full history data when applying these weights in the next year?
-        # the predicted stats of the portfolio are using the history-optimized weights to invest, the actual stats are
-        # using the latest 1 year of data. By comparing these two values, we can understand to what extend MPT can help
-        # predict the optimal portfolio for the next year.
-        data = {"predicted_minrisk_risk": predicted_minrisk_risk_history,
-                "best_minrisk_risk": actual_minrisk_risk_history,
-                "predicted_minrisk_return": predicted_minrisk_return_history,
-                "best_minrisk_return": actual_minrisk_return_history,
-                "predicted_minrisk_sharpe": predicted_minrisk_sharpe_history,
-                "best_minrisk_sharpe":actual_minrisk_sharpe_history,
-                "predicted_maxsharpe_risk":predicted_maxsharpe_risk_history,
-                "best_maxsharpe_risk":actual_maxsharpe_risk_history,
-                "predicted_maxsharpe_return": predicted_maxsharpe_return_history,
-                "best_maxsharpe_return": actual_maxsharpe_return_history,
-                "predicted_maxsharpe_sharpe": predicted_maxsharpe_sharpe_history,
-                "best_maxsharpe_sharpe": actual_maxsharpe_sharpe_history,
-                "predicted_max_sortino_ratio": predicted_maxsortino_sortino_history,
-                "best_max_sortino_ratio": actual_maxsortino_sortino_history,
-                "predicted_max_sortino_return": predicted_maxsortino_return_history,
-                "best_max_sortino_return": actual_maxsortino_return_history
-                }
-        df = pd.DataFrame(data, index=dates[1:])
-        tickers = [asset.ticker for asset in self.portfolio.assets]
-        df[['predicted_minrisk_risk', 'best_minrisk_risk']].plot(style=['r*-','bo-'], title=f"{tickers} predicted optimized RISK v.s. actual optimized RISK")
-        df[['predicted_minrisk_return', 'best_minrisk_return']].plot(style=['r*-','bo-'], title=f"{tickers} predicted v.s. actual RETURN by minimizing RISK")
-        df[['predicted_maxsharpe_sharpe', 'best_maxsharpe_sharpe']].plot(style=['r*-','bo-'], title=f"{tickers} predicted optimized SHARPE v.s. actual optimized SHARPE")
-        df[['predicted_maxsharpe_return', 'best_maxsharpe_return']].plot(style=['r*-','bo-'], title=f"{tickers} predicted v.s. actual RETURN by maximizing SHARPE")
-        df[['predicted_max_sortino_ratio', 'best_max_sortino_ratio']].plot(style=['r*-','bo-'], title=f"{tickers} predicted v.s. actual SORTINO by maximizing SORTINO")
-        df[['predicted_max_sortino_return', 'best_max_sortino_return']].plot(style=['r*-','bo-'], title=f"{tickers} predicted v.s. actual RETURN by maximizing SORTINO")
-
-        plt.show()
+        walk_forward = WalkForward(self, training=training, training_years=training_years, step=step,
+                                   processes=processes)
+        table = walk_forward.run(self.portfolio.full_asset_price_history_change)
+        if show_plot:
+            walk_forward.plot([asset.ticker for asset in self.portfolio.assets])
+        return table
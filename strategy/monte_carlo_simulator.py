@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from strategy.portfolio_evaluator import PortfolioEvaluator
+
+# the metrics portfolios can be ranked by, and whether the highest ranks first
+ranking_metrics = {"sharpe ratio": True, "sortino ratio": True, "risk": False}
+
+
+class MonteCarloSimulator:
+    """
+    Samples random long-only portfolios, with weights drawn from a Dirichlet distribution, in chunks of a fixed size,
+    each chunk scored in one vectorized call. Only running aggregates, a risk x return histogram of the feasible
+    region, and the top k portfolios are kept, so memory doesn't grow with the number of samples.
+    """
+    def __init__(self, moments, risk_free_daily_yield=0, chunk_size=20000, concentration=1, seed=None, bins=50):
+        """
+        construct a simulator
+        :param moments: a Moments of the asset daily returns
+        :param risk_free_daily_yield: the daily risk-free yield
+        :param chunk_size: the number of portfolios sampled and scored at once
+        :param concentration: the Dirichlet concentration of every asset, 1 samples uniformly over all weights summing
+        up to 1, smaller values sample more concentrated portfolios
+        :param seed: the random seed
+        :param bins: the number of risk and return bins of the histogram
+        """
+        self.moments = moments
+        self.evaluator = PortfolioEvaluator(moments, risk_free_daily_yield)
+        self.chunk_size = chunk_size
+        self.concentration = concentration
+        self.random = np.random.default_rng(seed)
+        # a long-only portfolio's return is between the lowest and highest asset returns, its risk below the highest
+        self.return_edges = np.linspace(moments.mean.min(), moments.mean.max(), bins + 1)
+        self.risk_edges = np.linspace(0, np.sqrt(np.diag(moments.covariance).max()), bins + 1)
+        self.histogram = np.zeros((bins, bins), dtype=np.int64)
+        self.count = 0
+        self.counts = None  # stat -> the number of portfolios it's computed for, sortino only when ranking by it
+        self.sums = None  # stat -> running sum
+        self.minimums = None
+        self.maximums = None
+        self.top = None  # the top k portfolios so far, a data frame of stats and weights
+        self.top_metric = None
+
+    def simulate(self, samples=1000000, top_k=10, metric="sharpe ratio"):
+        """
+        sample and score portfolios, adding to the aggregates and, for the same metric, the top k of previous calls
+        :param samples: the number of portfolios
+        :param top_k: the number of best portfolios to keep
+        :param metric: one of ranking_metrics
+        :return: a data frame of the top k portfolios, best first, with their daily stats and weights
+        """
+        if metric not in ranking_metrics:
+            raise ValueError(f"unknown metric {metric}, expect one of {list(ranking_metrics)}")
+        tickers = self.moments.tickers
+        sortino = metric == "sortino ratio"
+        for start in range(0, samples, self.chunk_size):
+            size = min(self.chunk_size, samples - start)
+            weights = self.random.dirichlet(np.full(len(tickers), self.concentration), size)
+            stats = self.evaluator.evaluate(weights, sortino=sortino)
+            self.__aggregate(stats)
+
+            # keep the chunk's top k, then merge them with the top k so far
+            values = stats[metric].to_numpy()
+            values = np.where(np.isnan(values), -np.inf if ranking_metrics[metric] else np.inf, values)
+            order = -values if ranking_metrics[metric] else values
+            best = np.argpartition(order, top_k - 1)[:top_k] if len(order) > top_k else np.arange(len(order))
+            candidates = pd.concat([stats.iloc[best].reset_index(drop=True),
+                                    pd.DataFrame(weights[best], columns=tickers)], axis=1)
+            if self.top is not None and self.top_metric == metric:
+                candidates = pd.concat([self.top, candidates], ignore_index=True)
+            self.top_metric = metric
+            self.top = candidates.sort_values(metric, ascending=not ranking_metrics[metric]).head(top_k) \
+                .reset_index(drop=True)
+        return self.top
+
+    def __aggregate(self, stats):
+        self.count += len(stats)
+        counts = pd.Series(len(stats), index=stats.columns)
+        if self.sums is None:
+            self.counts, self.sums, self.minimums, self.maximums = counts, stats.sum(), stats.min(), stats.max()
+        else:
+            self.counts = self.counts.add(counts, fill_value=0)
+            self.sums = self.sums.add(stats.sum(), fill_value=0)
+            self.minimums = pd.concat([self.minimums, stats.min()], axis=1).min(axis=1)
+            self.maximums = pd.concat([self.maximums, stats.max()], axis=1).max(axis=1)
+        histogram, _, _ = np.histogram2d(stats["risk"], stats["return"], bins=[self.risk_edges, self.return_edges])
+        self.histogram += histogram.astype(np.int64)
+
+    def get_summary(self):
+        """
+        :return: a data frame of the mean, minimum and maximum of every stat over all sampled portfolios
+        """
+        return pd.DataFrame({"portfolios": self.counts, "mean": self.sums / self.counts, "min": self.minimums,
+                             "max": self.maximums})
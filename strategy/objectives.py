@@ -0,0 +1,71 @@
+import numpy as np
+
+# Objectives and constraints of the portfolio weight optimizations with closed-form gradients. An objective returns
+# (value, gradient) so it's passed to scipy minimize with jac=True, a constraint is a dict with its own jac. Without
+# gradients SLSQP estimates them by finite differences, one more evaluation per asset at every iteration.
+
+
+def get_risk_objective(moments):
+    """
+    :param moments: a Moments of the asset daily returns
+    :return: the daily risk of a portfolio and its gradient, sigma = sqrt(w'Cw), d sigma = Cw / sigma
+    """
+    def risk(weights):
+        covariance_weights = moments.covariance @ weights
+        sigma = np.sqrt(weights @ covariance_weights)
+        return sigma, covariance_weights / sigma
+    return risk
+
+
+def get_negative_sharpe_objective(moments, risk_free_daily_yield=0, risk_moments=None):
+    """
+    :param moments: a Moments whose mean is the expected daily return
+    :param risk_free_daily_yield: the daily risk-free yield
+    :param risk_moments: a Moments whose covariance is used for the risk, default is moments
+    :return: the negative daily sharpe ratio -(mu'w - rf) / sigma of a portfolio and its gradient
+    """
+    risk_moments = risk_moments if risk_moments is not None else moments
+
+    def negative_sharpe(weights):
+        excess = moments.mean @ weights - risk_free_daily_yield
+        covariance_weights = risk_moments.covariance @ weights
+        sigma = np.sqrt(weights @ covariance_weights)
+        return -excess / sigma, -moments.mean / sigma + excess * covariance_weights / sigma**3
+    return negative_sharpe
+
+
+def get_negative_sortino_objective(returns, risk_free_daily_yield=0):
+    """
+    :param returns: a dates x assets array or data frame of daily returns, a missing return counts as 0
+    :param risk_free_daily_yield: the daily risk-free yield, also the target of the downside deviation
+    :return: the negative daily sortino ratio -(mean(Rw) - rf) / sqrt(D) of a portfolio and its gradient, where D is
+    the mean of min(Rw - rf, 0)^2 over all dates
+    """
+    returns = np.nan_to_num(np.asarray(returns, dtype=np.float64))
+    mean = returns.mean(axis=0)
+
+    def negative_sortino(weights):
+        shortfall = np.minimum(returns @ weights - risk_free_daily_yield, 0)
+        excess = mean @ weights - risk_free_daily_yield
+        downside = shortfall @ shortfall / len(returns)
+        downside_gradient = 2 * (shortfall @ returns) / len(returns)
+        deviation = np.sqrt(downside)
+        return -excess / deviation, -mean / deviation + excess * downside_gradient / (2 * deviation**3)
+    return negative_sortino
+
+
+def get_budget_constraint():
+    """
+    :return: the constraint that weights sum up to 1
+    """
+    return {'type': 'eq', 'fun': lambda weights: np.sum(weights) - 1, 'jac': lambda weights: np.ones(len(weights))}
+
+
+def get_target_risk_constraint(moments, target_daily_risk):
+    """
+    :return: the constraint that the daily risk of a portfolio equals target_daily_risk
+    """
+    def jac(weights):
+        covariance_weights = moments.covariance @ weights
+        return covariance_weights / np.sqrt(weights @ covariance_weights)
+    return {'type': 'eq', 'fun': lambda weights: moments.get_risk(weights) - target_daily_risk, 'jac': jac}
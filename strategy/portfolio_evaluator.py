@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+
+class PortfolioEvaluator:
+    """
+    Scores many candidate portfolios at once: a K x N matrix of weights is evaluated in one vectorized call, the
+    returns and risks from the cached mean and covariance, and the sortino ratios from the daily returns of the
+    portfolios, a T x K matrix product with the return history computed in chunks of portfolios.
+    """
+    def __init__(self, moments, risk_free_daily_yield=0, memory_budget_mb=256):
+        """
+        construct an evaluator
+        :param moments: a Moments of the asset daily returns
+        :param risk_free_daily_yield: the daily risk-free yield, also the target of the downside deviation
+        :param memory_budget_mb: the memory the daily returns of a chunk of portfolios may take
+        """
+        self.moments = moments
+        self.risk_free_daily_yield = risk_free_daily_yield
+        self.memory_budget_mb = memory_budget_mb
+        # a missing return counts as 0 in the daily return of a portfolio. Moments built from estimates have no daily
+        # returns, only the returns, risks and sharpe ratios can be evaluated on them
+        returns = moments.returns
+        if returns is not None and np.isnan(returns).any():
+            returns = np.nan_to_num(returns)
+        self.returns = returns
+
+    def get_chunk_size(self):
+        return max(1, int(self.memory_budget_mb * 1024 * 1024 / (8 * max(len(self.returns), 1))))
+
+    def evaluate(self, weights, sortino=True):
+        """
+        evaluate portfolios
+        :param weights: a K x N array of weights, or one weight vector
+        :param sortino: also compute the downside deviations and sortino ratios, the only part reading the daily
+        returns
+        :return: a data frame of K rows with the daily return, risk and sharpe ratio, and if sortino is set the excess
+        return (the mean daily return over the risk-free yield, a missing asset return counting as 0), downside
+        deviation and sortino ratio
+        """
+        weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+        returns = weights @ self.moments.mean
+        risks = np.sqrt(np.einsum("ki,ki->k", weights @ self.moments.covariance, weights))
+        stats = {"return": returns, "risk": risks, "sharpe ratio": (returns - self.risk_free_daily_yield) / risks}
+        if sortino:
+            self.__check_returns()
+            excess_returns = weights @ self.returns.mean(axis=0) - self.risk_free_daily_yield
+            downside_deviations = self.get_downside_deviation(weights)
+            stats["excess return"] = excess_returns
+            stats["downside deviation"] = downside_deviations
+            stats["sortino ratio"] = excess_returns / downside_deviations
+        return pd.DataFrame(stats)
+
+    def get_downside_deviation(self, weights):
+        """
+        :param weights: a K x N array of weights
+        :return: the daily downside deviations of the portfolios, sqrt of the mean of min(r - rf, 0)^2 over all dates
+        """
+        self.__check_returns()
+        weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+        downside_deviations = np.empty(len(weights))
+        chunk_size = self.get_chunk_size()
+        for start in range(0, len(weights), chunk_size):
+            shortfall = self.returns @ weights[start:start + chunk_size].T - self.risk_free_daily_yield
+            np.minimum(shortfall, 0, out=shortfall)
+            downside_deviations[start:start + chunk_size] = np.sqrt(
+                np.einsum("tk,tk->k", shortfall, shortfall) / len(self.returns))
+        return downside_deviations
+
+    def __check_returns(self):
+        if self.returns is None:
+            raise ValueError("cannot compute sortino ratios without daily returns, the moments are built from "
+                             "estimates, evaluate with sortino=False")
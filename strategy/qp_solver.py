@@ -0,0 +1,284 @@
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve
+
+
+class QPSolver:
+    """
+    A dense convex quadratic programming solver for the portfolio weight optimizations:
+        minimize 1/2 x'Qx + c'x  subject to  Ax = b,  lower <= x <= upper
+    It's a primal-dual interior point method with Mehrotra's predictor-corrector, each iteration is one Cholesky
+    factorization of an N x N matrix. The interior point solution is then polished: with the bounds it ends up on
+    fixed, the equality constrained problem of the other weights is solved exactly, and the polished weights are taken
+    if they satisfy the KKT conditions.
+    """
+    def __init__(self, tolerance=1e-10, max_iterations=100, polish=True):
+        """
+        construct a solver
+        :param tolerance: the relative tolerance of the KKT residuals and the duality gap
+        :param max_iterations: the maximum number of interior point iterations
+        :param polish: polish the solution on its active set
+        """
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.polish = polish
+        self.iterations = 0
+        self.polished = False
+
+    def solve(self, Q, c=None, A=None, b=None, lower=None, upper=None):
+        """
+        solve a convex QP, Q must be positive semi-definite
+        :param lower: the lower bounds, -inf for none, default is 0
+        :param upper: the upper bounds, inf for none, default is inf
+        :return: the optimal x, raises ArithmeticError if the interior point method doesn't converge
+        """
+        Q = np.asarray(Q, dtype=np.float64)
+        n = len(Q)
+        c = np.zeros(n) if c is None else np.asarray(c, dtype=np.float64)
+        A = np.zeros((0, n)) if A is None else np.atleast_2d(np.asarray(A, dtype=np.float64))
+        b = np.zeros(0) if b is None else np.atleast_1d(np.asarray(b, dtype=np.float64))
+        lower = np.zeros(n) if lower is None else np.broadcast_to(np.asarray(lower, dtype=np.float64), n)
+        upper = np.full(n, np.inf) if upper is None else np.broadcast_to(np.asarray(upper, dtype=np.float64), n)
+
+        # scale the objective, daily return variances are around 1e-4
+        scale = max(np.abs(np.diag(Q)).max(initial=0), np.abs(c).max(initial=0), 1e-300)
+        Q, c = Q / scale, c / scale
+        x = self.__interior_point(Q, c, A, b, lower, upper)
+        self.polished = False
+        if self.polish:
+            polished = QPSolver.__polish(Q, c, A, b, lower, upper, x, np.sqrt(self.tolerance))
+            if polished is not None:
+                x, self.polished = polished, True
+        x = np.clip(x, lower, upper)
+        if np.abs(A @ x - b).max(initial=0) > 100 * self.tolerance * (1 + np.abs(b).max(initial=0)):
+            raise ArithmeticError("the solution violates the equality constraints, is Q positive semi-definite?")
+        return x
+
+    def __interior_point(self, Q, c, A, b, lower, upper):
+        m = len(A)
+        has_lower, has_upper = np.isfinite(lower), np.isfinite(upper)
+        # start in the middle of the box, one away from a single bound
+        x = np.where(has_lower & has_upper, (lower + upper) / 2,
+                     np.where(has_lower, lower + 1, np.where(has_upper, upper - 1, 0)))
+        y = np.zeros(m)
+        z_lower, z_upper = has_lower.astype(np.float64), has_upper.astype(np.float64)
+        bounds = max(has_lower.sum() + has_upper.sum(), 1)
+        norm_b, norm_c = 1 + np.abs(b).max(initial=0), 1 + np.abs(c).max(initial=0)
+
+        for self.iterations in range(1, self.max_iterations + 1):
+            s_lower = np.where(has_lower, x - lower, 1)
+            s_upper = np.where(has_upper, upper - x, 1)
+            r_dual = Q @ x + c - A.T @ y - z_lower + z_upper
+            r_primal = A @ x - b
+            mu = (s_lower @ z_lower + s_upper @ z_upper) / bounds
+            if (np.abs(r_primal).max(initial=0) < self.tolerance * norm_b and
+                    np.abs(r_dual).max(initial=0) < self.tolerance * norm_c and mu < self.tolerance):
+                return x
+
+            factor = cho_factor(Q + np.diag(z_lower / s_lower + z_upper / s_upper))
+            H_inverse_AT = cho_solve(factor, A.T)
+            schur = cho_factor(A @ H_inverse_AT) if m > 0 else None
+
+            def get_step(r_lower, r_upper):
+                h = -r_dual + np.where(has_lower, r_lower / s_lower, 0) - np.where(has_upper, r_upper / s_upper, 0)
+                H_inverse_h = cho_solve(factor, h)
+                dy = cho_solve(schur, -r_primal - A @ H_inverse_h) if m > 0 else y[:0]
+                dx = H_inverse_h + H_inverse_AT @ dy
+                dz_lower = np.where(has_lower, (r_lower - z_lower * dx) / s_lower, 0)
+                dz_upper = np.where(has_upper, (r_upper + z_upper * dx) / s_upper, 0)
+                return dx, dy, dz_lower, dz_upper
+
+            def get_step_length(dx, dz_lower, dz_upper):
+                ratios = [1.0]
+                for value, step, mask in [(s_lower, dx, has_lower), (s_upper, -dx, has_upper),
+                                          (z_lower, dz_lower, has_lower), (z_upper, dz_upper, has_upper)]:
+                    blocking = mask & (step < 0)
+                    if blocking.any():
+                        ratios.append((-value[blocking] / step[blocking]).min())
+                return min(ratios)
+
+            def get_gap(alpha, dx, dz_lower, dz_upper):
+                return ((s_lower + alpha * dx) @ ((z_lower + alpha * dz_lower) * has_lower) +
+                        (s_upper - alpha * dx) @ ((z_upper + alpha * dz_upper) * has_upper)) / bounds
+
+            # predictor: the affine scaling step
+            dx, dy, dz_lower, dz_upper = get_step(-s_lower * z_lower * has_lower, -s_upper * z_upper * has_upper)
+            alpha = get_step_length(dx, dz_lower, dz_upper)
+            sigma = (get_gap(alpha, dx, dz_lower, dz_upper) / mu) ** 3 if mu > 0 else 0
+
+            # corrector: centering and the second order term of the predictor
+            r_lower = (sigma * mu - s_lower * z_lower - dx * dz_lower) * has_lower
+            r_upper = (sigma * mu - s_upper * z_upper + dx * dz_upper) * has_upper
+            dx, dy, dz_lower, dz_upper = get_step(r_lower, r_upper)
+            alpha = min(1.0, 0.995 * get_step_length(dx, dz_lower, dz_upper))
+            if get_gap(alpha, dx, dz_lower, dz_upper) > (1 - 0.01 * alpha) * mu:
+                # with a singular Q the predictor runs far along its null space, and the second order term can grow
+                # the gap instead, e.g. cycling between the same iterates: take a plain centering step instead
+                dx, dy, dz_lower, dz_upper = get_step((0.1 * mu - s_lower * z_lower) * has_lower,
+                                                      (0.1 * mu - s_upper * z_upper) * has_upper)
+                alpha = min(1.0, 0.995 * get_step_length(dx, dz_lower, dz_upper))
+            x, y = x + alpha * dx, y + alpha * dy
+            z_lower, z_upper = z_lower + alpha * dz_lower, z_upper + alpha * dz_upper
+        raise ArithmeticError(f"the interior point method did not converge in {self.max_iterations} iterations")
+
+    @staticmethod
+    def __polish(Q, c, A, b, lower, upper, x, tolerance, max_rounds=25):
+        at_lower = np.isfinite(lower) & (x - lower < tolerance * (1 + np.abs(lower)))
+        at_upper = ~at_lower & np.isfinite(upper) & (upper - x < tolerance * (1 + np.abs(upper)))
+        # a weight the interior point method leaves close to, but not on, its bound is moved onto it, and a bound with
+        # a multiplier of the wrong sign is released, one at a time like an active set method
+        for _ in range(max_rounds):
+            polished, z = QPSolver.__solve_on_active_set(Q, c, A, b, lower, upper, at_lower, at_upper)
+            if polished is None:
+                return None
+            free = ~(at_lower | at_upper)
+            # a free weight may only be off its bounds by tolerance**2: a larger violation, clipped afterwards, would
+            # leave the weights short of the equality constraints, e.g. summing up to 1 - 1e-5 on the frontier
+            below, above = free & (polished < lower - tolerance**2), free & (polished > upper + tolerance**2)
+            if below.any() or above.any():
+                at_lower, at_upper = at_lower | below, at_upper | above
+                continue
+            wrong_sign = np.where(at_lower, -z, 0) + np.where(at_upper, z, 0)
+            if wrong_sign.max(initial=0) > tolerance:
+                release = np.argmax(wrong_sign)
+                at_lower[release] = at_upper[release] = False
+                continue
+            return polished
+        return None
+
+    @staticmethod
+    def __solve_on_active_set(Q, c, A, b, lower, upper, at_lower, at_upper):
+        free = ~(at_lower | at_upper)
+        fixed = np.where(at_lower, lower, np.where(at_upper, upper, 0))
+        n_free, m = free.sum(), len(A)
+        # [Q_ff -A_f'; A_f 0] [x_f; y] = [-c_f - Q_f,fixed x_fixed; b - A_fixed x_fixed]
+        kkt = np.zeros((n_free + m, n_free + m))
+        kkt[:n_free, :n_free] = Q[np.ix_(free, free)]
+        kkt[:n_free, n_free:] = -A[:, free].T
+        kkt[n_free:, :n_free] = A[:, free]
+        rhs = np.concatenate([-c[free] - Q[np.ix_(free, ~free)] @ fixed[~free], b - A[:, ~free] @ fixed[~free]])
+        try:
+            solution = np.linalg.solve(kkt, rhs)
+        except np.linalg.LinAlgError:
+            return None, None
+        polished = fixed.copy()
+        polished[free] = solution[:n_free]
+        # the multipliers of the bounds, >= 0 on a lower bound and <= 0 on an upper bound at the optimum
+        return polished, Q @ polished + c - A.T @ solution[n_free:]
+
+    def min_variance(self, covariance, lower=0, upper=1, mean=None, target_return=None):
+        """
+        find the minimum variance portfolio, the weights sum up to 1
+        :param mean: the expected returns, needed for a target return
+        :param target_return: if set, the portfolio return must equal it
+        :return: the weights
+        """
+        n = len(covariance)
+        A, b = np.ones((1, n)), np.ones(1)
+        if target_return is not None:
+            A, b = np.vstack([A, mean]), np.append(b, target_return)
+        return self.solve(covariance, A=A, b=b, lower=lower, upper=upper)
+
+    def max_sharpe(self, covariance, mean, risk_free_yield=0):
+        """
+        find the maximum sharpe ratio portfolio of long-only weights summing up to 1, with the variable change
+        y = w / k, k = (mean - risk_free_yield)'w > 0, that makes it the QP min y'Cy s.t. (mean - rf)'y = 1, y >= 0
+        :return: the weights, raises ValueError if no asset returns more than risk_free_yield
+        """
+        excess = np.asarray(mean, dtype=np.float64) - risk_free_yield
+        if not np.any(excess > 0):
+            raise ValueError("no asset has a return above the risk free yield, the max sharpe ratio is negative")
+        # daily excess returns are around 1e-4, which would make y around 1e4 and stall the interior point method.
+        # The weights y / y.sum() don't depend on the scale of the constraint, so the row is normalized
+        y = self.solve(covariance, A=excess[None, :] / np.abs(excess).max(), b=np.ones(1), lower=0)
+        return y / y.sum()
+
+    @staticmethod
+    def get_max_return_weights(mean, lower=0, upper=1):
+        """
+        :return: the weights of the highest return with the weights in the box summing up to 1: the best assets are
+        filled first
+        """
+        lower, upper = np.broadcast_to(lower, len(mean)), np.broadcast_to(upper, len(mean))
+        weights = np.array(lower, dtype=np.float64)
+        for i in np.argsort(-np.asarray(mean), kind="stable"):
+            weights[i] += min(upper[i] - lower[i], 1 - weights.sum())
+        return weights
+
+    def min_variance_frontier(self, covariance, mean, target_returns, lower=0, upper=1):
+        """
+        find the minimum variance portfolios of a series of target returns. A solve starts from the active set of
+        the previous target's portfolio, as the active set changes only at a few returns along the frontier, and
+        falls back to the interior point method if that doesn't converge
+        :param target_returns: the target returns, strictly between the lowest and highest attainable returns
+        :return: a K x N array of weights
+        """
+        mean = np.asarray(mean, dtype=np.float64)
+        covariance = np.asarray(covariance, dtype=np.float64)
+        n = len(mean)
+        lower, upper = np.broadcast_to(lower, n).astype(np.float64), np.broadcast_to(upper, n).astype(np.float64)
+        Q, c, A = covariance / np.abs(np.diag(covariance)).max(), np.zeros(n), np.vstack([np.ones(n), mean])
+        tolerance = np.sqrt(self.tolerance)
+        frontier = np.empty((len(target_returns), n))
+        weights = None
+        for k, target_return in enumerate(target_returns):
+            polished = None
+            if weights is not None:
+                polished = QPSolver.__polish(Q, c, A, np.array([1, target_return]), lower, upper, weights, tolerance)
+            weights = np.clip(polished, lower, upper) if polished is not None else \
+                self.min_variance(covariance, lower, upper, mean, target_return)
+            frontier[k] = weights
+        return frontier
+
+    def target_risk(self, covariance, mean, target_risk, lower=0, upper=1):
+        """
+        find the efficient portfolio, of the highest return, with a given risk. The return is searched between the
+        minimum variance portfolio's and the highest attainable, each step a minimum variance QP with a target return
+        :param target_risk: the risk in the same unit as the covariance, e.g. daily
+        :return: the weights, the minimum variance or the highest return portfolio if target_risk is out of reach
+        """
+        mean = np.asarray(mean, dtype=np.float64)
+        covariance = np.asarray(covariance, dtype=np.float64)
+        min_variance_weights = self.min_variance(covariance, lower, upper)
+        if np.sqrt(min_variance_weights @ covariance @ min_variance_weights) >= target_risk:
+            return min_variance_weights
+        n = len(mean)
+        lower, upper = np.broadcast_to(lower, n).astype(np.float64), np.broadcast_to(upper, n).astype(np.float64)
+        max_return_weights = QPSolver.get_max_return_weights(mean, lower, upper)
+        low, high = min_variance_weights @ mean, max_return_weights @ mean
+        if np.sqrt(max_return_weights @ covariance @ max_return_weights) <= target_risk or high - low <= 1e-15:
+            return max_return_weights
+
+        # on the active set of a frontier portfolio the weights are linear in the target return, w = a + r d, so the
+        # variance is quadratic in it: solve it for the target risk, then correct the active set at that return and
+        # repeat, a Newton iteration over the piecewise quadratic frontier. A step leaving the bracket of returns
+        # known to be below and above the target risk bisects it instead
+        scale = np.abs(np.diag(covariance)).max()
+        Q, c, A = covariance / scale, np.zeros(n), np.vstack([np.ones(n), mean])
+        tolerance = np.sqrt(self.tolerance)
+        weights = min_variance_weights
+        for _ in range(100):
+            target_return = None
+            at_lower = weights - lower < tolerance * (1 + np.abs(lower))
+            at_upper = ~at_lower & (upper - weights < tolerance * (1 + np.abs(upper)))
+            a = QPSolver.__solve_on_active_set(Q, c, A, np.array([1, 0]), lower, upper, at_lower, at_upper)[0]
+            if a is not None:
+                d = QPSolver.__solve_on_active_set(Q, c, A, np.array([1, 1]), lower, upper, at_lower, at_upper)[0] - a
+                alpha, beta, gamma = a @ covariance @ a - target_risk**2, a @ covariance @ d, d @ covariance @ d
+                if gamma > 0 and beta**2 - alpha * gamma >= 0:
+                    target_return = (-beta + np.sqrt(beta**2 - alpha * gamma)) / gamma
+            if target_return is None or not low < target_return < high:
+                target_return, a, d = (low + high) / 2, None, None
+            polished = None
+            if a is not None:
+                polished = QPSolver.__polish(Q, c, A, np.array([1, target_return]), lower, upper,
+                                             a + target_return * d, tolerance)
+            weights = np.clip(polished, lower, upper) if polished is not None else \
+                self.min_variance(covariance, lower, upper, mean, target_return)
+            risk = np.sqrt(weights @ covariance @ weights)
+            if abs(risk - target_risk) <= 1e-9 * target_risk:
+                return weights
+            if risk < target_risk:
+                low = target_return
+            else:
+                high = target_return
+        raise ArithmeticError(f"cannot find the efficient portfolio of risk {target_risk}")
@@ -0,0 +1,209 @@
+import copy
+import os
+import tempfile
+import multiprocessing
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from dateutil.relativedelta import relativedelta
+from core.portfolio import Portfolio
+from core.moments import Moments
+from core.return_matrix import ReturnMatrix
+from strategy.portfolio_evaluator import PortfolioEvaluator
+
+# how the training window of each evaluation period is chosen
+#   expanding: all the returns before the period
+#   rolling: the returns of the training_years years before the period
+trainings = ["expanding", "rolling"]
+steps = {"year": relativedelta(years=1), "month": relativedelta(months=1)}
+
+
+class WalkForward:
+    """
+    Walk-forward evaluation of MPT: the history is cut into evaluation periods of a year or a month, for each period
+    the weights optimized on its training window (the prediction) and on the period itself (the ground truth, the best
+    possible portfolio of the period) are applied to the period's returns. Every (window, objective) optimization is
+    independent of the others, so they are solved by a pool of processes attached to one memory-mapped return matrix.
+    """
+    objectives = ["min risk", "max sharpe ratio", "max sortino ratio"]
+
+    def __init__(self, mpt, training="expanding", training_years=1, step="year", processes=None, matrix_path=None):
+        """
+        construct an engine
+        :param mpt: the MPT whose risk-free yield, target risk and solver are used to optimize the weights
+        :param training: one of trainings
+        :param training_years: the length of a rolling training window, and of the training window of the first period
+        :param step: the length of an evaluation period, one of steps
+        :param processes: number of worker processes, default is the number of cpus, 1 solves in this process
+        :param matrix_path: the .npy file the returns are shared through, default is a temporary file
+        """
+        if training not in trainings:
+            raise ValueError(f"unknown training {training}, expect one of {trainings}")
+        if step not in steps:
+            raise ValueError(f"unknown step {step}, expect one of {list(steps)}")
+        self.mpt = copy.copy(mpt)
+        self.mpt.portfolio = None  # the workers get their own portfolio of each window
+        self.training = training
+        self.training_years = training_years
+        self.step = step
+        self.processes = processes if processes is not None else multiprocessing.cpu_count()
+        self.matrix_path = matrix_path
+        self.periods = None
+        self.weights = None
+        self.table = None
+
+    def get_periods(self, dates):
+        """
+        :param dates: the dates of the daily returns
+        :return: a data frame of the evaluation periods, with the first and last (exclusive) rows of the training
+        window and of the period, indexed by the end date of the period
+        """
+        first_date = dates[0]
+        boundaries = []
+        k = 0
+        boundary = first_date + relativedelta(years=self.training_years)
+        while boundary <= dates[-1]:
+            boundaries.append(boundary)
+            k += 1
+            boundary = first_date + relativedelta(years=self.training_years) + steps[self.step] * k
+        # the last period ends with the history, shorter than a step unless the history ends at a boundary
+        boundaries.append(dates[-1] + relativedelta(days=1))
+        periods = []
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            training_start = first_date if self.training == "expanding" \
+                else start - relativedelta(years=self.training_years)
+            periods.append({"evaluation date": end.strftime('%Y-%m-%d'),
+                            "training first": dates.searchsorted(training_start, side="left"),
+                            "training last": dates.searchsorted(start, side="left"),
+                            "first": dates.searchsorted(start, side="left"),
+                            "last": dates.searchsorted(end, side="left")})
+        periods = pd.DataFrame(periods, columns=["evaluation date", "training first", "training last", "first", "last"])
+        # a window needs 2 returns for a covariance
+        periods = periods[(periods["training last"] - periods["training first"] >= 2) &
+                          (periods["last"] - periods["first"] >= 2)]
+        return periods.set_index("evaluation date")
+
+    def run(self, returns):
+        """
+        optimize the prediction and ground truth weights of every period and objective, and evaluate them
+        :param returns: a dates x assets data frame of daily returns, e.g. the price changes of a portfolio
+        :return: a data frame of the annualized stats of the predicted and best portfolios, indexed by the end date of
+        the period
+        """
+        self.periods = self.get_periods(returns.index)
+        # a rolling window of the training length is also the ground truth window of an earlier period, solve it once
+        windows = list(dict.fromkeys([(first, last) for _, period in self.periods.iterrows()
+                                      for first, last in [(period["training first"], period["training last"]),
+                                                          (period["first"], period["last"])]]))
+        tasks = [(int(first), int(last), objective) for first, last in windows for objective in self.objectives]
+        if self.processes == 1:
+            solutions = [walk_forward_optimize(self.mpt, returns.iloc[first:last], objective)
+                         for first, last, objective in tasks]
+        else:
+            solutions = self.__solve_in_pool(returns, tasks)
+        solutions = dict(zip(tasks, solutions))
+
+        rows = []
+        self.weights = {objective: [] for objective in self.objectives}
+        for _, period in self.periods.iterrows():
+            predicted = [solutions[(period["training first"], period["training last"], objective)]
+                         for objective in self.objectives]
+            best = [solutions[(period["first"], period["last"], objective)] for objective in self.objectives]
+            for objective, weights in zip(self.objectives, predicted):
+                self.weights[objective].append(weights)
+            rows.append(self.__evaluate_period(returns.iloc[period["first"]:period["last"]], predicted, best))
+        self.weights = {objective: pd.DataFrame(weights, index=self.periods.index, columns=returns.columns)
+                        for objective, weights in self.weights.items()}
+        self.table = pd.DataFrame(rows, index=self.periods.index)
+        return self.table
+
+    def __solve_in_pool(self, returns, tasks):
+        with tempfile.TemporaryDirectory() as directory:
+            matrix_path = self.matrix_path if self.matrix_path is not None else os.path.join(directory, "returns.npy")
+            ReturnMatrix.save(matrix_path, returns)
+            tasks = [(matrix_path, self.mpt) + task for task in tasks]
+            try:
+                with multiprocessing.Pool(self.processes, initializer=walk_forward_worker_initializer,
+                                          initargs=(matrix_path,)) as p:
+                    # solves differ a lot in length, hand them out one at a time
+                    return p.map(walk_forward_worker, tasks, 1)
+            finally:
+                ReturnMatrix.attached.pop(matrix_path, None)
+
+    def __evaluate_period(self, returns, predicted, best):
+        evaluator = PortfolioEvaluator(Moments(returns), self.mpt.risk_free_daily_yield)
+        stats = evaluator.evaluate(np.vstack(predicted + best))
+        rf = self.mpt.risk_free_daily_yield
+        stats["annualized return"] = stats["return"] * 252
+        stats["annualized risk"] = stats["risk"] * np.sqrt(252)
+        stats["annualized sharpe"] = (stats["return"] - rf) * np.sqrt(252) / stats["risk"]
+        stats["annualized excess return"] = stats["excess return"] * 252
+        stats["annualized sortino"] = stats["sortino ratio"] * np.sqrt(252)
+        # rows: predicted min risk, max sharpe, max sortino, then the best of each
+        return {"predicted_minrisk_risk": stats["annualized risk"][0],
+                "best_minrisk_risk": stats["annualized risk"][3],
+                "predicted_minrisk_return": stats["annualized return"][0],
+                "best_minrisk_return": stats["annualized return"][3],
+                "predicted_minrisk_sharpe": stats["annualized sharpe"][0],
+                "best_minrisk_sharpe": stats["annualized sharpe"][3],
+                "predicted_maxsharpe_risk": stats["annualized risk"][1],
+                "best_maxsharpe_risk": stats["annualized risk"][4],
+                "predicted_maxsharpe_return": stats["annualized return"][1],
+                "best_maxsharpe_return": stats["annualized return"][4],
+                "predicted_maxsharpe_sharpe": stats["annualized sharpe"][1],
+                "best_maxsharpe_sharpe": stats["annualized sharpe"][4],
+                "predicted_max_sortino_ratio": stats["annualized sortino"][2],
+                "best_max_sortino_ratio": stats["annualized sortino"][5],
+                "predicted_max_sortino_return": stats["annualized excess return"][2],
+                "best_max_sortino_return": stats["annualized excess return"][5]}
+
+    def plot(self, tickers, table=None):
+        """
+        plot the predicted stats against the ground truth
+        :param tickers: the tickers of the portfolio, shown in the titles
+        :param table: a data frame returned by run, default is the last one
+        """
+        df = table if table is not None else self.table
+        df[['predicted_minrisk_risk', 'best_minrisk_risk']].plot(style=['r*-','bo-'], title=f"{tickers} predicted optimized RISK v.s. actual optimized RISK")
+        df[['predicted_minrisk_return', 'best_minrisk_return']].plot(style=['r*-','bo-'], title=f"{tickers} predicted v.s. actual RETURN by minimizing RISK")
+        df[['predicted_maxsharpe_sharpe', 'best_maxsharpe_sharpe']].plot(style=['r*-','bo-'], title=f"{tickers} predicted optimized SHARPE v.s. actual optimized SHARPE")
+        df[['predicted_maxsharpe_return', 'best_maxsharpe_return']].plot(style=['r*-','bo-'], title=f"{tickers} predicted v.s. actual RETURN by maximizing SHARPE")
+        df[['predicted_max_sortino_ratio', 'best_max_sortino_ratio']].plot(style=['r*-','bo-'], title=f"{tickers} predicted v.s. actual SORTINO by maximizing SORTINO")
+        df[['predicted_max_sortino_return', 'best_max_sortino_return']].plot(style=['r*-','bo-'], title=f"{tickers} predicted v.s. actual RETURN by maximizing SORTINO")
+        plt.show()
+
+
+def walk_forward_optimize(mpt, returns, objective):
+    """
+    This is a helper function optimizing the weights of one window for one objective.
+    :param mpt: an MPT without a portfolio
+    :param returns: a dates x assets data frame of the daily returns in the window
+    :param objective: one of WalkForward.objectives
+    :return: the weights
+    """
+    portfolio = Portfolio()
+    portfolio.full_asset_price_history_change = returns
+    portfolio.asset_weights = [1/len(returns.columns)] * len(returns.columns)
+    mpt = copy.copy(mpt)
+    mpt.portfolio = portfolio
+    return mpt.optimize(objective)
+
+
+def walk_forward_worker_initializer(matrix_path):
+    """
+    This is a pool initializer attaching each worker process to the shared return matrix
+    """
+    ReturnMatrix.attach(matrix_path)
+
+
+def walk_forward_worker(task):
+    """
+    This is a helper function to parallelize the walk-forward optimizations.
+    :param task: a tuple (matrix path, MPT, first row, last row (exclusive), objective)
+    :return: the weights
+    """
+    matrix_path, mpt, first, last, objective = task
+    matrix = ReturnMatrix.attach(matrix_path)
+    returns = pd.DataFrame(np.array(matrix.values[first:last]), index=matrix.dates[first:last],
+                           columns=matrix.tickers)
+    return walk_forward_optimize(mpt, returns, objective)
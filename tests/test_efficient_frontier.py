@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.optimize import minimize
+from core.moments import Moments
+from core.portfolio import Portfolio
+from strategy.efficient_frontier import EfficientFrontier
+from strategy.modern_portfolio_theory_strategy import MPT
+from strategy.qp_solver import QPSolver
+
+mean = np.array([0.05, 0.08, 0.12, 0.2])
+volatility = np.array([0.1, 0.15, 0.2, 0.35])
+correlation = np.array([[1, 0.3, 0.2, 0.1],
+                        [0.3, 1, 0.4, 0.3],
+                        [0.2, 0.4, 1, 0.5],
+                        [0.1, 0.3, 0.5, 1]])
+covariance = correlation * np.outer(volatility, volatility)
+
+
+def get_singular_moments():
+    # a fifth asset holding half of the first two has a covariance of rank 4
+    mixer = np.vstack([np.eye(4), [0.5, 0.5, 0, 0]])
+    return Moments.from_estimates(mixer @ mean, mixer @ covariance @ mixer.T)
+
+
+def get_slsqp_min_variance(moments, target_return):
+    n = len(moments.mean)
+    result = minimize(lambda w: w @ moments.covariance @ w, np.full(n, 1 / n),
+                      jac=lambda w: 2 * moments.covariance @ w, bounds=[(0, 1)] * n,
+                      constraints=[{"type": "eq", "fun": lambda w: w.sum() - 1},
+                                   {"type": "eq", "fun": lambda w: w @ moments.mean - target_return}],
+                      method="SLSQP", options={"ftol": 1e-15, "maxiter": 1000})
+    assert result.success
+    return result.x
+
+
+@pytest.mark.parametrize("moments", [Moments.from_estimates(mean, covariance), get_singular_moments()],
+                         ids=["regular", "singular"])
+def test_frontier_is_monotone_and_matches_slsqp(moments):
+    risks, returns, weights = EfficientFrontier(moments).trace(points=25, efficient_only=True)
+
+    assert np.all(np.diff(returns) > 0)
+    assert np.all(np.diff(risks) >= -1e-12)
+    assert np.allclose(weights.sum(axis=1), 1, atol=1e-12) and weights.min() >= 0 and weights.max() <= 1
+    for risk, target_return in zip(risks, returns):
+        reference = get_slsqp_min_variance(moments, target_return)
+        # the variance is unique even where the weights of the singular covariance are not
+        assert risk <= np.sqrt(reference @ moments.covariance @ reference) + 1e-8
+
+
+def test_full_frontier_turns_at_the_min_variance_portfolio():
+    moments = Moments.from_estimates(mean, covariance)
+    risks, returns, _ = EfficientFrontier(moments).trace(points=40)
+    turn = np.argmin(risks)
+    min_variance = QPSolver().min_variance(covariance)
+
+    assert np.all(np.diff(returns) > 0)
+    assert np.all(np.diff(risks[:turn + 1]) <= 1e-12) and np.all(np.diff(risks[turn:]) >= -1e-12)
+    assert returns[0] == mean.min() and returns[-1] == mean.max()
+    assert risks[turn] >= np.sqrt(min_variance @ covariance @ min_variance) - 1e-12
+
+
+def get_mpt(solver, risk_free_annual_yield=0.01):
+    # three years of daily returns drawn from the covariance, with a fifth asset making it singular
+    random = np.random.default_rng(3)
+    returns = random.multivariate_normal(mean / 252, covariance / 252, 756)
+    returns = np.hstack([returns, returns[:, :2].mean(axis=1, keepdims=True)])
+    portfolio = Portfolio()
+    portfolio.full_asset_price_history_change = pd.DataFrame(returns, columns=["A", "B", "C", "D", "E"])
+    portfolio.asset_weights = [0.2] * 5
+    mpt = MPT(risk_free_annual_yield=risk_free_annual_yield, solver=solver)
+    mpt.portfolio = portfolio
+    return mpt
+
+
+@pytest.mark.parametrize("objective", ["min risk", "max sharpe ratio"])
+def test_qp_optimize_matches_slsqp_with_singular_covariance(objective):
+    qp, slsqp = get_mpt("qp"), get_mpt("slsqp")
+    moments = qp.portfolio.get_moments()
+    weights, reference = qp.optimize(objective), slsqp.optimize(objective)
+
+    assert abs(weights.sum() - 1) < 1e-12 and weights.min() >= 0
+    if objective == "min risk":
+        assert moments.get_risk(weights) <= moments.get_risk(reference) + 1e-10
+    else:
+        sharpe = (moments.get_return(weights) - qp.risk_free_daily_yield) / moments.get_risk(weights)
+        reference_sharpe = (moments.get_return(reference) - qp.risk_free_daily_yield) / moments.get_risk(reference)
+        assert sharpe >= reference_sharpe - 1e-8
+
+
+@pytest.mark.parametrize("objective", ["min risk", "max sharpe ratio"])
+def test_qp_failure_falls_back_to_slsqp(objective, monkeypatch):
+    reference = get_mpt("slsqp").optimize(objective)
+
+    def fail(*args, **kwargs):
+        raise ArithmeticError("the interior point method did not converge in 100 iterations")
+
+    monkeypatch.setattr(QPSolver, "solve", fail)
+    assert np.allclose(get_mpt("qp").optimize(objective), reference)
+
+
+def test_max_sharpe_without_positive_excess_return_falls_back_to_slsqp():
+    # every asset returns less than the risk free yield, the QP has no solution
+    qp, slsqp = get_mpt("qp", risk_free_annual_yield=2), get_mpt("slsqp", risk_free_annual_yield=2)
+    assert np.allclose(qp.optimize("max sharpe ratio"), slsqp.optimize("max sharpe ratio"))
@@ -0,0 +1,167 @@
+import time
+import threading
+import pytest
+import requests
+from common.fetch_scheduler import TokenBucket, FetchScheduler, FetchError, classify_failure
+
+
+class FakeClock:
+    """
+    A clock only moving when slept on, recording every sleep
+    """
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def get_http_error(status, message="error"):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(message, response=response)
+
+
+def test_token_bucket_bursts_then_refills_at_its_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=4, clock=clock, sleep=clock.sleep)
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [0.5]
+
+    # idle long enough to refill more than the capacity, only a burst of capacity goes out without waiting
+    clock.now += 10
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.sleeps == [0.5]
+    bucket.acquire()
+    assert clock.sleeps == [0.5, 0.5]
+
+
+def test_token_bucket_pauses_keep_the_latest_deadline():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=4, clock=clock, sleep=clock.sleep)
+    bucket.pause(3)
+    bucket.pause(1)
+    bucket.acquire()
+    # the bucket is empty when the pause ends, the first token takes 1 / rate to refill
+    assert clock.sleeps == [3, 0.5]
+
+
+def test_scheduler_caps_the_requests_in_flight():
+    scheduler = FetchScheduler(rate=1000, burst=1000, max_concurrency=3)
+    lock = threading.Lock()
+    release = threading.Event()
+    in_flight = [0, 0]  # current, max
+
+    def fetch():
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        release.wait()
+        with lock:
+            in_flight[0] -= 1
+        return True
+
+    threads = [threading.Thread(target=scheduler.call, args=(fetch,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while in_flight[0] < 3:
+        time.sleep(0.01)
+    time.sleep(0.1)  # the other threads had the time to get in if they could
+    assert in_flight == [3, 3]
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert in_flight == [0, 3]
+
+
+def test_scheduler_retries_retryable_failures_with_backoff():
+    clock = FakeClock()
+    scheduler = FetchScheduler(rate=1000, burst=1000, max_retries=4, base_delay=1, max_delay=3, clock=clock,
+                               sleep=clock.sleep)
+    errors = [get_http_error(500), requests.ConnectionError("reset"), get_http_error(503)]
+
+    def fetch():
+        if errors:
+            raise errors.pop(0)
+        return "data"
+
+    assert scheduler.call(fetch) == "data"
+    assert len(clock.sleeps) == 3
+    assert all(0 <= delay <= limit for delay, limit in zip(clock.sleeps, [1, 2, 3]))
+    assert scheduler.failures == {"server_error": 2, "network": 1}
+
+
+def test_scheduler_gives_up_after_max_retries():
+    clock = FakeClock()
+    scheduler = FetchScheduler(rate=1000, burst=1000, max_retries=2, clock=clock, sleep=clock.sleep)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        raise get_http_error(502)
+
+    with pytest.raises(FetchError) as e:
+        scheduler.call(fetch)
+    assert e.value.kind == "server_error"
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize("error", [get_http_error(404), get_http_error(401), get_http_error(400), KeyError("price")])
+def test_scheduler_does_not_retry_other_failures(error):
+    clock = FakeClock()
+    scheduler = FetchScheduler(rate=1000, burst=1000, clock=clock, sleep=clock.sleep)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        raise error
+
+    with pytest.raises(FetchError) as e:
+        scheduler.call(fetch)
+    assert e.value.kind == classify_failure(error)
+    assert len(calls) == 1
+    assert clock.sleeps == []
+
+
+def test_rate_limited_failure_pauses_the_bucket():
+    clock = FakeClock()
+    scheduler = FetchScheduler(rate=1000, burst=1000, base_delay=1, clock=clock, sleep=clock.sleep)
+    errors = [get_http_error(200, "Limit Reach . Please upgrade your plan")]
+
+    def fetch():
+        if errors:
+            raise errors.pop(0)
+        return "data"
+
+    assert scheduler.call(fetch) == "data"
+    assert scheduler.failures == {"rate_limited": 1}
+    # the bucket was emptied by the pause, the retry waited for a token to refill
+    assert len(clock.sleeps) == 2 and abs(clock.sleeps[1] - 1 / 1000) < 1e-12
+
+
+@pytest.mark.parametrize("error, kind", [
+    (get_http_error(429), "rate_limited"),
+    (get_http_error(200, "Limit Reach . Please upgrade your plan"), "rate_limited"),
+    (get_http_error(403), "unauthorized"),
+    (get_http_error(200, "Invalid API KEY."), "unauthorized"),
+    (get_http_error(404), "not_found"),
+    (get_http_error(500), "server_error"),
+    (get_http_error(400), "error"),
+    (requests.ConnectionError("reset"), "network"),
+    (requests.Timeout("timed out"), "network"),
+    (KeyError("price"), "no_data"),
+    (IndexError("list index out of range"), "no_data"),
+    (FetchError("not_found", "unknown ticker"), "not_found"),
+    (RuntimeError("boom"), "error"),
+])
+def test_classify_failure(error, kind):
+    assert classify_failure(error) == kind
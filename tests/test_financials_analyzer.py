@@ -0,0 +1,88 @@
+import os
+import pandas as pd
+import pytest
+import tools.financials_analyzer as financials_analyzer
+from core.asset import Asset
+from core.benchmark import benchmarks
+from common.fundamentals_store import FundamentalsStore, FUNDAMENTALS_ITEMS
+
+tickers = ["AAA", "BBB", "CCC", "DDD", "EEE", "FFF"]
+run = {"number": 1, "failing": {"DDD"}}  # forked workers see what the test set before the scrape
+
+
+def get_row(ticker, number):
+    # the current price column tells which run scraped the row
+    return "\t".join([ticker, "1000000000.0", "Software", "Technology", str(number)] +
+                     ["0.1"] * (len(FUNDAMENTALS_ITEMS) - 6) + ["2020-12-31"]) + "\n"
+
+
+def scrape(args):
+    if args[0] in run["failing"]:
+        return args[0], None, "not_found"
+    return args[0], get_row(args[0], run["number"]), None
+
+
+@pytest.fixture
+def scraping(tmp_path, monkeypatch):
+    monkeypatch.setattr(financials_analyzer, "company_scraping_worker", scrape)
+    benchmarks.set(Asset("SPY"))  # the workers don't need the benchmark's price
+    store = FundamentalsStore(root=str(tmp_path / "fundamentals"))
+
+    def run_scrape(number, **kwargs):
+        run["number"] = number
+        financials_analyzer.scrape_company_fundamentals(tickers, str(tmp_path / "scrape.tsv"), 0.01, processes=2,
+                                                        fundamentals_store=store, **kwargs)
+        return pd.read_csv(tmp_path / "scrape.tsv", sep="\t", index_col="ticker")
+
+    yield run_scrape, tmp_path / "scrape.tsv"
+    benchmarks.clear()
+
+
+def test_resume_a_truncated_scrape(scraping):
+    run_scrape, path = scraping
+    run_scrape(1)
+    with open(path, encoding="utf-8") as fp:
+        lines = fp.readlines()
+    # interrupted while writing the row of CCC, the journal is gone too
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.writelines(lines[:3] + [lines[3][:20]])
+    os.remove(f"{path}.journal")
+
+    data = run_scrape(2, resume=True)
+    assert list(data.index) == ["AAA", "BBB", "CCC", "EEE", "FFF"]
+    assert list(data["current price"]) == [1, 1, 2, 2, 2]
+
+
+def test_resume_from_the_journal_and_retry_failed(scraping):
+    run_scrape, path = scraping
+    run_scrape(1)
+    # the row of EEE is written but its journal record isn't, FFF has neither
+    with open(path, encoding="utf-8") as fp:
+        lines = [line for line in fp if not line.startswith("FFF\t")]
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.writelines(lines)
+    with open(f"{path}.journal", "w", encoding="utf-8") as journal:
+        journal.write("done\tAAA\ndone\tBBB\nfailed\tDDD\tnot_found\ndone\tCCC\ndone\tEE")
+
+    data = run_scrape(2, resume=True)
+    assert list(data.index) == ["AAA", "BBB", "CCC", "EEE", "FFF"]
+    assert list(data["current price"]) == [1, 1, 1, 1, 2]
+
+    run["failing"] = set()
+    try:
+        data = run_scrape(3, retry_failed=True)
+    finally:
+        run["failing"] = {"DDD"}
+    assert list(data.index) == tickers
+    assert list(data["current price"]) == [1, 1, 1, 3, 1, 2]
+
+
+def test_refuse_to_resume_a_file_with_another_header(scraping):
+    run_scrape, path = scraping
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.write("\t".join(FUNDAMENTALS_ITEMS[:-1]) + "\n" + get_row("AAA", 1))
+
+    with pytest.raises(ValueError, match="statement date"):
+        run_scrape(2, resume=True)
+    with open(path, encoding="utf-8") as fp:
+        assert len(fp.readlines()) == 2  # untouched
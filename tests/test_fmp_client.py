@@ -0,0 +1,90 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import pytest
+from common.fmp_client import FmpClient
+from common.response_cache import ResponseCache
+from common.fetch_scheduler import FetchScheduler, FetchError
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    A stub of the api: /ok/{ticker} returns a record, /limit/ and /invalid/ return the error payloads of the api, and
+    /missing/ and /broken/ fail with 404 and 500
+    """
+    protocol_version = "HTTP/1.1"  # keep-alive, so a pooled connection serves several requests
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        endpoint, ticker = url.path.strip("/").rsplit("/", 1)
+        self.server.requests.append((endpoint, ticker, parse_qs(url.query), self.client_address))
+        status, data = {"limit": (200, {"Error Message": "Limit Reach . Please upgrade your plan"}),
+                        "invalid": (200, {"Error Message": "Invalid API KEY."}),
+                        "missing": (404, {}),
+                        "broken": (500, {})}.get(endpoint, (200, [{"symbol": ticker}]))
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get_client(server, tmp_path, **kwargs):
+    return FmpClient(base_url=f"http://127.0.0.1:{server.server_port}", api_key="test", timeout=5,
+                     cache=ResponseCache(root=str(tmp_path)), **kwargs)
+
+
+def test_get_all_uses_the_pooled_session(server, tmp_path):
+    client = get_client(server, tmp_path, max_workers=4)
+    queries = [("ok", f"T{i}", i % 2 == 1) for i in range(24)]
+    results = client.get_all(queries)
+
+    assert results == [[{"symbol": f"T{i}"}] for i in range(24)]
+    assert len(server.requests) == 24
+    # every request went over one of the 4 kept-alive connections of the session
+    assert len({address for _, _, _, address in server.requests}) <= 4
+    periods = {ticker: query.get("period") for _, ticker, query, _ in server.requests}
+    assert periods == {f"T{i}": ["quarter"] if i % 2 == 1 else None for i in range(24)}
+
+
+def test_probe_sends_limit_1_and_bypasses_the_cache(server, tmp_path):
+    client = get_client(server, tmp_path)
+    assert client.get("ok", "AAA") == [{"symbol": "AAA"}]
+    assert client.get("ok", "AAA") == [{"symbol": "AAA"}]
+    assert len(server.requests) == 1  # the second get is served from the cache
+
+    assert client.probe("ok", "AAA") == [{"symbol": "AAA"}]
+    assert client.probe("ok", "AAA") == [{"symbol": "AAA"}]
+    assert len(server.requests) == 3
+    assert all(query["limit"] == ["1"] for _, _, query, _ in server.requests[1:])
+    assert "limit" not in server.requests[0][2]
+
+
+def test_error_payloads_are_classified_and_not_cached(server, tmp_path):
+    client = get_client(server, tmp_path, scheduler=FetchScheduler(rate=1000, burst=1000, max_retries=0))
+    for endpoint, kind in [("limit", "rate_limited"), ("invalid", "unauthorized"), ("missing", "not_found"),
+                           ("broken", "server_error")]:
+        with pytest.raises(FetchError) as e:
+            client.get(endpoint, "AAA")
+        assert e.value.kind == kind
+        with pytest.raises(FetchError):
+            client.get(endpoint, "AAA")
+    # each failure was requested again, none of them was cached
+    assert [endpoint for endpoint, _, _, _ in server.requests] == \
+           ["limit", "limit", "invalid", "invalid", "missing", "missing", "broken", "broken"]
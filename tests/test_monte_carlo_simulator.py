@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import pytest
+from core.asset import Asset
+from core.moments import Moments
+from core.price_provider import FixturePriceProvider
+from strategy.monte_carlo_simulator import MonteCarloSimulator
+from strategy.portfolio_evaluator import PortfolioEvaluator
+import tools.modern_portfolio_theory_optimizer as optimizer
+
+tickers = ["AAA", "BBB", "CCC", "DDD"]
+
+
+def get_returns():
+    random = np.random.default_rng(13)
+    values = random.normal([0.0002, 0.0004, 0.0006, 0.0008], [0.008, 0.012, 0.016, 0.02], (504, 4))
+    return pd.DataFrame(values + random.normal(0, 0.006, (504, 1)), columns=tickers)
+
+
+def simulate(seed, metric="sharpe ratio", chunk_size=5000):
+    simulator = MonteCarloSimulator(Moments(get_returns()), risk_free_daily_yield=0.0001, chunk_size=chunk_size,
+                                    seed=seed)
+    top = simulator.simulate(20000, top_k=5, metric=metric)
+    return simulator, top
+
+
+@pytest.mark.parametrize("metric", ["sharpe ratio", "sortino ratio", "risk"])
+def test_seeded_simulation_is_reproducible(metric):
+    simulator, top = simulate(42, metric)
+    again, top_again = simulate(42, metric)
+
+    pd.testing.assert_frame_equal(top, top_again)
+    pd.testing.assert_frame_equal(simulator.get_summary(), again.get_summary())
+    assert np.array_equal(simulator.histogram, again.histogram)
+    other, _ = simulate(43, metric)
+    assert not other.get_summary().equals(simulator.get_summary())
+
+
+def test_sample_statistics():
+    simulator, top = simulate(42)
+    moments = simulator.moments
+    summary = simulator.get_summary()
+
+    assert simulator.count == 20000 and simulator.histogram.sum() == 20000
+    assert (summary["portfolios"] == 20000).all()
+    # uniform weights over the simplex average to equal weights
+    assert abs(summary.loc["return", "mean"] - moments.mean.mean()) < 0.01 * moments.mean.mean()
+    assert moments.mean.min() <= summary.loc["return", "min"] <= summary.loc["return", "max"] <= moments.mean.max()
+    # the top portfolios are the best sampled, and their stats are those of their weights
+    assert top["sharpe ratio"].is_monotonic_decreasing
+    assert top["sharpe ratio"].iloc[0] == summary.loc["sharpe ratio", "max"]
+    stats = PortfolioEvaluator(moments, 0.0001).evaluate(top[tickers].to_numpy(), sortino=False)
+    assert np.allclose(stats["sharpe ratio"], top["sharpe ratio"], rtol=1e-12)
+
+
+def test_chunks_of_the_same_stream_give_the_same_top():
+    simulator, top = simulate(42, chunk_size=20000)
+    chunked, top_chunked = simulate(42, chunk_size=20000 // 8)
+    # the chunks draw the same stream, and the top of each chunk is merged with the top so far
+    pd.testing.assert_frame_equal(top, top_chunked)
+    assert np.allclose(simulator.get_summary(), chunked.get_summary(), rtol=1e-12)
+
+
+@pytest.fixture
+def fixture_prices(tmp_path, monkeypatch):
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=505)
+    prices = 100 * np.cumprod(1 + np.vstack([np.zeros(4), get_returns().to_numpy()]), axis=0)
+    provider = FixturePriceProvider(str(tmp_path))
+    for i, ticker in enumerate(tickers):
+        provider.save(ticker, "1d", pd.DataFrame({"Open": prices[:, i], "Close": prices[:, i]}, index=dates))
+    monkeypatch.setattr(Asset, "price_provider", provider)
+    shows = []
+    monkeypatch.setattr(plt, "show", lambda *args, **kwargs: shows.append(plt.get_fignums()))
+    plt.close("all")
+    yield shows
+    plt.close("all")
+
+
+def test_mpt_monte_carlo_without_plot_never_opens_a_figure(fixture_prices):
+    annual = optimizer.mpt_monte_carlo(tickers, risk_free_annual_yield=0.02, samples=5000, top_k=3,
+                                       show_details=False, show_plot=False, seed=1)
+    again = optimizer.mpt_monte_carlo(tickers, risk_free_annual_yield=0.02, samples=5000, top_k=3,
+                                      show_details=False, show_plot=False, seed=1)
+
+    assert plt.get_fignums() == [] and fixture_prices == []
+    pd.testing.assert_frame_equal(annual, again)
+    assert len(annual) == 3 and np.allclose(annual[tickers].sum(axis=1), 1)
+
+
+def test_mpt_monte_carlo_with_plot_shows_one_figure(fixture_prices):
+    optimizer.mpt_monte_carlo(tickers, samples=5000, top_k=3, show_details=False, show_plot=True, seed=1)
+    assert fixture_prices == [[1]]
@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+from core.moments import Moments
+from strategy.portfolio_evaluator import PortfolioEvaluator
+
+
+def test_evaluate_moments_from_estimates():
+    moments = Moments.from_estimates([0.001, 0.0005], [[0.0004, 0.0001], [0.0001, 0.0002]])
+    evaluator = PortfolioEvaluator(moments)
+    stats = evaluator.evaluate([[1, 0], [0.5, 0.5]], sortino=False)
+
+    assert np.allclose(stats["return"], [0.001, 0.00075])
+    assert np.allclose(stats["risk"], [0.02, np.sqrt(0.0002)])
+    with pytest.raises(ValueError):
+        evaluator.evaluate([[1, 0]])
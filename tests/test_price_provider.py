@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+from core.asset import Asset
+from core.portfolio import Portfolio
+from core.price_provider import FixturePriceProvider
+from core.price_store import PriceStore
+from strategy.modern_portfolio_theory_strategy import MPT
+
+tickers = ["AAA", "BBB", "CCC"]
+
+
+def get_history(seed, dates):
+    random = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + random.normal(0.0005, 0.01, len(dates)))
+    opening = close * (1 + random.normal(0, 0.002, len(dates)))
+    return pd.DataFrame({"Open": opening, "High": np.maximum(opening, close) * 1.01,
+                         "Low": np.minimum(opening, close) * 0.99, "Close": close, "Adj Close": close,
+                         "Volume": random.integers(1000, 5000, len(dates))},
+                        index=pd.DatetimeIndex(dates, name="Date"))
+
+
+def get_fixture_provider(root):
+    # two years of bars up to today, so the default 5y period of invest covers all of them
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=504)
+    provider = FixturePriceProvider(str(root))
+    for seed, ticker in enumerate(tickers):
+        provider.save(ticker, "1d", get_history(seed, dates))
+    return provider
+
+
+def test_asset_set_price_from_fixture(tmp_path):
+    provider = get_fixture_provider(tmp_path)
+    history = provider.get_history("AAA")
+    a = Asset("AAA", price_provider=provider)
+    a.get_price()
+
+    assert np.allclose(a.daily_price["AAA"], history["Open"])
+    assert np.allclose(a.daily_price_change["AAA"], history["Open"].pct_change().iloc[1:])
+
+
+def test_portfolio_invest_and_optimize_from_fixture(tmp_path):
+    provider = get_fixture_provider(tmp_path)
+    portfolio = Portfolio()
+    portfolio.invest(tickers, strategy=MPT(risk_free_annual_yield=0.01), show_details=False,
+                     price_provider=provider)
+
+    assert list(portfolio.full_asset_price_history.columns) == tickers
+    assert len(portfolio.full_asset_price_history) == 504
+    mpt = MPT(risk_free_annual_yield=0.01, solver="qp")
+    mpt.portfolio = portfolio
+    for objective in ["min risk", "max sharpe ratio", "max sortino ratio"]:
+        weights = mpt.optimize(objective)
+        assert abs(np.sum(weights) - 1) < 1e-6 and np.min(weights) >= -1e-8
+
+
+def test_price_store_only_downloads_the_missing_tail(tmp_path, monkeypatch):
+    full = get_history(0, pd.bdate_range("2020-01-01", periods=300))
+    available = {"last": 250}
+    downloads = []
+
+    def download(ticker, interval, period=None, start_date=None):
+        downloads.append((period, start_date))
+        data = full.iloc[:available["last"]]
+        return data if start_date is None else data[data.index >= pd.Timestamp(start_date)]
+
+    monkeypatch.setattr(PriceStore, "_PriceStore__download", staticmethod(download))
+    store = PriceStore(root=str(tmp_path), refresh_interval=0)
+    first = store.get_history("AAA", period="max")
+    available["last"] = 300
+    second = store.get_history("AAA", period="max")
+
+    # the second call re-downloads from the bar before the last stored one, which may have been a partial bar
+    assert downloads == [("max", None), (None, full.index[248])]
+    for data, expected in [(first, full.iloc[:250]), (second, full), (store.load("AAA", "1d")[0], full)]:
+        assert data.index.equals(expected.index) and np.allclose(data.to_numpy(), expected.to_numpy())
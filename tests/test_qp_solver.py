@@ -0,0 +1,24 @@
+import numpy as np
+from scipy.optimize import minimize
+from core.moments import Moments
+from strategy.objectives import get_negative_sharpe_objective, get_budget_constraint
+from strategy.qp_solver import QPSolver
+
+
+def get_daily_returns(seed):
+    # a year of daily returns of 4 assets sharing a market factor, the excess returns are around 1e-4 to 1e-3
+    random = np.random.default_rng(seed)
+    return random.normal(0.0005, 0.015, (252, 4)) + random.normal(0, 0.01, (252, 1))
+
+
+def test_max_sharpe_converges_with_daily_excess_returns():
+    # with the unscaled constraint row (mean - rf)'y = 1, y is around 1e3 and the interior point method didn't
+    # converge in 100 iterations on this window
+    returns = get_daily_returns(82)
+    moments = Moments.from_estimates(returns.mean(axis=0), np.cov(returns, rowvar=False))
+    weights = QPSolver().max_sharpe(moments.covariance, moments.mean)
+
+    assert abs(weights.sum() - 1) < 1e-12 and weights.min() >= 0
+    reference = minimize(get_negative_sharpe_objective(moments), np.full(4, 0.25), jac=True, bounds=[(0, 1)] * 4,
+                         constraints=[get_budget_constraint()], options={"ftol": 1e-12})
+    assert get_negative_sharpe_objective(moments)(weights)[0] <= reference.fun + 1e-8
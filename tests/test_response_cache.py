@@ -0,0 +1,86 @@
+import os
+import time
+import threading
+from common.response_cache import ResponseCache, FileLock
+
+
+def get_counting_fetch(data, delay=0):
+    calls = []
+
+    def fetch():
+        calls.append(threading.get_ident())
+        time.sleep(delay)
+        return data
+
+    return fetch, calls
+
+
+def test_entry_expires_after_its_ttl(tmp_path):
+    cache = ResponseCache(root=str(tmp_path), ttls={("company/profile", None): 60})
+    fetch, calls = get_counting_fetch([{"symbol": "AAA"}])
+    assert cache.get("company/profile", "AAA", False, fetch) == [{"symbol": "AAA"}]
+    assert cache.get("company/profile", "AAA", False, fetch) == [{"symbol": "AAA"}]
+    assert len(calls) == 1
+
+    path = cache.get_path("company/profile", "AAA")
+    os.utime(path, (time.time() - 61, time.time() - 61))
+    assert cache.get("company/profile", "AAA", False, fetch) == [{"symbol": "AAA"}]
+    assert len(calls) == 2
+
+
+def test_threads_asking_for_one_entry_fetch_it_once(tmp_path):
+    cache = ResponseCache(root=str(tmp_path))
+    fetch, calls = get_counting_fetch({"price": 1}, delay=0.2)
+    barrier = threading.Barrier(4)
+    results = []
+
+    def get():
+        barrier.wait()
+        results.append(cache.get("enterprise-value", "AAA", False, fetch))
+
+    threads = [threading.Thread(target=get) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"price": 1}] * 4
+
+
+def test_stale_lock_is_reclaimed(tmp_path):
+    cache = ResponseCache(root=str(tmp_path), lock_timeout=1)
+    path = cache.get_path("enterprise-value", "AAA")
+    # a lock left behind by a killed worker, not touched since
+    with open(path + ".lock", "w", encoding="utf-8") as fp:
+        fp.write("dead worker")
+    os.utime(path + ".lock", (time.time() - 2, time.time() - 2))
+    fetch, calls = get_counting_fetch({"price": 1})
+
+    t0 = time.monotonic()
+    assert cache.get("enterprise-value", "AAA", False, fetch) == {"price": 1}
+    assert time.monotonic() - t0 < 1
+    assert len(calls) == 1
+    assert not os.path.exists(path + ".lock")
+
+
+def test_held_lock_is_not_reclaimed(tmp_path):
+    # the holder keeps the lock 3 times as long as the timeout, its heartbeat keeps the lock from going stale
+    path = str(tmp_path / "entry.lock")
+    events = []
+
+    def hold():
+        with FileLock(path, timeout=0.2):
+            events.append("first acquired")
+            time.sleep(0.6)
+            events.append("first released")
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    while not events:
+        time.sleep(0.01)
+    with FileLock(path, timeout=0.2):
+        events.append("second acquired")
+    holder.join()
+
+    assert events == ["first acquired", "first released", "second acquired"]
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+from core.rolling_moments import RollingMoments
+
+
+@pytest.fixture
+def returns():
+    random = np.random.default_rng(7)
+    dates = pd.bdate_range("2018-01-01", periods=700)
+    # a market factor so the assets are correlated, and a drift large against the noise to stress the running sums
+    values = 0.01 + random.normal(0, 0.01, (700, 1)) + random.normal(0, 0.015, (700, 3))
+    return pd.DataFrame(values, index=dates, columns=["AAA", "BBB", "CCC"])
+
+
+def assert_moments_equal(means, covariances, expected_mean, expected_covariance):
+    n = expected_mean.shape[1]
+    assert np.allclose(means, expected_mean.to_numpy(), rtol=1e-9, atol=1e-12, equal_nan=True)
+    assert np.allclose(covariances, expected_covariance.to_numpy().reshape(-1, n, n), rtol=1e-9, atol=1e-12,
+                       equal_nan=True)
+
+
+@pytest.mark.parametrize("window, min_periods", [(60, 60), (60, 10), ("45D", 1), ("45D", 20)])
+def test_rolling_window_equals_pandas_rolling(returns, window, min_periods):
+    # 700 days drop more than 10 windows of days, the sums are resynced on the way
+    _, means, covariances = RollingMoments.run(returns, window=window, min_periods=min_periods)
+    rolling = returns.rolling(window, min_periods=min_periods)
+    assert_moments_equal(means, covariances, rolling.mean(), rolling.cov())
+
+
+def test_expanding_window_equals_pandas_expanding(returns):
+    _, means, covariances = RollingMoments.run(returns, min_periods=5)
+    expanding = returns.expanding(min_periods=5)
+    assert_moments_equal(means, covariances, expanding.mean(), expanding.cov())
+
+
+@pytest.mark.parametrize("halflife, min_periods", [(10, 1), (63, 20)])
+def test_halflife_equals_pandas_ewm(returns, halflife, min_periods):
+    _, means, covariances = RollingMoments.run(returns, halflife=halflife, min_periods=min_periods)
+    ewm = returns.ewm(halflife=halflife, adjust=False, min_periods=min_periods)
+    assert_moments_equal(means, covariances, ewm.mean(), ewm.cov(bias=True))
+
+
+def test_snapshots_on_a_schedule(returns):
+    schedule = [returns.index[99], returns.index[400], returns.index[699]]
+    dates, means, covariances = RollingMoments.run(returns, window=252, schedule=schedule)
+    assert list(dates) == schedule
+    for k, date in enumerate(schedule):
+        window = returns.loc[:date].iloc[-252:]
+        assert np.allclose(means[k], window.mean().to_numpy(), rtol=1e-9)
+        assert np.allclose(covariances[k], window.cov().to_numpy(), rtol=1e-9)
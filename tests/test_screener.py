@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+from common.fundamentals_store import FundamentalsStore
+from common.screener import Screener
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    random = np.random.default_rng(5)
+    n = 40
+    roe = np.round(random.uniform(-0.1, 0.4, n), 2)
+    roe[[3, 17]] = np.nan
+    roe[[5, 6]] = 0.15  # the float32 0.15 is not the float64 0.15
+    data = pd.DataFrame({"ticker": [f"T{i:02d}" for i in range(n)],
+                         "market cap": random.uniform(1e8, 1e11, n),
+                         "sector": random.choice(["Technology", "Healthcare", "Energy", None], n),
+                         "industry": random.choice(["Software", "Biotech", "Oil & Gas"], n),
+                         "ROE": roe,
+                         "liability/asset ratio": random.uniform(0, 1, n)})
+    store = FundamentalsStore(root=str(tmp_path))
+    store.save(data, "20200509")
+    return store.load()
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("ROE > 0.15", lambda d: d["ROE"] > 0.15),
+    ("roe >= 0.15", lambda d: d["ROE"] >= 0.15),
+    ("ROE == 0.15", lambda d: d["ROE"] == 0.15),
+    ("ROE != 0.15", lambda d: d["ROE"] != 0.15),
+    ("ROE < 0", lambda d: d["ROE"] < 0),
+    ("ROE in 0.15, 0.2", lambda d: d["ROE"].isin(np.float32([0.15, 0.2]))),
+    ("market cap <= 5e10 and liability/asset ratio < 0.5", lambda d: (d["market cap"] <= 5e10) &
+                                                                     (d["liability/asset ratio"] < 0.5)),
+    ("sector == Technology", lambda d: d["sector"] == "Technology"),
+    ("Sector = 'technology'", lambda d: d["sector"] == "Technology"),
+    ("sector != Technology", lambda d: d["sector"] != "Technology"),
+    ("sector in Technology, Healthcare and ROE > 0.1", lambda d: d["sector"].isin(["Technology", "Healthcare"]) &
+                                                                 (d["ROE"] > 0.1)),
+    ("ROE > 0.15 and industry == Software and sector == Energy", lambda d: (d["ROE"] > 0.15) &
+                                                                           (d["industry"] == "Software") &
+                                                                           (d["sector"] == "Energy")),
+    ("ROE > 1", lambda d: d["ROE"] > 1),
+    ("sector == Utilities", lambda d: d["sector"] == "Utilities"),
+])
+def test_screen_equals_pandas_filter(snapshot, query, expected):
+    screened = Screener(data=snapshot).screen(query)
+    assert list(screened.index) == list(snapshot.index[expected(snapshot).to_numpy(dtype=bool)])
+
+
+def test_empty_result(snapshot):
+    screened = Screener(data=snapshot).screen("ROE > 0.3 and ROE < 0.2")
+    assert len(screened) == 0 and list(screened.columns) == list(snapshot.columns)
+
+
+def test_top_equals_pandas_sort(snapshot):
+    screener = Screener(data=snapshot)
+    top = screener.top("ROE", 5, predicates="sector == Technology")
+    technology = snapshot[snapshot["sector"] == "Technology"]
+    assert list(top.index) == list(technology["ROE"].dropna().sort_values(ascending=False, kind="stable").index[:5])
+    bottom = screener.top("liability/asset ratio", 3, ascending=True)
+    assert list(bottom.index) == list(snapshot["liability/asset ratio"].nsmallest(3).index)
+
+
+def test_parse_errors(snapshot):
+    screener = Screener(data=snapshot)
+    with pytest.raises(ValueError):
+        screener.screen("ROE is high")
+    with pytest.raises(KeyError):
+        screener.screen("PEG < 1")
+    with pytest.raises(ValueError):
+        screener.screen("sector > Technology")
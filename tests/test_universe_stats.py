@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+from core.asset import Asset
+from core.return_matrix import ReturnMatrix
+from core.universe_stats import UniverseStats
+
+tickers = ["SPY", "AAA", "BBB", "DDD"]
+
+
+def get_assets(first_date):
+    # daily open prices of SPY and 3 tickers following it, starting on first_date
+    random = np.random.default_rng(11)
+    dates = pd.bdate_range(first_date, "2021-06-30")
+    market = random.normal(0.0004, 0.01, len(dates))
+    assets = {}
+    for i, ticker in enumerate(tickers):
+        price = 50 * np.cumprod(1 + i * 0.3 * market + random.normal(0, 0.012, len(dates)))
+        assets[ticker] = Asset(ticker)
+        assets[ticker].set_price(pd.DataFrame({"Open": price}, index=dates))
+    return assets
+
+
+def assert_beta_equals_asset_beta(stats, assets, interval):
+    for ticker in tickers[1:]:
+        assert np.isclose(stats.loc[ticker, "beta"], assets[ticker].get_beta(assets["SPY"], interval), rtol=1e-10)
+
+
+def test_beta_of_prices_equals_asset_beta(tmp_path):
+    # the first price is on the last day of a month, so the first monthly return is between the first two months
+    assets = get_assets("2019-01-31")
+    prices = pd.concat([assets[ticker].daily_price for ticker in tickers], axis=1)
+    matrix = ReturnMatrix.save(str(tmp_path / "prices.npy"), prices, kind="price")
+    try:
+        for interval in ["1wk", "1mo", "3mo"]:
+            assert_beta_equals_asset_beta(UniverseStats(beta_interval=interval).compute(matrix), assets, interval)
+    finally:
+        ReturnMatrix.attached.pop(matrix.path, None)
+
+
+def test_beta_of_returns_equals_asset_beta():
+    assets = get_assets("2019-01-03")
+    returns = pd.concat([assets[ticker].daily_price_change for ticker in tickers], axis=1)
+    assert_beta_equals_asset_beta(UniverseStats().compute(returns), assets, "1mo")
@@ -1,8 +1,12 @@
+import math
 import time
 import multiprocessing
 import os.path
 import pandas as pd
 from core.asset import *
+from core.benchmark import benchmarks
+from core.return_matrix import ReturnMatrix
+from core.universe_stats import UniverseStats
 
 
 def plot_assets_in_return_risk_plane(file_path, highlight_tickers=set(), only_see_tickers=set()):
@@ -15,7 +19,7 @@ def plot_assets_in_return_risk_plane(file_path, highlight_tickers=set(), only_se
     """
     if not os.path.exists(file_path):
         print(f"cannot find {file_path}")
-    data = pd.read_csv(file_path, encoding="utf-8", delimiter="\t")
+    data = pd.read_csv(file_path, encoding="utf-8", delimiter="\t").iloc[:, 0:3]  # ticker, return, risk
     data["only"] = data["ticker"].apply(lambda x: 1 if x in only_see_tickers else 0)
     data.columns = ["ticker", "return", "risk", "only"]
     data = data[data["return"].notna()]
@@ -33,30 +37,128 @@ def plot_assets_in_return_risk_plane(file_path, highlight_tickers=set(), only_se
     plt.show()
 
 
-def scrape_asset_return_risk(ticker_list, file_path):
+def scrape_asset_return_risk(ticker_list, file_path, processes=None, matrix_path=None, chunk_size=8):
     """
-    This function scrapes the price for each ticker, and calculate the daily expected return and risk. Save the data
-    to file_path
+    This function fans the tickers out to a pool of workers, each computing the annualized expected return, risk and
+    monthly beta of a ticker from its 5-year daily price. Rows are saved to file_path as they complete.
     :param ticker_list: a list of tickers to scrape
     :param file_path: a file path to save the data
+    :param processes: number of worker processes, default is the number of cpus
+    :param matrix_path: optional, a matrix built by build_return_matrix. Workers read prices from it instead of
+    fetching them, tickers not in the matrix are fetched as usual
+    :param chunk_size: how many tickers are sent to a worker at a time
     :return:
     """
-    p = multiprocessing.Pool(multiprocessing.cpu_count())
-    with open(file_path, "w", encoding="utf-8") as fp:
-        fp.write("ticker\texpected daily return\tdaily risk\n")
+    processes = processes if processes is not None else multiprocessing.cpu_count()
+    spy = benchmarks.get("SPY")  # load the benchmark once and hand it to the workers
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(processes, initializer=asset_return_risk_worker_initializer,
+                              initargs=(spy, matrix_path)) as p, open(file_path, "w", encoding="utf-8") as fp:
+        fp.write("ticker\texpected daily return\tdaily risk\tbeta\n")
         tickers_failed = []
-        for ticker in ticker_list:
-            a = Asset(ticker)
-            try:
-                t0 = time.clock()
-                data = a.get_expected_daily_return_and_risk()
-                if "nan\tnan" in data:
-                    tickers_failed.append(ticker)
-                else:
-                    print(f"- {ticker} e-sigma scraping done, takes {round(time.clock() - t0, 2)} seconds")
-                    fp.write("\t".join([ticker] + [str(d) for d in data]) + "\n")
-            except Exception as e:
-                print(f"cannot scrape {ticker} - {e}")
+        for i, (ticker, data) in enumerate(p.imap_unordered(asset_return_risk_worker, ticker_list, chunk_size)):
+            if data is None or any(math.isnan(d) for d in data):
                 tickers_failed.append(ticker)
+            else:
+                fp.write("\t".join([ticker] + [str(d) for d in data]) + "\n")
+                fp.flush()
+            if (i + 1) % 100 == 0:
+                print(f"- {i + 1}/{len(ticker_list)} tickers scanned, "
+                      f"{round((i + 1) / (time.perf_counter() - t0), 2)} tickers/second")
 
-        print(f"failed tickers={tickers_failed}")
+    elapsed = time.perf_counter() - t0
+    print(f"{len(ticker_list)} tickers scanned in {round(elapsed, 2)} seconds, "
+          f"{round(len(ticker_list) / elapsed, 2) if elapsed > 0 else 0} tickers/second")
+    print(f"failed tickers={tickers_failed}")
+
+
+def asset_return_risk_worker_initializer(benchmark, matrix_path=None):
+    """
+    This is a pool initializer putting the benchmark loaded by the parent process into the worker's registry, and
+    attaching the worker to the shared matrix if any.
+    """
+    benchmarks.set(benchmark)
+    if matrix_path is not None:
+        ReturnMatrix.attach(matrix_path)
+
+
+def asset_return_risk_worker(ticker):
+    """
+    This is a helper function to parallelize the return/risk/beta scanning.
+    :param ticker: the ticker to scan
+    :return: a tuple (ticker, [annual return, annual risk, beta]), or (ticker, None) if cannot scan
+    """
+    try:
+        a = Asset(ticker)
+        matrix = next(iter(ReturnMatrix.attached.values()), None)
+        if matrix is not None and ticker in matrix:
+            a.set_price(get_price_history_from_matrix(matrix, ticker))
+        else:
+            a.get_price()
+        return ticker, a.get_expected_yearly_return_risk_beta()
+    except Exception as e:
+        print(f"cannot scrape {ticker} - {e}")
+        return ticker, None
+
+
+def get_price_history_from_matrix(matrix, ticker, ohlc="Open"):
+    """
+    This is a helper function to turn a matrix column into a price history an Asset can load. A return matrix is
+    turned into a price index by compounding the returns, which has the same returns as the prices. The index starts
+    at 1 one date before the first return, so the first return isn't lost when the Asset takes the price changes.
+    """
+    data = matrix.get_series(ticker)
+    if matrix.kind == "return" and len(data) > 0:
+        position = matrix.dates.searchsorted(data.index[0])
+        base_date = matrix.dates[position - 1] if position > 0 else data.index[0] - pd.Timedelta(days=1)
+        data = pd.concat([pd.Series([1.0], index=[base_date]), (1 + data).cumprod()])
+    return pd.DataFrame({ohlc: data})
+
+
+def build_return_matrix(ticker_list, matrix_path, benchmark="SPY", kind="return", period="5y"):
+    """
+    This function fetches the price for each ticker once and saves them into one memory-mappable dates x tickers
+    matrix, so pool workers can attach to it instead of fetching prices themselves.
+    :param ticker_list: a list of tickers to put into the matrix
+    :param matrix_path: a .npy file path to save the matrix, the ticker/date index is saved next to it as .json
+    :param benchmark: a benchmark ticker added to the matrix, so workers don't need to fetch it either
+    :param kind: "return" to save daily returns, "price" to save daily prices
+    :param period: how long the price history is
+    :return: the ReturnMatrix
+    """
+    t0 = time.perf_counter()
+    tickers = ([benchmark] if benchmark is not None else []) + list(ticker_list)
+    matrix, tickers_failed = ReturnMatrix.build(matrix_path, tickers, kind=kind, period=period)
+    print(f"{matrix.values.shape[1]} tickers x {matrix.values.shape[0]} dates saved to {matrix_path}, "
+          f"takes {round(time.perf_counter() - t0, 2)} seconds")
+    print(f"failed tickers={tickers_failed}")
+    return matrix
+
+
+def attach_return_matrix_worker(matrix_path):
+    """
+    This is a pool initializer attaching each worker process to the shared return matrix
+    :param matrix_path: the .npy file generated by build_return_matrix
+    """
+    ReturnMatrix.attach(matrix_path)
+
+
+def get_universe_stats(matrix_path, ticker_list=None, file_path=None, risk_free_return=0, memory_budget_mb=256):
+    """
+    This function computes annualized return, risk, sharpe ratio, downside deviation, sortino ratio, beta and max
+    drawdown of every ticker in a return matrix in a few vectorized passes, instead of one Asset per ticker.
+    :param matrix_path: the .npy file generated by build_return_matrix
+    :param ticker_list: optional, build the matrix of these tickers (and SPY) at matrix_path first
+    :param file_path: optional, a tsv file path to save the stats
+    :param risk_free_return: annual risk free return
+    :param memory_budget_mb: max memory used by a chunk of tickers
+    :return: a data frame of stats indexed by ticker
+    """
+    if ticker_list is not None:
+        matrix = build_return_matrix(ticker_list, matrix_path)
+    else:
+        matrix = ReturnMatrix.attach(matrix_path)
+    stats = UniverseStats(memory_budget_mb, risk_free_return=risk_free_return).compute(matrix, show_details=True)
+    if file_path is not None:
+        stats.to_csv(file_path, sep="\t", encoding="utf-8")
+    return stats
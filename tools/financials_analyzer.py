@@ -1,7 +1,11 @@
+import os
 import time
 import multiprocessing
 from core.company import *
 from utils.widget import *
+from common.fetch_scheduler import fetch_scheduler, classify_failure
+from common.fundamentals_store import FundamentalsStore, FUNDAMENTALS_ITEMS
+from common.screener import Screener
 
 
 def analyze_company(ticker, risk_free_return, quarter=False, year=5):
@@ -144,47 +148,239 @@ def compare_companies(ticker_list, risk_free_return, quarter=False, year=5):
     print(i.applymap(rank_number).to_string())
 
 
-def scrape_company_fundamentals(ticker_list, file_path, risk_free_return, quarter=False, year=5):
+def scrape_company_fundamentals(ticker_list, file_path, risk_free_return, quarter=False, year=5,
+                                requests_per_second=5, max_concurrency=8, processes=None, resume=False,
+                                retry_failed=False, fundamentals_store=None, incremental=False):
     """
-    This function scrapes all the companies in the ticker_list for financial data and save to tsv file.
+    This function scrapes all the companies in the ticker_list for financial data and save to tsv file. Completed and
+    failed tickers are recorded in a journal next to the file ({file_path}.journal) as results arrive, so an
+    interrupted scrape can be resumed.
     :param ticker: company stock ticker
     :param risk_free_return: the 3-month t-bill return
     :param quarter: whether to see it's quarter report. If false, will see its annual report
     :param year: see data back to how many years. 5 is the default
+    :param requests_per_second: max sustained api requests per second the api allows, shared by all workers
+    :param max_concurrency: max api requests in flight, shared by all workers
+    :param processes: number of worker processes, default is the number of cpus
+    :param resume: keep the existing file and journal, and skip the tickers already done or failed
+    :param retry_failed: only scrape the tickers failed in previous runs, appending to the existing file and journal
+    whether resume is set or not
+    :param fundamentals_store: a FundamentalsStore to save today's typed snapshot of the file into once done, default
+    is ./data/fundamentals
+    :param incremental: only re-scrape the companies which filed a new statement since the latest snapshot, found by
+    probing each company's latest statement date. The others are carried forward from the snapshot as they are
     :return:
     """
-    p = multiprocessing.Pool(multiprocessing.cpu_count())
-    items = [
-        "ticker", "market cap", "industry", "sector", "current price", "gross margin", "cost margin",
-        "net income margin", "expenses margin", "ROE", "ROA", "receivables turnover days", "inventories turnover days",
-        "total assets turnover days", "liability/asset ratio", "current ratio", "acid-test ratio", "revenue growth",
-        "net income growth", "operating income growth", "free cash flow growth", "wacc", "roic", "excess return", 
-        "economic profit", "stockholders equity growth", "dividend yield", "dividend payout ratio", "dcf", "beta",
-        "annual return", "annual risk"
-    ]
-    with open(file_path, "w") as fp:
-        fp.write("\t".join(items)+"\n")
-        tickers_failed = []
-        for result in p.imap(company_scraping_worker, [[ticker, risk_free_return, quarter] for ticker in ticker_list]):
-            if len(result) <= 5:
-                tickers_failed.append(result)
+    journal_path = f"{file_path}.journal"
+    all_tickers = list(ticker_list)
+    if retry_failed and not os.path.exists(file_path):
+        raise ValueError(f"no previous scrape at {file_path} to retry the failed tickers of")
+    # retrying the failed tickers appends to the previous scrape, same as resuming it
+    resume = (resume or retry_failed) and os.path.exists(file_path)
+    if resume:
+        with open(file_path, encoding="utf-8") as fp:
+            header = next(fp, "").rstrip("\n").split("\t")
+        if header != FUNDAMENTALS_ITEMS:
+            raise ValueError(f"{file_path} has {len(header)} columns instead of the {len(FUNDAMENTALS_ITEMS)} in "
+                             f"FUNDAMENTALS_ITEMS, it was written by another version and cannot be resumed: "
+                             f"missing {[c for c in FUNDAMENTALS_ITEMS if c not in header]}, "
+                             f"unknown {[c for c in header if c not in FUNDAMENTALS_ITEMS]}")
+        # a crash may leave a line half-written, appending to it would merge it with the next line
+        truncate_partial_line(file_path)
+        if os.path.exists(journal_path):
+            truncate_partial_line(journal_path)
+    done, failed = load_scraping_journal(file_path, journal_path) if resume else (set(), {})
+    if retry_failed:
+        ticker_list = [t for t in ticker_list if t in failed and t not in done]
+    else:
+        ticker_list = [t for t in ticker_list if t not in done and t not in failed]
+    print(f"{len(done)} tickers done, {len(failed)} failed before, {len(ticker_list)} tickers to scrape")
+
+    fundamentals_store = fundamentals_store if fundamentals_store is not None else FundamentalsStore()
+    previous = load_previous_fundamentals(fundamentals_store) if incremental else None
+    statement_dates = {} if previous is None else \
+        previous["statement date"].dropna().dt.strftime("%Y-%m-%d").to_dict()
+    if incremental:
+        print(f"{len(statement_dates)} tickers in the latest snapshot to probe for new statements")
+
+    processes = processes if processes is not None else multiprocessing.cpu_count()
+    # every worker gets at least one request in flight and one token of burst, more workers would break the caps
+    processes = max(1, min(processes, max_concurrency, int(2 * requests_per_second)))
+    spy = benchmarks.get("SPY")  # load the benchmark once and hand it to the workers
+    # the workers are terminated if the loop raises, the files are closed before that
+    with multiprocessing.Pool(processes, initializer=company_scraping_worker_initializer,
+                              initargs=(spy, requests_per_second, max_concurrency, processes)) as p, \
+            open(file_path, "a" if resume else "w", encoding="utf-8") as fp, \
+            open(journal_path, "a" if resume else "w", encoding="utf-8") as journal:
+        if not resume:
+            fp.write("\t".join(FUNDAMENTALS_ITEMS)+"\n")
+        tickers_failed = {}  # failure kind -> tickers
+        tickers_carried = 0
+        for ticker, result, failure in p.imap_unordered(company_scraping_worker,
+                                                        [[ticker, risk_free_return, quarter, statement_dates.get(ticker)]
+                                                         for ticker in ticker_list]):
+            if failure is None and result is None:  # no new statement, carry the row forward
+                result = serialize_fundamentals_row(ticker, previous.loc[ticker])
+                tickers_carried += 1
+            if failure is not None:
+                tickers_failed.setdefault(failure, []).append(ticker)
+                journal.write(f"failed\t{ticker}\t{failure}\n")
             else:
                 fp.write(result)
-        print(f"failed tickers={tickers_failed}")
+                fp.flush()  # the row is on disk before the journal says the ticker is done
+                journal.write(f"done\t{ticker}\n")
+            journal.flush()
+        # the workers have exited before the result is sorted and snapshotted
+        p.close()
+        p.join()
+        for failure, tickers in tickers_failed.items():
+            print(f"failed tickers ({failure})={tickers}")
+    # rows arrive in the order workers finish, put them back in the order of the ticker list
+    sort_scraping_result(file_path, all_tickers)
+    if incremental:
+        print(f"{tickers_carried} tickers carried forward without new statements")
+    print(f"fundamentals snapshot saved to {fundamentals_store.import_tsv(file_path, datetime.now())}")
+
+
+def screen_companies(query, rank_by=None, k=50, ascending=False, file_path=None, date=None):
+    """
+    This function screens the scraped fundamentals snapshot, and optionally ranks the result by a metric.
+    :param query: predicates joined by "and", e.g. "ROE > 0.15 and liability/asset ratio < 0.5 and sector == Technology"
+    :param rank_by: optional, a metric to rank the screened tickers by, only the top k are kept
+    :param k: how many tickers to keep when ranking
+    :param ascending: rank the smallest first
+    :param file_path: optional, a txt file path to save the screened tickers one per line
+    :param date: the snapshot date, default is the latest
+    :return: a data frame of the screened companies
+    """
+    screener = Screener(date=date)
+    if rank_by is None:
+        data = screener.screen(query)
+    else:
+        data = screener.top(rank_by, k, predicates=query, ascending=ascending)
+    print(data.to_string())
+    print(f"{len(data)} of {len(screener.tickers)} tickers screened")
+    if file_path is not None:
+        Screener.save(data, file_path)
+    return data
+
+
+def load_scraping_journal(file_path, journal_path):
+    """
+    This is a helper function to find what a previous (possibly interrupted) scrape has done.
+    :param file_path: the scraping result tsv file
+    :param journal_path: the journal of the scrape
+    :return: a set of tickers done, and a dict of tickers failed -> failure kind. A ticker retried successfully
+    only shows up as done
+    """
+    done, failed = set(), {}
+    if os.path.exists(journal_path):
+        with open(journal_path, encoding="utf-8") as journal:
+            for line in journal:
+                if not line.endswith("\n"):  # half-written
+                    continue
+                record = line.rstrip("\n").split("\t")
+                if record[0] == "done" and len(record) >= 2:
+                    done.add(record[1])
+                    failed.pop(record[1], None)
+                elif record[0] == "failed" and len(record) >= 3 and record[1] not in done:
+                    failed[record[1]] = record[2]
+    # a row may be written right before a crash, without its journal record
+    with open(file_path, encoding="utf-8") as fp:
+        next(fp, None)
+        for line in fp:
+            if line.strip() and line.endswith("\n"):
+                done.add(line.split("\t", 1)[0])
+                failed.pop(line.split("\t", 1)[0], None)
+    return done, failed
+
+
+def truncate_partial_line(path):
+    """
+    This is a helper function to cut the last line of a file off if it doesn't end with a newline, e.g. a row an
+    interrupted scrape was writing.
+    """
+    with open(path, "rb+") as fp:
+        data = fp.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            fp.truncate(end)
+
+
+def sort_scraping_result(file_path, ticker_list):
+    """
+    This is a helper function to sort the rows of a scraping result tsv file in the order of a ticker list, rows of
+    tickers not in the list go last. The file is replaced atomically
+    """
+    order = {ticker: i for i, ticker in enumerate(ticker_list)}
+    with open(file_path, encoding="utf-8") as fp:
+        header = next(fp, "")
+        rows = [line for line in fp if line.strip()]
+    rows.sort(key=lambda line: order.get(line.split("\t", 1)[0], len(order)))
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fp:
+        fp.write(header)
+        fp.writelines(rows)
+    os.replace(tmp_path, file_path)
+
+
+def load_previous_fundamentals(fundamentals_store):
+    """
+    This is a helper function to load the latest snapshot an incremental scrape carries rows forward from.
+    :return: the snapshot, or None if there is no snapshot with statement dates
+    """
+    if len(fundamentals_store.list_dates()) == 0:
+        return None
+    data = fundamentals_store.load()
+    return data if "statement date" in data.columns else None
+
+
+def serialize_fundamentals_row(ticker, row):
+    """
+    This is a helper function to write a snapshot row back as a scraping result line.
+    """
+    row = row.reindex(FUNDAMENTALS_ITEMS[1:])
+    row["statement date"] = row["statement date"].strftime("%Y-%m-%d") if pd.notna(row["statement date"]) else None
+    return "\t".join([ticker] + [str(x) for x in row.values]) + "\n"
+
+
+def company_scraping_worker_initializer(benchmark, requests_per_second, max_concurrency, processes):
+    """
+    This is a pool initializer. It puts the benchmark loaded by the parent process into the worker's registry, so
+    workers don't load it again (an exception raised here would make the pool respawn workers forever), and gives each
+    worker its share of the api request rate and concurrency.
+    """
+    benchmarks.set(benchmark)
+    # the pool has at most max_concurrency and 2 * requests_per_second workers, so the shares sum up to the caps
+    fetch_scheduler.configure(rate=requests_per_second / processes, burst=max(1, 2 * requests_per_second // processes),
+                              max_concurrency=max(1, max_concurrency // processes))
 
 
 def company_scraping_worker(args):
     """
     This is a helper function to parallelize the company information scraping.
-    :param args: a list of four arguments: [ticker, risk_free_return, market_return, quarter]
-    :return: the ticker if cannot scrape, or scraping info if can scrape
+    :param args: a list of four arguments: [ticker, risk_free_return, quarter, statement date]. If the statement date
+    is given, the company is only scraped if it has a newer statement
+    :return: a tuple (ticker, scraping info, None) if can scrape, (ticker, None, None) if there is no newer statement,
+    or (ticker, None, failure kind) if cannot scrape
     """
+    if len(args) > 3 and args[3] is not None:
+        try:
+            # the summary is computed from annual statements whatever the quarter argument
+            if FinancialInsight.get_latest_statement_date(args[0], quarter=False) == args[3]:
+                return args[0], None, None
+            FinancialInsight.invalidate(args[0], quarter=False)  # cached statements are older than the new filing
+        except Exception as e:
+            print(f"cannot probe {args[0]} ({classify_failure(e)}), scrape it fully")
     c = Company(args[0], quarter=args[2])
+    if c.failure is not None:
+        return args[0], None, c.failure
     try:
-        t0 = time.clock()
+        t0 = time.perf_counter()
         data = c.serialize_fundamentals_summary(args[1])
-        print(f"- {args[0]} scraping done, takes {round(time.clock() - t0, 2)} seconds")
-        return data
-    except Exception:
-        print(f"cannot scrape {args[0]}")
-        return args[0]
\ No newline at end of file
+        print(f"- {args[0]} scraping done, takes {round(time.perf_counter() - t0, 2)} seconds")
+        return args[0], data, None
+    except Exception as e:
+        failure = classify_failure(e)
+        print(f"cannot scrape {args[0]} ({failure})")
+        return args[0], None, failure
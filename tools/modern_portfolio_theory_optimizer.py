@@ -1,5 +1,8 @@
+import numpy as np
+import matplotlib.pyplot as plt
 from core.portfolio import Portfolio
 from strategy.modern_portfolio_theory_strategy import MPT
+from strategy.monte_carlo_simulator import MonteCarloSimulator
 
 
 def mpt_customize_weights(assets_list, customize_weights, risk_free_annual_yield=None, show_details=True,
@@ -13,26 +16,24 @@ def mpt_customize_weights(assets_list, customize_weights, risk_free_annual_yield
      optimization, otherwise will only do risk-optimization
     :param show_detail: show details about the optimized weights output in the console
     :param show_plot: show the capital market line (if risk_free_annual_yield is set), and mean-std curve
-    (efficient frontier), do not recommend to use when optimizing more than 4 assets -- will be slow in plotting
+    (efficient frontier) for any number of assets
     :param start_date: set a specific date to start investing, will determine when the price history data will start
     :param end_date: set a specific date to end investing, this will determine when the price history data will end
     :return:
     """
     ptf = Portfolio()
     mpt = MPT(risk_free_annual_yield=risk_free_annual_yield)
-    show_plots_for_less_than_three_assets = True if len(assets_list) <= 3 else False
-    show_plots_for_less_than_three_assets = True if len(assets_list) <= 3 else False
     if start_date and end_date is None:
         ptf.invest(assets_list, mpt, customized_weights=customize_weights, period="max", show_details=show_details,
-                   show_plot=show_plot or show_plots_for_less_than_three_assets)
+                   show_plot=show_plot)
     else:
         ptf.invest(assets_list, mpt, customized_weights=customize_weights, period="max", start_date=start_date,
                    end_date=end_date, show_details=show_details,
-                   show_plot=show_plot or show_plots_for_less_than_three_assets)
+                   show_plot=show_plot)
 
 
 def mpt_optimization(assets_list, risk_free_annual_yield=None, show_details=True, show_plot=False, period='max',
-                     start_date=None, end_date=None):
+                     start_date=None, end_date=None, solver="slsqp"):
     """
     This function uses the modern portfolio theory to optimize the portfolio.
     :param assets_list: a string list containing asset tickers
@@ -40,35 +41,35 @@ def mpt_optimization(assets_list, risk_free_annual_yield=None, show_details=True
      optimization, otherwise will only do risk-optimization
     :param show_detail: show details about the optimized weights output in the console
     :param show_plot: show the capital market line (if risk_free_annual_yield is set), and mean-std curve
-    (efficient frontier), do not recommend to use when optimizing more than 4 assets -- will be slow in plotting
+    (efficient frontier) for any number of assets
     :param start_date: set a specific date to start investing, will determine when the price history data will start
     :param end_date: set a specific date to end investing, this will determine when the price history data will end
+    :param solver: "slsqp", or "qp" for the interior point QP solver, much faster for many assets
     """
     ptf = Portfolio()
-    mpt = MPT(risk_free_annual_yield=risk_free_annual_yield)
-    show_plots_for_less_than_three_assets = True if len(assets_list) <= 3 else False
+    mpt = MPT(risk_free_annual_yield=risk_free_annual_yield, solver=solver)
     if start_date and end_date is None:
         ptf.invest(assets_list, mpt, show_details=show_details,
-                   show_plot=show_plot or show_plots_for_less_than_three_assets)
+                   show_plot=show_plot)
     else:
         ptf.invest(assets_list, mpt, start_date=start_date, end_date=end_date, show_details=show_details,
-                   show_plot=show_plot or show_plots_for_less_than_three_assets)
+                   show_plot=show_plot)
 
 
 def mpt_optimization_fixed_risk(assets_list, target_risk, risk_free_yield=0, show_details=True, show_plot=False,
-                                period='max', start_date=None, end_date=None):
+                                period='max', start_date=None, end_date=None, solver="slsqp"):
     ptf = Portfolio()
-    mpt = MPT(risk_free_annual_yield=risk_free_yield, target_risk=target_risk)
-    show_plots_for_less_than_three_assets = True if len(assets_list) <= 3 else False
+    mpt = MPT(risk_free_annual_yield=risk_free_yield, target_risk=target_risk, solver=solver)
     if start_date and end_date is None:
         ptf.invest(assets_list, mpt, show_details=show_details,
-                   show_plot=show_plot or show_plots_for_less_than_three_assets)
+                   show_plot=show_plot)
     else:
         ptf.invest(assets_list, mpt, start_date=start_date, end_date=end_date, show_details=show_details,
-                   show_plot=show_plot or show_plots_for_less_than_three_assets)
+                   show_plot=show_plot)
 
 
-def mpt_evaluation(assets_list, risk_free_annual_yield=None):
+def mpt_evaluation(assets_list, risk_free_annual_yield=None, training="expanding", training_years=1, step="year",
+                   processes=None, show_plot=True):
     """
     This function evaluates how MPT works for your assets to be invested. I suggest you to do evaluation for each
     portfolio combination, to understand how MPT optimization can track the optimal solutions for your specific assets
@@ -76,8 +77,84 @@ def mpt_evaluation(assets_list, risk_free_annual_yield=None):
     :param risk_free_annual_yield: I recommend to set it so as to allocate some risk-free assets.
     Its value is the annual yield of a 3month T-bill. If set, MPT will do risk & sharpe ratio
     optimization, otherwise will only do risk-optimization
+    :param training: "expanding" to predict the weights with all the history before an evaluation period, "rolling"
+    with only the last training_years years
+    :param training_years: the length of a rolling training window, and of the training window of the first period
+    :param step: the length of an evaluation period, "year" or "month"
+    :param processes: number of worker processes, default is the number of cpus
+    :param show_plot: plot the predicted stats against the ground truth
+    :return: a data frame of the predicted and ground truth stats of every evaluation period
     """
     ptf = Portfolio()
     mpt = MPT(risk_free_annual_yield=risk_free_annual_yield)
     mpt.portfolio = ptf
-    mpt.evaluate(assets_list)
\ No newline at end of file
+    return mpt.evaluate(assets_list, training=training, training_years=training_years, step=step, processes=processes,
+                        show_plot=show_plot)
+
+
+def mpt_monte_carlo(assets_list, risk_free_annual_yield=None, samples=1000000, top_k=10, metric="sharpe ratio",
+                    show_details=True, show_plot=True, period="max", start_date=None, end_date=None, seed=None):
+    """
+    This function samples random long-only portfolios of the assets to show the feasible region of risk and return,
+    and finds the best sampled portfolios. Memory stays bounded for any number of samples.
+    :param assets_list: a string list containing asset tickers
+    :param risk_free_annual_yield: the annual yield of a 3month T-bill, used by the sharpe and sortino ratios
+    :param samples: the number of random portfolios
+    :param top_k: the number of best portfolios to report
+    :param metric: rank portfolios by "sharpe ratio", "sortino ratio" or "risk"
+    :param show_details: print the summary of all portfolios and the weights of the best ones
+    :param show_plot: plot the density of the sampled portfolios over risk and return, and the best ones
+    :param start_date: set a specific date to start investing, will determine when the price history data will start
+    :param end_date: set a specific date to end investing, this will determine when the price history data will end
+    :param seed: the random seed
+    :return: a data frame of the top k portfolios with their annualized stats and weights
+    """
+    ptf = Portfolio()
+    if start_date is None and end_date is None:
+        ptf.invest(assets_list, period=period)
+    else:
+        ptf.invest(assets_list, start_date=start_date, end_date=end_date)
+    risk_free_daily_yield = 0 if risk_free_annual_yield is None else pow(1 + risk_free_annual_yield, 1/365) - 1
+    simulator = MonteCarloSimulator(ptf.get_moments(), risk_free_daily_yield, seed=seed)
+    top = simulator.simulate(samples, top_k=top_k, metric=metric)
+
+    # annualize the daily stats, there are about 252 trading days per year
+    annual = top.copy()
+    for column, factor in [("return", 252), ("risk", np.sqrt(252)), ("sharpe ratio", np.sqrt(252)),
+                           ("excess return", 252), ("downside deviation", np.sqrt(252)),
+                           ("sortino ratio", np.sqrt(252))]:
+        if column in annual.columns:
+            annual[column] = annual[column] * factor
+    if show_details:
+        print("======MPT Monte Carlo========")
+        print(f"investing assets: {assets_list}")
+        print(f"{simulator.count} random portfolios, daily stats:")
+        print(simulator.get_summary())
+        print(f"top {top_k} portfolios by {metric}, annualized:")
+        print(annual.round(4).to_string())
+    if show_plot:
+        plot_monte_carlo(simulator, top)
+    return annual
+
+
+def plot_monte_carlo(simulator, top=None):
+    """
+    plot the density of sampled portfolios over daily risk and return, and the top portfolios
+    :param simulator: a MonteCarloSimulator that has simulated portfolios
+    :param top: a data frame of the top portfolios returned by simulate
+    """
+    plt.figure(figsize=(9, 6))
+    density = np.ma.masked_equal(simulator.histogram.T, 0)
+    plt.pcolormesh(simulator.risk_edges, simulator.return_edges, density, cmap="viridis")
+    plt.colorbar(label="portfolios")
+    moments = simulator.moments
+    plt.scatter(np.sqrt(np.diag(moments.covariance)), moments.mean, marker="x", color="red")
+    for ticker, risk, mean in zip(moments.tickers, np.sqrt(np.diag(moments.covariance)), moments.mean):
+        plt.annotate(ticker, (risk, mean))
+    if top is not None:
+        plt.scatter(top["risk"], top["return"], marker="o", color="orange", label=f"top {len(top)} portfolios")
+        plt.legend(loc="best")
+    plt.title("Random Portfolios")
+    plt.xlabel("daily risk ($\\sigma_p$)")
+    plt.ylabel("expected daily return ($E_p$)")
+    plt.show()
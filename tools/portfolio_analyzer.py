@@ -3,6 +3,7 @@ import json
 import numpy as np
 from core.portfolio import *
 from scipy.optimize import minimize
+from strategy.objectives import *
 
 
 def get_portfolio_performance(json_file_path, report_name, report_file_path, risk_free_return, target_weights):
@@ -75,17 +76,15 @@ def fund_allocation_optimizer(portfolios, risk_free_yearly_yield):
         names.append(name)
         returns.append((p.full_asset_price_history_change*p.asset_weights).sum(axis=1))
     returns = pd.concat(returns, axis=1).dropna()
+    moments = Moments(returns)
 
-    def sharpe_ratio(param):
-        daily_mean_return = np.matmul(param, returns.mean().to_numpy().transpose())
-        daily_risk = np.sqrt(np.matmul(np.matmul(param, returns.cov().to_numpy()), param.transpose()))
-        return -1 * (daily_mean_return - pow(1 + risk_free_yearly_yield, 1/365) + 1) / daily_risk
+    sharpe_ratio = get_negative_sharpe_objective(moments, pow(1 + risk_free_yearly_yield, 1/365) - 1)
     param = np.array([1/len(names)]*len(names))
     bnds = tuple([(0, 1)] * (len(param)))
-    cons = [{'type': 'eq', 'fun': lambda param: np.sum(param) - 1}]
-    ans = minimize(sharpe_ratio, param, bounds=bnds, constraints=cons)
-    optimized_daily_return = np.matmul(np.array(ans.x), returns.mean().to_numpy().transpose())
-    optimized_daily_risk = np.sqrt(np.matmul(np.matmul(np.array(ans.x), returns.cov().to_numpy()), np.array(ans.x).transpose()))
+    cons = [get_budget_constraint()]
+    ans = minimize(sharpe_ratio, param, jac=True, bounds=bnds, constraints=cons)
+    optimized_daily_return = moments.get_return(ans.x)
+    optimized_daily_risk = moments.get_risk(ans.x)
     print("==============================")
     print(names)
     print(f"sharpe ratio optimized weights: {list(np.around(np.array(ans.x), 4))}")